@@ -0,0 +1,197 @@
+"""
+Benchmark the recording start/stop path against local Rokoko and Audacity stand-ins.
+
+Usage:
+    python benchmark.py --cycles 2000
+    python benchmark.py --rokoko-latency 5 --rokoko-jitter 3 --audacity-failure-rate 0.01
+
+A mock Rokoko Studio HTTP server and a fake Audacity mod-script-pipe server
+(Linux/macOS) are started locally, then the same Recorder the GUI uses is
+driven headlessly through thousands of start/stop cycles. The report lists
+throughput, latency percentiles and start/stop skew.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from recorder import ConfigManager, NullTracer, Recorder, TakeTracer, percentile
+from recorder.fakes import FakeAudacity, MockRokokoStudio
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def stats(values):
+    """Return count, percentiles and max of a list of milliseconds."""
+    result = {"count": len(values)}
+    for p in PERCENTILES:
+        result[f"p{p}"] = percentile(values, p)
+    result["max"] = max(values) if values else None
+    return result
+
+
+def run_benchmark(args):
+    """Run the start/stop cycles and return the collected numbers."""
+    workdir = tempfile.mkdtemp(prefix="rokoko-av-bench-")
+    studios = [
+        MockRokokoStudio(
+            latency=args.rokoko_latency / 1000.0,
+            jitter=args.rokoko_jitter / 1000.0,
+            failure_rate=args.rokoko_failure_rate,
+            seed=args.seed,
+            stall_rate=args.rokoko_stall_rate
+        )
+        for _ in range(args.rokoko_hosts)
+    ]
+    studio = studios[0]
+    audacity = FakeAudacity(
+        latency=args.audacity_latency / 1000.0,
+        jitter=args.audacity_jitter / 1000.0,
+        failure_rate=args.audacity_failure_rate,
+        seed=args.seed
+    )
+
+    config_file = os.path.join(workdir, "config.json")
+    with open(config_file, 'w') as f:
+        json.dump({
+            "rokoko_ip": studio.host,
+            "rokoko_port": studio.port,
+            "rokoko_api_key": studio.api_key,
+            "rokoko_targets": [{"ip": s.host, "port": s.port} for s in studios[1:]],
+            "trace_directory": os.path.join(workdir, "traces"),
+            "audio_backend": args.audio_backend,
+            "capture_source": args.capture_source,
+            "capture_directory": os.path.join(workdir, "takes")
+        }, f)
+
+    errors = []
+
+    def log(message, level="info"):
+        if level == "error":
+            errors.append(message)
+        if args.verbose:
+            print(f"[{level}] {message}")
+
+    for s in studios:
+        s.start()
+    audacity.start()
+    config_manager = ConfigManager(config_file)
+    tracer = TakeTracer(config_manager.get("trace_directory")) if args.trace else NullTracer()
+    recorder = Recorder(config_manager, log=log, tracer=tracer, audacity_transport=audacity.pipe())
+    recorder.open()
+
+    phases = {"start": [], "stop": []}
+    try:
+        for _ in range(args.warmup):
+            recorder.start()
+            recorder.stop()
+
+        began = time.perf_counter()
+        for _ in range(args.cycles):
+            tracer.begin_take()
+            for action in ("start", "stop"):
+                tracer.mark_press(action)
+                t0 = time.perf_counter_ns()
+                result = getattr(recorder, action)()
+                elapsed_ms = (time.perf_counter_ns() - t0) / 1e6
+                phases[action].append((result, elapsed_ms))
+        duration = time.perf_counter() - began
+    finally:
+        recorder.close()
+        tracer.close()
+        audacity.stop()
+        for s in studios:
+            s.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "cycles": args.cycles,
+        "rokoko_hosts": args.rokoko_hosts,
+        "duration_s": duration,
+        "cycles_per_s": args.cycles / duration if duration else None,
+        "errors_logged": len(errors),
+    }
+    for action, entries in phases.items():
+        backends = {}
+        for result, _ in entries:
+            for t in result.timings:
+                if t.success and t.latency_ms is not None:
+                    backends.setdefault(t.name, []).append(t.latency_ms)
+        report[action] = {
+            "failures": sum(1 for result, _ in entries if not result.success),
+            "call_ms": stats([elapsed for _, elapsed in entries]),
+            "backend_ms": {name: stats(values) for name, values in backends.items()},
+            "skew_ms": stats([r.ack_skew_ms for r, _ in entries
+                              if r.success and r.ack_skew_ms is not None]),
+        }
+    return report
+
+
+def format_row(label, values):
+    cells = []
+    for key in [f"p{p}" for p in PERCENTILES] + ["max"]:
+        value = values.get(key)
+        cells.append(f"{value:9.3f}" if value is not None else f"{'-':>9}")
+    return f"  {label:<16}" + "".join(cells)
+
+
+def print_report(report):
+    print(f"Cycles:      {report['cycles']}")
+    print(f"Rokoko:      {report['rokoko_hosts']} host(s)")
+    print(f"Duration:    {report['duration_s']:.2f} s")
+    print(f"Throughput:  {report['cycles_per_s']:.1f} start/stop cycles per second")
+    print(f"Errors:      {report['errors_logged']} logged")
+    header = f"  {'(ms)':<16}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}"
+    for action in ("start", "stop"):
+        phase = report[action]
+        print()
+        print(f"{action.capitalize()} ({phase['failures']} failed)")
+        print(header)
+        print(format_row("call", phase["call_ms"]))
+        for name, values in sorted(phase["backend_ms"].items()):
+            print(format_row(name, values))
+        print(format_row("skew", phase["skew_ms"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=2000, help="start/stop cycles to measure")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured cycles before measuring")
+    parser.add_argument("--rokoko-hosts", type=int, default=1, help="number of mock Rokoko Studio hosts")
+    parser.add_argument("--rokoko-latency", type=float, default=0.0, help="mock Rokoko latency in ms")
+    parser.add_argument("--rokoko-jitter", type=float, default=0.0, help="extra random Rokoko latency in ms")
+    parser.add_argument("--rokoko-failure-rate", type=float, default=0.0, help="share of failed Rokoko commands")
+    parser.add_argument("--rokoko-stall-rate", type=float, default=0.0,
+                        help="share of Rokoko commands held for 5 s, like a lost packet")
+    parser.add_argument("--audacity-latency", type=float, default=0.0, help="fake Audacity latency in ms")
+    parser.add_argument("--audacity-jitter", type=float, default=0.0, help="extra random Audacity latency in ms")
+    parser.add_argument("--audacity-failure-rate", type=float, default=0.0, help="share of failed Audacity commands")
+    parser.add_argument("--audio-backend", choices=("audacity", "capture"), default="audacity",
+                        help="record audio through the fake Audacity or with in-process capture")
+    parser.add_argument("--capture-source", default="synthetic",
+                        help="input for --audio-backend capture: synthetic, device or a WAV path")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for jitter and failures")
+    parser.add_argument("--trace", action="store_true", help="write take traces during the run")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="print recorder log messages")
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        print("The fake Audacity server needs POSIX FIFOs; run the benchmark on Linux or macOS.")
+        sys.exit(1)
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
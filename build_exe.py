@@ -3,15 +3,19 @@ Helper script to build the Rokoko Audio/Video Recorder into a standalone .exe fi
 
 Usage:
     python build_exe.py
+    python build_exe.py --onedir
     
-This will create a single-file executable in the 'dist' directory.
+This will create a single-file executable in the 'dist' directory. With
+--onedir it creates a 'dist/rokoko-av-recorder' folder instead, which
+starts faster because nothing has to be unpacked on each launch.
 """
 
+import argparse
 import subprocess
 import sys
 import os
 
-def build_exe():
+def build_exe(onedir=False):
     """Build the executable using PyInstaller."""
     
     script_path = os.path.join(os.path.dirname(__file__), "rokoko_av.py")
@@ -23,7 +27,7 @@ def build_exe():
     # PyInstaller command
     cmd = [
         "pyinstaller",
-        "--onefile",                    # Create a single-file executable
+        "--onedir" if onedir else "--onefile",  # Folder or single-file executable
         "--windowed",                   # No console window (GUI only)
         "--name=rokoko-av-recorder",    # Name of the executable
         "--icon=NONE",                  # No icon (can add .ico file later)
@@ -36,13 +40,17 @@ def build_exe():
     print()
     
     try:
-        result = subprocess.run(cmd, check=True)
+        subprocess.run(cmd, check=True)
         print()
         print("=" * 60)
         print("Build completed successfully!")
         print("=" * 60)
-        print(f"\nExecutable location: dist/rokoko-av-recorder.exe")
-        print("\nNote: The first run may be slower as Windows needs to extract the files.")
+        if onedir:
+            print("\nExecutable location: dist/rokoko-av-recorder/rokoko-av-recorder.exe")
+            print("\nNote: Copy the whole dist/rokoko-av-recorder folder, not just the .exe.")
+        else:
+            print("\nExecutable location: dist/rokoko-av-recorder.exe")
+            print("\nNote: Every launch unpacks the bundled files first; use --onedir for faster starts.")
         print("      The executable can be run directly without Python installed.")
         
     except subprocess.CalledProcessError as e:
@@ -65,6 +73,9 @@ def build_exe():
 
 
 if __name__ == "__main__":
-    build_exe()
+    parser = argparse.ArgumentParser(description="Build the Rokoko Audio/Video Recorder executable.")
+    parser.add_argument("--onedir", action="store_true",
+                        help="build a folder instead of a single file (faster startup)")
+    build_exe(parser.parse_args().onedir)
 
 
@@ -0,0 +1,29 @@
+"""Recording logic shared by the Rokoko Audio/Video Recorder front ends."""
+
+from .audacity import (
+    AudacityCommands, PyAudacityTransport, create_transport, response_payload,
+    PA_AVAILABLE, PA_TYPE
+)
+from .backends import AudacityBackend, CaptureBackend, RokokoBackend
+from .capture import AudioCapture, FileSource, SyntheticSource, SOUNDDEVICE_AVAILABLE
+from .clocksync import ClockEstimator, ClockSync
+from .config import ConfigManager
+from .core import Recorder
+from .diagnostics import SessionProfiler, StallWatchdog, thread_stacks
+from .engine import RecorderEngine
+from .export import AudacityExport, ExportJob, ExportPipeline
+from .health import BackendHealth, HealthMonitor
+from .logsink import LogSink, log_sink_from_config
+from .markers import AudacityLabels, MarkerBatcher
+from .mocapstream import MocapStreamReceiver, read_mocap_take
+from .pipe import AudacityPipe, AudacityPipeError
+from .resilience import CircuitBreaker, CircuitOpenError, RttEstimator
+from .shotlist import ShotList
+from .rokoko import RokokoClient, RokokoTarget, TargetResult, rokoko_targets
+from .syncoffset import SyncOffsetStage, estimate_file_offset, NUMPY_AVAILABLE
+from .sync import (
+    BackendTiming, PhaseResult, RecordingCoordinator,
+    next_start_instant, poll_until, wait_until, wall_to_perf_ns
+)
+from .takefile import TakeFileReader, TakeFileWriter
+from .trace import NullTracer, TakeTracer, percentile
@@ -0,0 +1,202 @@
+"""Audacity scripting transport and command capability probe."""
+
+import importlib.util
+import json
+import os
+import threading
+
+from .pipe import AudacityPipe, FINISHED_PREFIX
+
+# Look for pyaudacity-x (better Windows support) or fallback to pyaudacity.
+# Only the lookup happens here; the module is imported on first use.
+if importlib.util.find_spec("pyaudacity_x") is not None:
+    PA_AVAILABLE = True
+    PA_TYPE = "pyaudacity-x"
+elif importlib.util.find_spec("pyaudacity") is not None:
+    PA_AVAILABLE = True
+    PA_TYPE = "pyaudacity"
+else:
+    PA_AVAILABLE = False
+    PA_TYPE = None
+
+
+def _import_pyaudacity():
+    """Import the pyaudacity module found at startup."""
+    if PA_TYPE == "pyaudacity-x":
+        import pyaudacity_x as pa
+    else:
+        import pyaudacity as pa
+    return pa
+
+
+def response_payload(response):
+    """Strip the trailing 'BatchCommand finished' line from a pipe response."""
+    lines = [line for line in response.splitlines() if not line.startswith(FINISHED_PREFIX)]
+    return "\n".join(lines).strip()
+
+
+class PyAudacityTransport:
+    """Sends scripting commands through pyaudacity / pyaudacity-x."""
+
+    name = PA_TYPE
+
+    def __init__(self):
+        self._pa = None
+
+    @property
+    def available(self):
+        """True when a pyaudacity module is installed."""
+        return PA_AVAILABLE
+
+    def do(self, command, timeout=None):
+        """Send one command and return Audacity's response text (no timeout support)."""
+        if self._pa is None:
+            self._pa = _import_pyaudacity()
+        return self._pa.do(command)
+
+    def connect(self):
+        """Nothing to open; pyaudacity opens the pipes per command."""
+
+    def add_connection_listener(self, callback):
+        """Accepted for interface parity; pyaudacity reconnects on every command."""
+
+    def close(self):
+        """Nothing to release; pyaudacity opens the pipes per command."""
+
+
+def create_transport(kind="native"):
+    """Return the Audacity transport named in the configuration."""
+    if kind == "pyaudacity":
+        return PyAudacityTransport()
+    return AudacityPipe()
+
+
+class AudacityCommands:
+    """Resolves which record and stop commands the running Audacity accepts.
+
+    The probe asks Audacity for its version and its scripting command list
+    once, at startup or after a reconnect, and remembers the resolved
+    commands per version in a small JSON cache so later launches against the
+    same Audacity skip the command list entirely.
+    """
+
+    record_candidates = [
+        "Record1stChoice",
+        "Transport: Record",
+        "Record2ndChoice",
+        "Record",
+    ]
+
+    stop_candidates = [
+        "Transport: Stop",
+        "Stop",
+    ]
+
+    def __init__(self, transport, cache_file="audacity_commands.json", log=None):
+        self.transport = transport
+        self.cache_file = cache_file
+        self.log = log or (lambda message, level="info": None)
+        self.version = None
+        self.record_command = None
+        self.stop_command = None
+        self._lock = threading.Lock()
+        transport.add_connection_listener(lambda connected: self.invalidate())
+
+    @property
+    def resolved(self):
+        """True when both the record and the stop command are known."""
+        return self.record_command is not None and self.stop_command is not None
+
+    def invalidate(self):
+        """Forget the resolved commands, e.g. after the pipe reconnects."""
+        self.version = None
+        self.record_command = None
+        self.stop_command = None
+
+    def probe(self):
+        """Resolve the record and stop commands, using the cache when possible."""
+        with self._lock:
+            if self.resolved:
+                return True
+
+            try:
+                version = self._query_version()
+            except Exception:
+                version = None
+
+            cache = self._load_cache()
+            entry = cache.get(version) if version else None
+            if entry:
+                self.record_command = entry["record"]
+                self.stop_command = entry["stop"]
+                self.version = version
+                self.log(f"Audacity {version}: using cached commands "
+                         f"(record: {self.record_command}, stop: {self.stop_command}).")
+                return True
+
+            try:
+                response = self.transport.do("GetInfo: Type=Commands Format=JSON")
+            except Exception as e:
+                self.log(f"Could not reach Audacity: {e}", "warning")
+                return False
+            try:
+                supported = self._parse_commands(response)
+            except ValueError:
+                supported = set()
+
+            record = self._pick(self.record_candidates, supported)
+            stop = self._pick(self.stop_candidates, supported)
+            if record is None or stop is None:
+                # Command list unavailable: fall back to the first choices
+                self.log("Audacity command list unavailable, using default commands.", "warning")
+                record = record or self.record_candidates[0]
+                stop = stop or self.stop_candidates[0]
+            elif version:
+                cache[version] = {"record": record, "stop": stop}
+                self._save_cache(cache)
+
+            self.record_command = record
+            self.stop_command = stop
+            self.version = version
+            self.log(f"Audacity {version or '(unknown version)'}: "
+                     f"record: {record}, stop: {stop}.")
+            return True
+
+    @staticmethod
+    def _pick(candidates, supported):
+        for cmd in candidates:
+            if cmd in supported:
+                return cmd
+        return None
+
+    def _query_version(self):
+        """Read Audacity's version from its Version/* preferences."""
+        parts = []
+        for key in ("Major", "Minor", "Micro"):
+            value = response_payload(self.transport.do(f"GetPreference: Name=Version/{key}"))
+            if not value:
+                break
+            parts.append(value)
+        return ".".join(parts) or None
+
+    @staticmethod
+    def _parse_commands(response):
+        """Return the set of scripting command ids in a GetInfo response."""
+        entries = json.loads(response_payload(response))
+        return {entry["id"] for entry in entries if "id" in entry}
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_cache(self, cache):
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(cache, f, indent=4)
+        except Exception as e:
+            self.log(f"Error saving Audacity command cache: {e}", "warning")
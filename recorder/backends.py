@@ -0,0 +1,527 @@
+"""Recording backends for Rokoko Studio and Audacity."""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .audacity import AudacityCommands, create_transport, response_payload
+from .capture import NUMPY_AVAILABLE, AudioCapture, create_source
+from .rokoko import RokokoClient, TargetResult, rokoko_targets
+from .sync import poll_until
+from .trace import NullTracer
+
+
+class RokokoBackend:
+    """Starts and stops recording on one or more Rokoko Studio hosts through their HTTP API.
+
+    Every host gets its own persistent ``RokokoClient``. Commands go to all
+    hosts concurrently: the first host is served on the calling dispatch
+    thread and the others on a bounded thread pool, so adding hosts does
+    not add their latencies up. The backend acknowledges once the slowest
+    host has answered; per-host results are kept in ``target_results``.
+    """
+
+    name = "Rokoko"
+
+    def __init__(self, config_manager, log, tracer=None, max_workers=8):
+        self.config_manager = config_manager
+        self.log = log
+        self.tracer = tracer or NullTracer()
+        self.max_workers = max_workers
+        self.clients = {}
+        self.target_results = []
+        self.clip_names = []
+        self.clip_name = None
+        # Hosts whose info does not tell whether they record, each logged once
+        self._unconfirmable = set()
+        self._pool = None
+        self._opened = False
+        self.configure(config_manager.config)
+        config_manager.add_listener(self.configure)
+
+    def open(self):
+        """Open persistent connections to every Rokoko Studio host."""
+        self._opened = True
+        for client in self.clients.values():
+            client.open()
+        # Start the pool threads now rather than on the first press
+        self._executor().map(lambda client: client.warm(), list(self.clients.values())[1:])
+
+    def warm(self):
+        """Refresh every host's pooled connection concurrently."""
+        clients = list(self.clients.values())
+        futures = [self._executor().submit(client.warm) for client in clients[1:]]
+        ok = clients[0].warm() if clients else False
+        return all([ok] + [future.result() for future in futures])
+
+    @property
+    def current_clip(self):
+        """Clip name the next start records to."""
+        return self.clip_name or self.config_manager.get("rokoko_clip_name")
+
+    def ping(self, timeout=1.0):
+        """Ping every host concurrently; return the slowest round trip in ms or raise."""
+        clients = list(self.clients.items())
+        futures = [(target, self._executor().submit(client.ping, timeout)) for target, client in clients[1:]]
+
+        rtts = []
+        errors = []
+        try:
+            rtts.append(clients[0][1].ping(timeout))
+        except Exception as e:
+            errors.append(f"{clients[0][0]}: {e}")
+        for target, future in futures:
+            try:
+                rtts.append(future.result())
+            except Exception as e:
+                errors.append(f"{target}: {e}")
+
+        if errors:
+            raise OSError("; ".join(errors))
+        return max(rtts)
+
+    def clock_events(self, action):
+        """Return the last start or stop on every host, stamped in both clocks.
+
+        One dict per host whose clock offset is known, with ``t_ns`` on the
+        local perf_counter_ns clock, the matching local wall time and the
+        host's wall time with its uncertainty.
+        """
+        perf_to_wall = time.time_ns() - time.perf_counter_ns()
+        events = []
+        for result in self.target_results:
+            if result.remote_ns is None:
+                continue
+            t_ns = (result.dispatch_ns + result.ack_ns) // 2
+            events.append({
+                "t_ns": t_ns,
+                "action": action,
+                "host": str(result.target),
+                "success": result.success,
+                "local_wall_ns": t_ns + perf_to_wall,
+                "remote_wall_ns": result.remote_ns,
+                "offset_ns": result.remote_ns - t_ns - perf_to_wall,
+                "uncertainty_ns": result.clock_uncertainty_ns,
+            })
+        return events
+
+    def confirm(self, action, deadline_ns):
+        """Poll every host's info until each reports the recording state ``action`` leads to.
+
+        Returns when the slowest host acted (the middle of its command's
+        round trip), or None when a host's info does not include its
+        recording state, in which case its HTTP 200 has to do.
+        """
+        recording = action == "start"
+        pending = dict(self.clients)
+        unknown = []
+
+        def check():
+            for target, client in list(pending.items()):
+                remaining = max(0.001, (deadline_ns - time.perf_counter_ns()) / 1e9)
+                try:
+                    state = client.recording(timeout=min(remaining, client.timeouts("info")[1]))
+                except OSError:
+                    continue
+                if state is None:
+                    unknown.append(target)
+                if state is None or state == recording:
+                    del pending[target]
+            return True if not pending else None
+
+        poll_until(check, deadline_ns)
+        for target in unknown:
+            if target not in self._unconfirmable:
+                self._unconfirmable.add(target)
+                self.log(f"Rokoko Studio at {target} does not report whether it is recording; "
+                         "trusting its acknowledgements.", "warning")
+        acked = [r for r in self.target_results if r.dispatch_ns is not None and r.ack_ns is not None]
+        if unknown or not acked:
+            return None
+        slowest = max(acked, key=lambda r: r.ack_ns)
+        return (slowest.dispatch_ns + slowest.ack_ns) // 2
+
+    def export(self, command, clip_name, timeout=60.0):
+        """Export ``clip_name`` on every host in turn; raises if any host failed.
+
+        Runs on the calling thread rather than the pool, which must stay
+        free for the next start.
+        """
+        clients = list(self.clients.items())
+        errors = []
+        for target, client in clients:
+            try:
+                client.export(command, clip_name, timeout)
+            except Exception as e:
+                errors.append(f"{target}: {e}")
+        if errors:
+            raise OSError("; ".join(errors))
+        return [str(target) for target, _ in clients]
+
+    def configure(self, config):
+        """Rebuild the per-host clients and their prepared requests from the configuration."""
+        clients = {}
+        for target in rokoko_targets(config):
+            client = self.clients.pop(target, None) or RokokoClient()
+            client.configure(
+                target.ip, target.port, target.api_key,
+                self.clip_name or config.get("rokoko_clip_name"),
+                config.get("rokoko_frame_rate"),
+                self.clip_names
+            )
+            if self._opened:
+                client.open()
+            clients[target] = client
+
+        for stale in self.clients.values():
+            stale.close()
+        self.clients = clients
+
+    def use_clips(self, clip_names):
+        """Prepare requests for every clip of a shot list up front (empty list to clear)."""
+        self.clip_names = list(clip_names)
+        for client in self.clients.values():
+            client.prepare_clips(self.clip_names)
+
+    def select_clip(self, clip_name=None):
+        """Record the next take to ``clip_name``, or to the configured clip name if None."""
+        self.clip_name = clip_name
+        for client in self.clients.values():
+            client.select_clip(self.current_clip)
+
+    def prepare(self, action):
+        """Check that the requests for a start or stop have been built."""
+        return bool(self.clients) and all(client.ready for client in self.clients.values())
+
+    def start(self):
+        """Start Rokoko recording on every host."""
+        return self._send_all("start")
+
+    def stop(self):
+        """Stop Rokoko recording on every host."""
+        return self._send_all("stop")
+
+    def roll_back(self):
+        """Stop every host the last start was sent to, whatever it answered.
+
+        A host that timed out may have started all the same, so it is
+        stopped as well; hosts the start never reached are left alone.
+        """
+        sent = [result.target for result in self.target_results if result.dispatch_ns is not None]
+        return self._send_all("stop", sent)
+
+    def close(self):
+        """Close the persistent connections to Rokoko Studio."""
+        for client in self.clients.values():
+            client.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="rokoko")
+        return self._pool
+
+    def _send_all(self, action, only=None):
+        """Send the prepared command to every host (or the ``only`` ones) at once and gather the results."""
+        targets = [(target, client) for target, client in self.clients.items()
+                   if only is None or target in only]
+        if not targets:
+            return True
+        first, rest = targets[0], targets[1:]
+
+        futures = [self._executor().submit(self._send_one, target, client, action)
+                   for target, client in rest]
+        results = [self._send_one(first[0], first[1], action)]
+        results.extend(future.result() for future in futures)
+        self.target_results = results
+
+        succeeded = [r for r in results if r.success]
+        if len(succeeded) == len(results):
+            if action == "start":
+                clip_name = first[1].clip_name
+                if len(results) == 1:
+                    self.log(f"Rokoko recording started (clip: {clip_name}).")
+                else:
+                    slowest = max(results, key=lambda r: r.ack_ns)
+                    self.log(f"Rokoko recording started on {len(results)} hosts (clip: {clip_name}), "
+                             f"slowest {slowest.target} {slowest.latency_ms:.1f} ms.")
+            else:
+                if len(results) == 1:
+                    self.log("Rokoko recording stopped.")
+                else:
+                    self.log(f"Rokoko recording stopped on {len(results)} hosts.")
+            return True
+
+        if len(results) > 1:
+            self.log(f"Rokoko {action} succeeded on {len(succeeded)} of {len(results)} hosts.", "error")
+        return False
+
+    def _send_one(self, target, client, action):
+        """Send one host its prepared start or stop request."""
+        label = "Rokoko" if len(self.clients) == 1 else f"Rokoko {target}"
+        result = TargetResult(target)
+        result.dispatch_ns = time.perf_counter_ns()
+        try:
+            self.tracer.mark("http_send", backend=self.name, target=str(target), action=action)
+            response = client.start() if action == "start" else client.stop()
+            result.ack_ns = time.perf_counter_ns()
+            self.tracer.mark("http_response", backend=self.name, target=str(target), action=action,
+                             status=response.status_code)
+
+            if response.status_code == 200:
+                result.success = True
+            else:
+                verb = "starting" if action == "start" else "stopping"
+                self.log(f"Error {verb} {label}: {response.text}", "error")
+
+        except OSError as e:
+            # Connection errors and timeouts (requests' RequestException is an OSError)
+            self.log(f"Error connecting to {label}: {e}", "error")
+        except Exception as e:
+            verb = "starting" if action == "start" else "stopping"
+            self.log(f"Unexpected error {verb} {label}: {e}", "error")
+
+        if result.ack_ns is None:
+            result.ack_ns = time.perf_counter_ns()
+        result.stamp_remote(client.clock)
+        return result
+
+
+class AudacityBackend:
+    """Starts and stops recording in Audacity through mod-script-pipe."""
+
+    name = "Audacity"
+
+    def __init__(self, log, transport=None, tracer=None, cache_file="audacity_commands.json"):
+        self.log = log
+        self.tracer = tracer or NullTracer()
+        self.transport = transport or create_transport()
+        self.commands = AudacityCommands(self.transport, cache_file=cache_file, log=log)
+        # When the current recording's capture began, from its confirmation
+        self.recording_since_ns = None
+
+    def open(self):
+        """Probe Audacity's record and stop commands in the background."""
+        if self.transport.available:
+            threading.Thread(target=self.commands.probe, daemon=True).start()
+
+    def warm(self):
+        """Make sure the pipe is connected and the commands are resolved."""
+        if not self.transport.available:
+            return False
+        try:
+            self.transport.connect()
+        except Exception as e:
+            self.log(f"Could not reach Audacity: {e}", "warning")
+            return False
+        return self.commands.resolved or self.commands.probe()
+
+    def ping(self, timeout=1.0):
+        """Send a no-op message through the pipe; return the round trip in ms or raise.
+
+        Reconnects if needed and resolves the record/stop commands after a
+        reconnect, so the record press finds them ready.
+        """
+        if not self.transport.available:
+            raise RuntimeError("pyaudacity module not available")
+        self.transport.connect()
+        began = time.perf_counter_ns()
+        self.transport.do("Message: Text=ping", timeout=timeout)
+        rtt_ms = (time.perf_counter_ns() - began) / 1e6
+        if not self.commands.resolved:
+            self.commands.probe()
+        return rtt_ms
+
+    def prepare(self, action):
+        """Make sure the record and stop commands are resolved before dispatch."""
+        if not self.transport.available:
+            if action == "start":
+                self.log("ERROR: pyaudacity module not available!", "error")
+            return False
+        if not self.commands.resolved and not self.commands.probe():
+            if action == "start":
+                self._log_troubleshooting()
+            return False
+        return True
+
+    def start(self):
+        """Start Audacity recording."""
+        cmd = self.commands.record_command
+        try:
+            self.tracer.mark("audacity_send", action="start", command=cmd)
+            self.transport.do(cmd)
+            self.tracer.mark("audacity_ack", action="start", command=cmd)
+        except Exception as e:
+            # Audacity may have restarted; re-probe on the next take
+            self.commands.invalidate()
+            self.log(f"Error starting Audacity recording ({cmd}): {e}", "error")
+            self._log_troubleshooting()
+            return False
+
+        self.log(f"Audacity recording started (using: {cmd}).")
+        return True
+
+    def stop(self):
+        """Stop Audacity recording."""
+        cmd = self.commands.stop_command
+        try:
+            self.tracer.mark("audacity_send", action="stop", command=cmd)
+            self.transport.do(cmd)
+            self.tracer.mark("audacity_ack", action="stop", command=cmd)
+        except Exception as e:
+            self.commands.invalidate()
+            self.log(f"Warning: Could not stop Audacity recording. Error: {e}", "warning")
+            self.log("You may need to manually stop recording in Audacity.", "warning")
+            return False
+
+        self.log("Audacity recording stopped.")
+        return True
+
+    def confirm(self, action, deadline_ns):
+        """Read Audacity's clips until the recording is seen to run; returns when it began or ended.
+
+        Audacity has no "is recording" query, but the clip being recorded
+        grows with every block of audio it captures, so a start is
+        confirmed once the newest clip is longer than at the previous
+        poll, and began that clip's length before the poll. Stop only
+        returns once Audacity has closed the stream, so one poll is enough
+        to read where the clip ended.
+        """
+        polls = []
+
+        def check():
+            began = time.perf_counter_ns()
+            remaining = max(0.001, (deadline_ns - began) / 1e9)
+            clips = json.loads(response_payload(
+                self.transport.do("GetInfo: Type=Clips Format=JSON", timeout=remaining)) or "[]")
+            at_ns = (began + time.perf_counter_ns()) // 2
+            if not clips:
+                # Nothing was ever recorded, so nothing is recording either
+                return at_ns if action == "stop" else None
+            start = max(clip["start"] for clip in clips)
+            end = max(clip["end"] for clip in clips if clip["start"] == start)
+            length_ns = int((end - start) * 1e9)
+            if action == "stop":
+                since = self.recording_since_ns
+                self.recording_since_ns = None
+                return since + length_ns if since is not None else at_ns
+            previous = polls[-1] if polls else None
+            polls.append((start, end))
+            if previous is not None and previous[0] == start and end > previous[1]:
+                self.recording_since_ns = at_ns - length_ns
+                return self.recording_since_ns
+            return None
+
+        return poll_until(check, deadline_ns)
+
+    def close(self):
+        """Release the Audacity transport."""
+        self.transport.close()
+
+    def _log_troubleshooting(self):
+        self.log("Troubleshooting:", "warning")
+        self.log("  - Make sure Audacity is running and mod-script-pipe is enabled")
+        self.log("  - Try manually starting a recording in Audacity first")
+        self.log("  - Check that your audio device is properly configured")
+
+
+class CaptureBackend:
+    """Records audio in-process from an input source instead of driving Audacity.
+
+    The source and its ring buffer run from ``open`` on, so a start only
+    marks the ring position of the release instant. Takes are written to
+    ``capture_directory`` as ``<clip>-<date>-<time>.wav`` with a JSON file
+    of stamps next to them; ``last_take`` is the most recent one.
+    """
+
+    name = "Audio"
+
+    def __init__(self, config_manager, log, clip_name=None, tracer=None):
+        self.config_manager = config_manager
+        self.log = log
+        self.tracer = tracer or NullTracer()
+        self.clip_name = clip_name or (lambda: config_manager.get("rokoko_clip_name"))
+        self.capture = None
+        self.last_take = None
+        self.error = None
+
+    @property
+    def source_name(self):
+        return self.capture.source.name if self.capture is not None else None
+
+    def open(self):
+        """Start the input source so the first take does not wait for it."""
+        if self.capture is not None:
+            return
+        if not NUMPY_AVAILABLE:
+            self.error = "numpy is not installed (pip install numpy)"
+            self.log(f"Audio capture unavailable: {self.error}", "error")
+            return
+        try:
+            source = create_source(self.config_manager.config)
+            self.capture = AudioCapture(source, self.config_manager.get("capture_buffer_seconds"), self.log)
+            self.capture.open()
+            self.error = None
+        except Exception as e:
+            self.capture = None
+            self.error = str(e)
+            self.log(f"Could not open audio input: {e}", "error")
+
+    def warm(self):
+        """Reopen the input source if it failed to start."""
+        self.open()
+        return self.capture is not None
+
+    def ping(self, timeout=1.0):
+        """Return the age of the newest input block in ms; raise if input has stalled."""
+        if self.capture is None:
+            self.open()
+            if self.capture is None:
+                raise RuntimeError(self.error)
+        age = self.capture.input_age
+        if age is None or age > max(timeout, 0.5):
+            raise RuntimeError("no audio from the input source")
+        return age * 1000.0
+
+    def prepare(self, action):
+        """Create and preallocate the take's file before a start."""
+        if self.capture is None:
+            if action == "start":
+                self.log(f"ERROR: audio capture is not running: {self.error}", "error")
+            return False
+        if action == "stop":
+            return self.last_take is not None and self.last_take.end_position is None
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(os.path.abspath(self.config_manager.get("capture_directory")),
+                            f"{self.clip_name()}-{stamp}.wav")
+        try:
+            self.last_take = self.capture.prepare_take(path)
+        except (OSError, RuntimeError) as e:
+            self.log(f"Cannot create audio file {path}: {e}", "error")
+            return False
+        return True
+
+    def start(self):
+        """Start writing audio from the frame captured now."""
+        take = self.capture.start_take()
+        self.tracer.mark("capture_start", first_sample_ns=take.first_sample_ns)
+        self.log(f"Audio capture started ({os.path.basename(take.path)}).")
+        return True
+
+    def stop(self):
+        """End the take at the frame captured now; the file is finished in the background."""
+        take = self.capture.stop_take()
+        self.tracer.mark("capture_stop", frames=take.end_position - take.start_position)
+        self.log("Audio capture stopped.")
+        return True
+
+    def close(self):
+        """Stop the input source and finish any take in progress."""
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
@@ -0,0 +1,522 @@
+"""In-process audio capture as a low-latency alternative to recording in Audacity.
+
+An input source delivers blocks of int16 frames, each stamped with the
+``time.perf_counter_ns()`` instant of its first sample, the clock the
+coordinator releases starts with. Blocks go into a preallocated ring
+buffer that keeps running between takes; a start only marks the ring
+position of the release instant, and a writer thread drains the ring from
+there into a memory-mapped WAV file that becomes RF64 past 4 GB.
+
+Sources: ``DeviceSource`` (the system input through the optional
+``sounddevice`` package), ``SyntheticSource`` (a tone with a click every
+second) and ``FileSource`` (a WAV file played in real time), so capture can
+be tested and benchmarked on machines without a sound card. Needs numpy.
+"""
+
+import collections
+import importlib.util
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .lazy import NUMPY_AVAILABLE, np  # noqa: F401
+
+# sounddevice loads PortAudio; only look for it here and import it on first use
+SOUNDDEVICE_AVAILABLE = importlib.util.find_spec("sounddevice") is not None
+
+# Audio is appended to a take container in chunks of about this length
+CONTAINER_CHUNK_SECONDS = 0.5
+
+
+class RingBuffer:
+    """Preallocated frame ring written by one producer and read by one consumer.
+
+    ``written`` counts every frame ever written; frame ``n`` lives at row
+    ``n % capacity`` until it is overwritten ``capacity`` frames later.
+    The stamps of recent blocks map frame counts to perf_counter_ns; the
+    producer appends them under ``_lock`` and readers walk a copy.
+    """
+
+    def __init__(self, capacity, channels, sample_rate):
+        self.capacity = capacity
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.frames = np.zeros((capacity, channels), dtype=np.int16)
+        self.written = 0
+        self.blocks = collections.deque(maxlen=256)
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def write(self, block, stamp_ns):
+        """Append a block of frames whose first sample was captured at ``stamp_ns``."""
+        count = len(block)
+        position = self.written % self.capacity
+        first = min(count, self.capacity - position)
+        self.frames[position:position + first] = block[:first]
+        if first < count:
+            self.frames[:count - first] = block[first:]
+        with self._lock:
+            self.blocks.append((self.written, stamp_ns))
+        # Publish the frames only after they have been copied
+        self.written += count
+        self.ready.set()
+
+    def read(self, start, end):
+        """Return frames [start, end) as one or two contiguous arrays."""
+        first = start % self.capacity
+        last = first + (end - start)
+        if last <= self.capacity:
+            return [self.frames[first:last]]
+        return [self.frames[first:], self.frames[:last - self.capacity]]
+
+    def recent_blocks(self):
+        """Return the ``(frame, stamp_ns)`` of the recent blocks, oldest first."""
+        with self._lock:
+            return list(self.blocks)
+
+    def position_at(self, stamp_ns):
+        """Return the frame number captured at ``stamp_ns`` (may lie in the future)."""
+        reference = None
+        for frame, block_ns in reversed(self.recent_blocks()):
+            reference = (frame, block_ns)
+            if block_ns <= stamp_ns:
+                break
+        if reference is None:
+            return self.written
+        frame, block_ns = reference
+        return frame + round((stamp_ns - block_ns) * self.sample_rate / 1e9)
+
+    def stamp_of(self, position):
+        """Return the perf_counter_ns instant of frame ``position``."""
+        reference = None
+        for frame, block_ns in reversed(self.recent_blocks()):
+            reference = (frame, block_ns)
+            if frame <= position:
+                break
+        if reference is None:
+            return None
+        frame, block_ns = reference
+        return block_ns + round((position - frame) * 1e9 / self.sample_rate)
+
+
+class MmapWavWriter:
+    """Writes int16 frames into a preallocated, memory-mapped WAV file.
+
+    The header reserves a JUNK chunk that becomes the ``ds64`` chunk when
+    the data outgrows 4 GB, turning the file into RF64. Sizes are updated
+    after every write, so a crash leaves a readable file.
+    """
+
+    HEADER_SIZE = 80
+    RIFF_LIMIT = 0xFFFFFFFF
+
+    def __init__(self, path, sample_rate, channels, grow_bytes=1 << 24):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_align = 2 * channels
+        self.grow_bytes = grow_bytes
+        self.data_bytes = 0
+
+        self._file = open(path, 'w+b')
+        self._size = self.HEADER_SIZE + grow_bytes
+        self._file.truncate(self._size)
+        self._map = mmap.mmap(self._file.fileno(), self._size)
+        self._map[:self.HEADER_SIZE] = self._header()
+
+    @property
+    def frames(self):
+        return self.data_bytes // self.block_align
+
+    def write(self, frames):
+        """Append an int16 array of shape (n, channels)."""
+        data = memoryview(np.ascontiguousarray(frames)).cast('B')
+        offset = self.HEADER_SIZE + self.data_bytes
+        end = offset + len(data)
+        if end > self._size:
+            self._grow(end)
+        self._map[offset:end] = data
+        self.data_bytes += len(data)
+        self._write_sizes()
+
+    def close(self):
+        """Finish the header and cut the file to its data."""
+        if self._map is None:
+            return
+        self._write_sizes()
+        self._map.flush()
+        self._map.close()
+        self._map = None
+        self._file.truncate(self.HEADER_SIZE + self.data_bytes)
+        self._file.close()
+
+    def discard(self):
+        """Close and delete the file, for a take that never started."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _header(self):
+        byte_rate = self.sample_rate * self.block_align
+        return b"".join([
+            struct.pack("<4sI4s", b"RIFF", self.HEADER_SIZE - 8, b"WAVE"),
+            struct.pack("<4sI", b"JUNK", 28), bytes(28),
+            struct.pack("<4sIHHIIHH", b"fmt ", 16, 1, self.channels, self.sample_rate,
+                        byte_rate, self.block_align, 16),
+            struct.pack("<4sI", b"data", 0),
+        ])
+
+    def _write_sizes(self):
+        riff_size = self.HEADER_SIZE - 8 + self.data_bytes
+        if riff_size <= self.RIFF_LIMIT:
+            struct.pack_into("<4sI", self._map, 0, b"RIFF", riff_size)
+            struct.pack_into("<I", self._map, self.HEADER_SIZE - 4, self.data_bytes)
+        else:
+            struct.pack_into("<4sI", self._map, 0, b"RF64", 0xFFFFFFFF)
+            struct.pack_into("<4sIQQQI", self._map, 12, b"ds64", 28,
+                             riff_size, self.data_bytes, self.frames, 0)
+            struct.pack_into("<I", self._map, self.HEADER_SIZE - 4, 0xFFFFFFFF)
+
+    def _grow(self, needed):
+        self._map.flush()
+        self._map.close()
+        self._size = max(needed, self._size + self.grow_bytes)
+        self._file.truncate(self._size)
+        self._map = mmap.mmap(self._file.fileno(), self._size)
+
+
+class _PacedSource:
+    """Base for sources that produce blocks on their own thread in real time."""
+
+    def __init__(self, sample_rate, channels, blocksize=256):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.name = type(self).__name__
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        """Call ``callback(block, stamp_ns)`` for every block until ``stop``."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self, callback):
+        """Thread function: deliver each block once its last sample is due."""
+        began_ns = time.perf_counter_ns()
+        produced = 0
+        while not self._stopped.is_set():
+            block = self.block(produced, self.blocksize)
+            due_ns = began_ns + round((produced + len(block)) * 1e9 / self.sample_rate)
+            delay = (due_ns - time.perf_counter_ns()) / 1e9
+            if delay > 0 and self._stopped.wait(delay):
+                return
+            callback(block, began_ns + round(produced * 1e9 / self.sample_rate))
+            produced += len(block)
+
+    def block(self, position, count):
+        raise NotImplementedError
+
+
+class SyntheticSource(_PacedSource):
+    """A quiet tone with a loud one-millisecond click at every whole second."""
+
+    def __init__(self, sample_rate=48000, channels=1, blocksize=256, frequency=440.0):
+        super().__init__(sample_rate, channels, blocksize)
+        self.frequency = frequency
+
+    def block(self, position, count):
+        index = np.arange(position, position + count)
+        signal = 0.05 * np.sin(2 * np.pi * self.frequency * index / self.sample_rate)
+        signal[index % self.sample_rate < self.sample_rate // 1000] = 0.9
+        samples = (signal * 32767).astype(np.int16)
+        return np.repeat(samples[:, None], self.channels, axis=1)
+
+
+class FileSource(_PacedSource):
+    """Plays a WAV file in a loop as if it came from an input device."""
+
+    def __init__(self, path, channels=1, blocksize=256):
+        from .syncoffset import _to_float, read_wav
+
+        data, sample_rate = read_wav(path)
+        mono = np.concatenate([_to_float(data[i:i + (1 << 16)]) for i in range(0, len(data), 1 << 16)])
+        if not len(mono):
+            raise ValueError(f"{path} contains no audio")
+        self.samples = (np.clip(mono, -1.0, 1.0) * 32767).astype(np.int16)
+        super().__init__(sample_rate, channels, blocksize)
+        self.name = f"file {os.path.basename(path)}"
+
+    def block(self, position, count):
+        index = np.arange(position, position + count) % len(self.samples)
+        return np.repeat(self.samples[index][:, None], self.channels, axis=1)
+
+
+class DeviceSource:
+    """Records from a system input device through sounddevice (PortAudio)."""
+
+    def __init__(self, sample_rate=48000, channels=1, device=None, blocksize=256):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.device = device
+        self.blocksize = blocksize
+        self.name = f"input device {device if device is not None else '(default)'}"
+        self._stream = None
+
+    def start(self, callback):
+        import sounddevice
+
+        block_ns = round(self.blocksize * 1e9 / self.sample_rate)
+
+        def on_audio(indata, frames, time_info, status):
+            now_ns = time.perf_counter_ns()
+            if time_info.inputBufferAdcTime:
+                # Back-date to when the ADC captured the first sample
+                stamp_ns = now_ns - round((time_info.currentTime - time_info.inputBufferAdcTime) * 1e9)
+            else:
+                stamp_ns = now_ns - block_ns
+            callback(indata, stamp_ns)
+
+        self._stream = sounddevice.InputStream(
+            samplerate=self.sample_rate, channels=self.channels, dtype="int16",
+            device=self.device, blocksize=self.blocksize, latency="low", callback=on_audio
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+def create_source(config):
+    """Return the input source named by ``capture_source``: device, synthetic or a WAV path."""
+    source = config.get("capture_source") or "device"
+    sample_rate = config.get("capture_sample_rate")
+    channels = config.get("capture_channels")
+    if source == "synthetic":
+        return SyntheticSource(sample_rate, channels)
+    if source == "device":
+        if not SOUNDDEVICE_AVAILABLE:
+            raise RuntimeError("sounddevice is not installed (pip install sounddevice)")
+        return DeviceSource(sample_rate, channels, config.get("capture_device"))
+    return FileSource(source, channels)
+
+
+class CaptureTake:
+    """One recorded file and the stamps that tie it to the take's clock."""
+
+    def __init__(self, path, writer):
+        self.path = path
+        self.writer = writer
+        self.start_position = None
+        self.end_position = None
+        self.read_position = None
+        self.first_sample_ns = None
+        self.dropped_frames = 0
+        self.container = None
+        self.container_position = None
+        self.error = None
+        self.finished = threading.Event()
+
+    @property
+    def frames(self):
+        return self.writer.frames
+
+    def attach(self, container):
+        """Also write the take's audio to the ``audio`` stream of a TakeFileWriter."""
+        self.container = container
+
+    def wait(self, timeout=None):
+        """Wait until the file is complete; returns False on timeout."""
+        return self.finished.wait(timeout)
+
+
+class AudioCapture:
+    """Keeps an input source running into a ring buffer and records takes from it.
+
+    ``prepare_take`` creates and preallocates the file ahead of the
+    release; ``start_take`` and ``stop_take`` only mark ring positions, so
+    they cost microseconds on the dispatch thread. The writer thread copies
+    the marked range to the file and finishes it once the stop position
+    has been captured.
+    """
+
+    def __init__(self, source, buffer_seconds=10.0, log=None):
+        self.source = source
+        self.log = log or (lambda message, level="info": None)
+        self.ring = RingBuffer(int(buffer_seconds * source.sample_rate), source.channels,
+                               source.sample_rate)
+        self.take = None
+        self._closed = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    @property
+    def input_age(self):
+        """Seconds since the newest block arrived, or None before the first."""
+        blocks = self.ring.recent_blocks()
+        if not blocks:
+            return None
+        frame, stamp_ns = blocks[-1]
+        return (time.perf_counter_ns() - stamp_ns) / 1e9
+
+    def open(self):
+        """Start the input source and the writer thread."""
+        if self._thread is not None:
+            return
+        self._closed.clear()
+        self.source.start(self.ring.write)
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the source, finish any take in progress and stop the writer."""
+        if self._thread is None:
+            return
+        self.source.stop()
+        take = self.take
+        if take is not None and take.start_position is None:
+            take.writer.discard()
+            self.take = take = None
+        if take is not None and take.end_position is None:
+            take.end_position = self.ring.written
+        self._closed.set()
+        self.ring.ready.set()
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+    def prepare_take(self, path):
+        """Create the file for the next take; call before ``start_take``."""
+        previous = self.take
+        if previous is not None and previous.start_position is None:
+            # Prepared for a start that never went out
+            previous.writer.discard()
+            self.take = None
+        elif previous is not None and not previous.wait(2.0):
+            raise RuntimeError("the previous take is still being written")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.take = CaptureTake(path, MmapWavWriter(path, self.source.sample_rate, self.source.channels))
+        return self.take
+
+    def start_take(self, at_ns=None):
+        """Record from the frame captured at ``at_ns`` (default now)."""
+        take = self.take
+        at_ns = time.perf_counter_ns() if at_ns is None else at_ns
+        position = max(self.ring.position_at(at_ns), self.ring.written - self.ring.capacity)
+        take.first_sample_ns = self.ring.stamp_of(position)
+        take.read_position = position
+        take.start_position = position
+        self.ring.ready.set()
+        return take
+
+    def stop_take(self, at_ns=None):
+        """End the take at the frame captured at ``at_ns`` (default now)."""
+        take = self.take
+        at_ns = time.perf_counter_ns() if at_ns is None else at_ns
+        take.end_position = max(self.ring.position_at(at_ns), take.start_position)
+        self.ring.ready.set()
+        return take
+
+    def _writer_loop(self):
+        """Thread function: drain the ring into the current take's file."""
+        while True:
+            self.ring.ready.wait(0.05)
+            self.ring.ready.clear()
+            take = self.take
+            if take is not None and take.start_position is not None and not take.finished.is_set():
+                self._drain(take)
+            if self._closed.is_set():
+                if take is not None and take.start_position is not None and not take.finished.is_set():
+                    self._finish(take)
+                return
+
+    def _drain(self, take):
+        written = self.ring.written
+        oldest = written - self.ring.capacity
+        if take.read_position < oldest:
+            take.dropped_frames += oldest - take.read_position
+            take.read_position = oldest
+        end = written if take.end_position is None else min(written, take.end_position)
+        if end > take.read_position:
+            try:
+                for part in self.ring.read(take.read_position, end):
+                    take.writer.write(part)
+            except (OSError, ValueError) as e:
+                take.error = e
+                self._finish(take)
+                return
+            take.read_position = end
+        finishing = take.end_position is not None and take.read_position >= take.end_position
+        if take.container is not None:
+            self._drain_container(take, oldest, end, finishing)
+        if finishing:
+            self._finish(take)
+
+    def _drain_container(self, take, oldest, end, finishing):
+        """Append the take's audio to its container in chunks of ``CONTAINER_CHUNK_SECONDS``."""
+        ring = self.ring
+        position = take.start_position if take.container_position is None else take.container_position
+        position = max(position, oldest)
+        if end - position < CONTAINER_CHUNK_SECONDS * ring.sample_rate and not finishing:
+            take.container_position = position
+            return
+        try:
+            take.container.add_stream("audio", [("samples", "<i2", ring.channels, "rows")],
+                                      kind="audio", sample_rate=ring.sample_rate)
+            for part in ring.read(position, end) if end > position else ():
+                count = len(part)
+                take.container.append("audio", count, ring.stamp_of(position),
+                                      ring.stamp_of(position + count - 1), [part])
+                position += count
+        except OSError as e:
+            self.log(f"Could not write audio to {take.container.path}: {e}", "error")
+            take.container = None
+        take.container_position = position
+
+    def _finish(self, take):
+        """Close the file and write the stamps next to it."""
+        wall_offset_ns = time.time_ns() - time.perf_counter_ns()
+        try:
+            take.writer.close()
+            with open(take.path + ".json", 'w') as f:
+                json.dump({
+                    "audio": os.path.basename(take.path),
+                    "sample_rate": self.source.sample_rate,
+                    "channels": self.source.channels,
+                    "frames": take.frames,
+                    "first_sample_perf_ns": take.first_sample_ns,
+                    "first_sample_wall_ns": (take.first_sample_ns + wall_offset_ns
+                                             if take.first_sample_ns is not None else None),
+                    "dropped_frames": take.dropped_frames,
+                    "source": self.source.name,
+                }, f, indent=4)
+        except OSError as e:
+            take.error = take.error or e
+        if take.error is not None:
+            self.log(f"Audio capture to {take.path} failed: {take.error}", "error")
+        elif take.dropped_frames:
+            self.log(f"Audio capture dropped {take.dropped_frames} frames; "
+                     "increase capture_buffer_seconds.", "warning")
+        take.finished.set()
@@ -0,0 +1,195 @@
+"""Clock offset between this PC and each Rokoko Studio host, from API round trips.
+
+Every response carries the host's wall-clock time in its HTTP ``Date``
+header, to the second. A request sent at local ``send_ns`` and answered
+at ``recv_ns`` saying ``D`` bounds the offset (remote minus local) to
+``[D - recv_ns, D + 1 s - send_ns]``. The estimator intersects these
+bounds over time, widened by the possible drift between the clocks, so
+the offset narrows to about one round trip. ``ClockSync`` speeds that up
+by timing probes so they straddle the host's next second boundary as
+predicted by the current estimate, which halves the uncertainty with
+every probe, the way a binary search would.
+
+Local times are ``time.perf_counter_ns()``, the clock takes are stamped
+with; remote times are nanoseconds since the epoch on the host.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+def response_time_ns(response):
+    """Return ``(remote_ns, quantum_ns)`` from a response's Date header, or None."""
+    date = response.headers.get("Date")
+    if not date:
+        return None
+    try:
+        return int(parsedate_to_datetime(date).timestamp()) * 1_000_000_000, 1_000_000_000
+    except (TypeError, ValueError):
+        return None
+
+
+class ClockEstimator:
+    """Filtered offset and uncertainty of one remote clock from local perf_counter_ns.
+
+    ``drift_ppm`` bounds how fast the two clocks may drift apart. A sample
+    that contradicts the current bounds means the remote clock was
+    stepped; the estimate then restarts from that sample.
+    """
+
+    def __init__(self, drift_ppm=50.0):
+        self.drift_ppm = drift_ppm
+        self.low = None
+        self.high = None
+        self.updated_ns = None
+        self.samples = 0
+        self.steps = 0
+        self._lock = threading.Lock()
+
+    def add(self, send_ns, recv_ns, remote_ns, quantum_ns=0):
+        """Feed one round trip that saw ``remote_ns`` (truncated to ``quantum_ns``)."""
+        low = remote_ns - recv_ns
+        high = remote_ns + quantum_ns - send_ns
+        with self._lock:
+            if self.low is not None:
+                current_low, current_high = self._bounds(send_ns)
+                narrowed_low, narrowed_high = max(low, current_low), min(high, current_high)
+                if narrowed_low <= narrowed_high:
+                    low, high = narrowed_low, narrowed_high
+                else:
+                    self.steps += 1
+            self.low, self.high, self.updated_ns = low, high, recv_ns
+            self.samples += 1
+
+    def add_response(self, send_ns, recv_ns, response):
+        """Feed a round trip from the Date header of its response; ignored without one."""
+        remote = response_time_ns(response)
+        if remote is not None:
+            self.add(send_ns, recv_ns, remote[0], remote[1])
+
+    @property
+    def known(self):
+        return self.low is not None
+
+    @property
+    def offset_ns(self):
+        """Best estimate of remote minus local time, or None."""
+        if self.low is None:
+            return None
+        return (self.low + self.high) // 2
+
+    def wall_offset_ns(self):
+        """Best estimate of the remote clock minus ``time.time_ns()``, or None."""
+        if self.low is None:
+            return None
+        return self.offset_ns - (time.time_ns() - time.perf_counter_ns())
+
+    def uncertainty_ns(self, at_ns=None):
+        """Half the width of the offset bounds at local time ``at_ns`` (default now)."""
+        if self.low is None:
+            return None
+        low, high = self._bounds(time.perf_counter_ns() if at_ns is None else at_ns)
+        return (high - low) // 2
+
+    def to_remote(self, local_ns):
+        """Return ``(remote_ns, uncertainty_ns)`` for a perf_counter_ns instant, or None."""
+        with self._lock:
+            if self.low is None:
+                return None
+            low, high = self._bounds(local_ns)
+        return local_ns + (low + high) // 2, (high - low) // 2
+
+    def next_probe_ns(self, now_ns, rtt_ns, quantum_ns=1_000_000_000):
+        """Local instant to send the next probe so it straddles a predicted remote second boundary."""
+        if self.low is None:
+            return now_ns
+        offset = self.offset_ns
+        boundary = ((now_ns + offset + rtt_ns) // quantum_ns + 1) * quantum_ns
+        return boundary - offset - rtt_ns // 2
+
+    def _bounds(self, at_ns):
+        widen = abs(at_ns - self.updated_ns) * self.drift_ppm // 1_000_000
+        return self.low - int(widen), self.high + int(widen)
+
+
+class ClockSync:
+    """Probes every Rokoko host in the background to keep its ClockEstimator tight.
+
+    Probes go out about once a second, timed to straddle the host's next
+    second boundary, until the uncertainty is below ``target_ms`` (or one
+    round trip, which is as good as it gets); after that one every
+    ``interval`` seconds keeps up with drift. Probing pauses while
+    ``busy`` (the coordinator's start/stop event) is set.
+    """
+
+    def __init__(self, backend, interval=10.0, target_ms=1.0, busy=None, log=None):
+        self.backend = backend
+        self.interval = interval
+        self.target_ns = int(target_ms * 1e6)
+        self.busy = busy or threading.Event()
+        self.log = log or (lambda message, level="info": None)
+        self._closed = threading.Event()
+        self._thread = None
+        self._reported = set()
+        # Shortest probe round trip per host: the best resolution a probe can give
+        self._best_rtt = {}
+
+    def start(self):
+        """Start probing in the background; does nothing when ``interval`` is 0."""
+        if self._thread is not None or not self.interval:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def probe(self, target, client):
+        """Send one probe to ``client`` at the instant its estimator asks for."""
+        rtt_ns = self._best_rtt.get(target, 0)
+        now = time.perf_counter_ns()
+        send_at = client.clock.next_probe_ns(now, rtt_ns)
+        if send_at - now > 2_000_000_000:
+            return
+        if send_at > now and self._closed.wait((send_at - now) / 1e9):
+            return
+        if self.busy.is_set():
+            return
+        try:
+            rtt_ns = int(client.ping(timeout=1.0) * 1e6)
+        except Exception:
+            return
+        self._best_rtt[target] = min(rtt_ns, self._best_rtt.get(target, rtt_ns))
+        if target not in self._reported and self.settled(target, client):
+            self._reported.add(target)
+            self.log(f"Rokoko {target} clock offset {client.clock.wall_offset_ns() / 1e6:+.1f} ms "
+                     f"(± {client.clock.uncertainty_ns() / 1e6:.2f} ms).")
+
+    def settled(self, target, client):
+        """True once a host's offset is as tight as its round trips allow."""
+        uncertainty = client.clock.uncertainty_ns()
+        if uncertainty is None:
+            return False
+        return uncertainty <= max(self.target_ns, self._best_rtt.get(target, 0))
+
+    def _loop(self):
+        """Thread function: probe each host until tight, then every ``interval`` seconds."""
+        while not self._closed.is_set():
+            tight = True
+            for target, client in list(self.backend.clients.items()):
+                if self._closed.is_set():
+                    return
+                if not self.settled(target, client):
+                    tight = False
+                    self.probe(target, client)
+            if tight:
+                self._closed.wait(self.interval)
+                for target, client in list(self.backend.clients.items()):
+                    if not self._closed.is_set():
+                        self.probe(target, client)
+            else:
+                self._closed.wait(0.05)
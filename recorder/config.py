@@ -0,0 +1,111 @@
+"""JSON-backed application configuration."""
+
+import json
+import os
+
+
+class ConfigManager:
+    """Manages configuration loading and saving from JSON file."""
+    
+    DEFAULT_CONFIG = {
+        "rokoko_ip": "192.168.0.163",
+        "rokoko_port": 14053,
+        "rokoko_api_key": "1234",
+        "rokoko_clip_name": "Clip",
+        "rokoko_frame_rate": 60,
+        "rokoko_targets": [],
+        "audacity_transport": "native",
+        "trace_directory": "traces",
+        "control_host": "127.0.0.1",
+        "control_port": 14060,
+        "log_directory": "logs",
+        "log_max_bytes": 5000000,
+        "log_rotate_hours": 24,
+        "log_max_files": 50,
+        "log_retention_days": 30,
+        "sync_offset_enabled": False,
+        "sync_directory": "takes",
+        "rokoko_export_directory": "",
+        "sync_mocap_wait": 120,
+        "sync_max_offset": 10.0,
+        "export_enabled": False,
+        "export_directory": "exports",
+        "export_rokoko_command": "",
+        "export_workers": 2,
+        "export_max_pending": 4,
+        "shot_clip_format": "{scene}_T{take:02d}",
+        "health_check_interval": 2.0,
+        "health_check_timeout": 1.0,
+        "confirm_timeout": 1.0,
+        "rollback_timeout": 3.0,
+        "clock_sync_interval": 10.0,
+        "toggle_debounce": 0.25,
+        "marker_hotkey": "<F9>",
+        "stall_threshold_ms": 250,
+        "profile_session": False,
+        "profile_directory": "profiles",
+        "audio_backend": "audacity",
+        "capture_source": "device",
+        "capture_device": None,
+        "capture_sample_rate": 48000,
+        "capture_channels": 1,
+        "capture_buffer_seconds": 10,
+        "capture_directory": "takes",
+        "mocap_stream_enabled": False,
+        "mocap_stream_host": "0.0.0.0",
+        "mocap_stream_port": 14043
+    }
+    
+    def __init__(self, config_file="config.json"):
+        self.config_file = config_file
+        self._listeners = []
+        self.config = self.load_config()
+    
+    def load_config(self):
+        """Load configuration from JSON file, create with defaults if not exists."""
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
+                # Merge with defaults to ensure all keys exist
+                merged = self.DEFAULT_CONFIG.copy()
+                merged.update(config)
+                return merged
+            except Exception as e:
+                print(f"Error loading config: {e}")
+                return self.DEFAULT_CONFIG.copy()
+        else:
+            # Create default config file
+            self.save_config(self.DEFAULT_CONFIG.copy())
+            return self.DEFAULT_CONFIG.copy()
+    
+    def save_config(self, config=None):
+        """Save configuration to JSON file."""
+        if config is None:
+            config = self.config
+        try:
+            with open(self.config_file, 'w') as f:
+                json.dump(config, f, indent=4)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+            return False
+        self.config = config
+        # The file is written; a listener that fails does not undo that
+        for callback in self._listeners:
+            try:
+                callback(config)
+            except Exception as e:
+                print(f"Error applying saved config: {e}")
+        return True
+    
+    def get(self, key, default=None):
+        """Get a configuration value."""
+        return self.config.get(key, default)
+    
+    def set(self, key, value):
+        """Set a configuration value; listeners only hear of it on the next ``save_config``."""
+        self.config[key] = value
+    
+    def add_listener(self, callback):
+        """Register a callback invoked with the new config after each save."""
+        self._listeners.append(callback)
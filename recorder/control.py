@@ -0,0 +1,172 @@
+"""Local control API for triggering takes without the GUI.
+
+Clients connect over TCP and send one command per line; every command gets
+one JSON line back. Connections may stay open, so a foot pedal or show
+control system only pays for writing a line to an already open socket::
+
+    start
+    {"ok": true, "state": "recording", "take": 1, ...}
+    status
+    {"ok": true, "state": "recording", "take": 1, ...}
+    stop
+    {"ok": true, "state": "idle", "take": 1, ...}
+
+Commands: ``start``, ``stop``, ``toggle``, ``status``, ``arm [HH:MM:SS[.fff]|HH:MM:SS:FF]``,
+``disarm``, ``marker [text]``, ``shotlist <path>`` (empty path to clear), ``skip``
+and ``ping``.
+"""
+
+import json
+import socket
+import socketserver
+import threading
+import time
+
+
+class RecorderController:
+    """Blocking front to a RecorderEngine for the control server.
+
+    Each method waits for its command to run on the engine's worker and
+    returns the status dict, except ``arm``, which returns once armed.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def state(self):
+        return self.engine.state
+
+    def status(self, error=None):
+        """Return the current state without touching the backends."""
+        return self.engine.status(error)
+
+    def start(self):
+        """Start a take now and return once both backends have answered."""
+        return self.engine.submit("start").result()
+
+    def arm(self, at=None):
+        """Arm a take for a scheduled instant; returns once armed."""
+        return self.engine.submit("arm", at).result()
+
+    def stop(self):
+        """Stop the running take, or cancel an armed one."""
+        return self.engine.submit("stop").result()
+
+    def toggle(self):
+        """Start or stop, like the GUI's RECORD/STOP button."""
+        return self.engine.toggle().result()
+
+    def disarm(self):
+        """Cancel an armed take that has not started yet."""
+        return self.engine.submit("disarm").result()
+
+    def mark(self, text=None):
+        """Drop a timeline marker in the running take."""
+        return self.engine.mark(text).result()
+
+    def load_shot_list(self, path=None):
+        """Load a shot list, or clear it when ``path`` is None."""
+        return self.engine.submit("shotlist", path).result()
+
+    def skip(self):
+        """Skip the current take of the shot list."""
+        return self.engine.submit("skip").result()
+
+
+class ControlServer:
+    """Serves the line protocol for a RecorderController on a local TCP port.
+
+    Each connection gets its own thread, which hands every command to the
+    recorder engine as soon as its line has been read and waits for the
+    reply.
+    """
+
+    def __init__(self, controller, host="127.0.0.1", port=14060, log=None):
+        self.controller = controller
+        self.log = log or (lambda message, level="info": None)
+        self._server = socketserver.ThreadingTCPServer((host, port), self._make_handler(), bind_and_activate=False)
+        self._server.allow_reuse_address = True
+        self._server.daemon_threads = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        """Start accepting connections in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        """Accept connections on the calling thread until ``stop``."""
+        self._server.serve_forever()
+
+    def stop(self):
+        """Stop accepting connections."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, line):
+        """Run one command line and return its reply dict."""
+        command, _, argument = line.strip().partition(" ")
+        command = command.lower()
+        argument = argument.strip() or None
+
+        if command == "start":
+            return self.controller.start()
+        if command == "stop":
+            return self.controller.stop()
+        if command == "toggle":
+            return self.controller.toggle()
+        if command == "status":
+            return self.controller.status()
+        if command == "arm":
+            return self.controller.arm(argument)
+        if command == "disarm":
+            return self.controller.disarm()
+        if command == "marker":
+            return self.controller.mark(argument)
+        if command == "shotlist":
+            return self.controller.load_shot_list(argument)
+        if command == "skip":
+            return self.controller.skip()
+        if command == "ping":
+            return {"ok": True, "pong": time.time()}
+        return {"ok": False, "error": f"unknown command: {command}"}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            # Replies are single small writes; send them straight away
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                peer = "%s:%s" % self.client_address[:2]
+                server.log(f"Control client connected: {peer}")
+                for raw in self.rfile:
+                    line = raw.decode("utf-8", "replace").strip()
+                    if not line:
+                        continue
+                    try:
+                        reply = server.handle(line)
+                    except Exception as e:
+                        server.log(f"Control command '{line}' failed: {e}", "error")
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+                server.log(f"Control client disconnected: {peer}")
+
+        return Handler
+
+
+def send_command(command, host="127.0.0.1", port=14060, timeout=10.0):
+    """Send one command to a running ControlServer and return its reply."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall((command + "\n").encode("utf-8"))
+        with sock.makefile("rb") as reader:
+            return json.loads(reader.readline())
@@ -0,0 +1,419 @@
+"""Front-end independent recording logic behind the record button."""
+
+import os
+import threading
+import time
+
+from .audacity import create_transport
+from .backends import AudacityBackend, CaptureBackend, RokokoBackend
+from .clocksync import ClockSync
+from .export import AudacityExport, ExportJob, ExportPipeline
+from .health import HealthMonitor
+from .markers import AudacityLabels, MarkerBatcher
+from .mocapstream import MocapStreamReceiver
+from .shotlist import ShotList
+from .sync import BackendTiming, PhaseResult, RecordingCoordinator, next_start_instant, wall_to_perf_ns
+from .syncoffset import SyncOffsetStage
+from .takefile import TakeFileWriter
+from .trace import NullTracer
+
+
+class Recorder:
+    """Owns the Rokoko and audio backends and starts/stops them together.
+
+    Audio is recorded by Audacity, or in-process by a CaptureBackend when
+    ``audio_backend`` is ``"capture"``. The GUI, the benchmark and any
+    other front end drive recording through this class; it never touches
+    a UI toolkit. ``log`` receives ``(message, level)`` like
+    ``RokokoAVRecorderApp.log``.
+    """
+
+    def __init__(self, config_manager, log=None, tracer=None, audacity_transport=None):
+        self.config_manager = config_manager
+        self.log = log or (lambda message, level="info": None)
+        self.tracer = tracer or NullTracer()
+
+        transport = audacity_transport or create_transport(config_manager.get("audacity_transport"))
+        self.rokoko_backend = RokokoBackend(config_manager, self.log, tracer=self.tracer)
+        # Keep the Audacity command cache next to the config file
+        cache_file = os.path.join(os.path.dirname(config_manager.config_file), "audacity_commands.json")
+        self.audacity_backend = AudacityBackend(
+            self.log, transport, tracer=self.tracer, cache_file=cache_file
+        )
+        if config_manager.get("audio_backend") == "capture":
+            self.audio_backend = CaptureBackend(
+                config_manager, self.log, clip_name=lambda: self.rokoko_backend.current_clip,
+                tracer=self.tracer
+            )
+        else:
+            self.audio_backend = self.audacity_backend
+        self.coordinator = RecordingCoordinator(
+            [self.rokoko_backend, self.audio_backend], log=self.log, tracer=self.tracer,
+            confirm_timeout=config_manager.get("confirm_timeout"),
+            rollback_timeout=config_manager.get("rollback_timeout")
+        )
+        self.health = HealthMonitor(
+            self.coordinator.backends, log=self.log,
+            interval=config_manager.get("health_check_interval"),
+            timeout=config_manager.get("health_check_timeout"),
+            busy=self.coordinator.busy
+        )
+        self.clock_sync = ClockSync(
+            self.rokoko_backend, interval=config_manager.get("clock_sync_interval"),
+            busy=self.coordinator.busy, log=self.log
+        )
+        self.sync_offset = SyncOffsetStage(config_manager, self.log)
+        self.exports = ExportPipeline(
+            config_manager.get("export_workers"), config_manager.get("export_max_pending"),
+            busy=self.coordinator.busy, log=self.log
+        )
+        self.audacity_export = AudacityExport(transport)
+        self.markers = MarkerBatcher(busy=self.coordinator.busy, log=self.log)
+        self.audacity_labels = None
+        if self.audio_backend is self.audacity_backend:
+            self.audacity_labels = AudacityLabels(transport, self.log)
+        self.mocap_stream = None
+        if config_manager.get("mocap_stream_enabled"):
+            self.mocap_stream = MocapStreamReceiver(
+                config_manager.get("mocap_stream_host"), config_manager.get("mocap_stream_port"), log=self.log
+            )
+        self.shot_list = None
+        # Container of the current take's stream and audio data, if any
+        self.take_file = None
+        self._take_parts = []
+        self._take_started = None
+
+    def open(self):
+        """Open backend connections ahead of the first take and start health checks."""
+        self.coordinator.open()
+        self.health.start()
+        self.clock_sync.start()
+        if self.mocap_stream is not None:
+            try:
+                self.mocap_stream.open()
+                self.log(f"Listening for the Rokoko mocap stream on UDP port {self.mocap_stream.port}.")
+            except OSError as e:
+                self.log(f"Cannot receive the mocap stream on UDP port {self.mocap_stream.port}: {e}", "error")
+                self.mocap_stream = None
+
+    def close(self):
+        """Stop health checks and release backend connections."""
+        self.health.close()
+        self.clock_sync.close()
+        self.markers.close()
+        self.exports.close()
+        self.coordinator.close()
+        if self.mocap_stream is not None:
+            self.mocap_stream.close()
+        if self.take_file is not None:
+            self._close_take_file().join(timeout=30.0)
+
+    def load_shot_list(self, path):
+        """Record the takes of a shot list back to back; returns the ShotList.
+
+        Requests for every clip are prepared now, so advancing to the next
+        take after a stop only swaps references.
+        """
+        shot_list = ShotList(path, self.config_manager.get("shot_clip_format"))
+        self.shot_list = shot_list
+        self.rokoko_backend.use_clips(shot_list.clip_names)
+        self.log(f"Loaded shot list {os.path.basename(path)}: {len(shot_list.entries)} takes.")
+        self._select_shot()
+        return shot_list
+
+    def clear_shot_list(self):
+        """Go back to recording to the configured clip name."""
+        self.shot_list = None
+        self.rokoko_backend.use_clips([])
+        self.rokoko_backend.select_clip(None)
+
+    def skip_take(self):
+        """Skip the current take of the shot list."""
+        if self.shot_list is not None:
+            self.shot_list.skip()
+            self._select_shot()
+
+    def start(self):
+        """Start recording on Rokoko and Audacity and return the PhaseResult."""
+        self.log("Starting recording...")
+        refused = self._refuse_unhealthy() or self._refuse_export_backlog()
+        if refused is not None:
+            return refused
+
+        # Start Rokoko and Audacity together, with Audacity's exports out of the way
+        self.exports.hold()
+        result = self.coordinator.start()
+        if not result.success:
+            self.exports.release()
+        self._take_begun(result)
+        self._log_start(result)
+        return result
+
+    def arm(self, at=None):
+        """Warm every backend, then start recording at a precise wall-clock instant.
+
+        ``at`` is None for the next whole second, or a time of day/timecode
+        as accepted by ``next_start_instant``. Blocks until the start has
+        fired (or ``disarm`` was called) and returns the PhaseResult, or
+        None when ``at`` is invalid.
+        """
+        refused = self._refuse_unhealthy() or self._refuse_export_backlog()
+        if refused is not None:
+            return refused
+        self.exports.hold()
+        self.log("Arming: warming up connections...")
+        self.coordinator.warm()
+
+        try:
+            target = next_start_instant(at, self.config_manager.get("rokoko_frame_rate"))
+        except ValueError as e:
+            self.log(str(e), "error")
+            self.exports.release()
+            return None
+
+        at_ns = wall_to_perf_ns(int(target.timestamp() * 1e9))
+        self.log(f"Armed: recording starts at {target.strftime('%H:%M:%S.%f')[:-3]}.")
+        result = self.coordinator.start(at_ns=at_ns)
+        if not result.success:
+            self.exports.release()
+        if result.cancelled:
+            return result
+
+        self._take_begun(result)
+        self._log_start(result)
+        self.log(result.deviation_summary())
+        return result
+
+    def disarm(self):
+        """Cancel a scheduled start that has not fired yet."""
+        self.coordinator.cancel()
+
+    def mark(self, text=None):
+        """Drop a timeline marker in the running take; returns it, or None when not recording.
+
+        The marker is stamped here and written out in the background, to
+        the take file and as an Audacity label.
+        """
+        at_ns = time.perf_counter_ns()
+        started = self._take_started
+        if started is None:
+            return None
+        marker = self.markers.add(text, at_ns)
+        offset = (at_ns - started[1]) / 1e9
+        self.tracer.mark("marker", index=marker["index"], text=marker["text"], t_ns=at_ns)
+        self.log(f"{marker['text']} at {int(offset // 60):02d}:{offset % 60:06.3f} into the take.")
+        return marker
+
+    def stop(self):
+        """Stop recording on Rokoko and Audacity and return the PhaseResult."""
+        self.log("Stopping recording...")
+
+        # Stop Audacity and Rokoko together
+        result = self.coordinator.stop()
+        self.exports.release()
+        if self.mocap_stream is not None and self.mocap_stream.take is not None:
+            self.mocap_stream.stop_take(result.released_ns)
+        self._stamp_clocks("stop")
+        if self._take_started is not None:
+            # Labels that Audacity refused while recording go in now
+            markers = self.markers.finish(result.released_ns)
+            if self.take_file is not None:
+                self._take_parts.append(markers)
+        if self.take_file is not None:
+            self._close_take_file()
+
+        if result.success:
+            self.log("Recording stopped successfully.")
+            self.log(result.summary())
+        else:
+            self.log(f"Warning: Issues stopping {', '.join(result.failed)}", "warning")
+
+        self.log("Recording complete.")
+        self.log("  - Rokoko: Check Rokoko Studio for mocap file")
+        captured = getattr(self.audio_backend, "last_take", None)
+        if captured is not None:
+            self.log(f"  - Audio: {captured.path}")
+        else:
+            self.log("  - Audacity: Audio recorded (save project manually if needed)")
+
+        clip_name = self.rokoko_backend.current_clip
+        if self.shot_list is not None:
+            self.shot_list.stopped(result.success, result.failed)
+            self._select_shot()
+
+        started, self._take_started = self._take_started, None
+        if result.success and started is not None:
+            if self.config_manager.get("export_enabled") or self.config_manager.get("sync_offset_enabled"):
+                self._export_take(clip_name, started, captured)
+        return result
+
+    def _refuse_unhealthy(self):
+        """Return a failed PhaseResult without contacting anything if a backend is known down."""
+        unhealthy = self.health.unhealthy()
+        if not unhealthy:
+            return None
+        snapshot = self.health.snapshot()
+        for name in unhealthy:
+            health = snapshot[name]
+            self.log(f"Not starting: {name} was unreachable {health.age:.1f} s ago ({health.error})", "error")
+        return PhaseResult("start", [BackendTiming(name) for name in unhealthy], None)
+
+    def _refuse_export_backlog(self):
+        """Return a failed PhaseResult while the post-take exports are too far behind."""
+        if not self.exports.full:
+            return None
+        self.log(f"Not starting: {self.exports.backlog()} take exports are still running "
+                 f"(export_max_pending is {self.exports.max_pending}).", "error")
+        return PhaseResult("start", [BackendTiming("Export")], None)
+
+    def _export_take(self, clip_name, started, captured):
+        """Queue the take's audio and mocap exports and its sync offset on the export pipeline.
+
+        With only the sync offset enabled the audio goes to ``sync_directory``
+        and Rokoko is not asked to export; either way the Audacity export
+        keeps off the pipe while a take records.
+        """
+        exporting = self.config_manager.get("export_enabled")
+        started_at = started[0]
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started_at))
+        directory = self.config_manager.get("export_directory" if exporting else "sync_directory")
+        path = os.path.join(os.path.abspath(directory), f"{clip_name}-{stamp}.wav")
+        steps = []
+
+        if captured is not None:
+            def audio(job):
+                if not captured.wait(self.sync_offset.export_timeout) or captured.error is not None:
+                    raise OSError(f"the captured audio file is not complete ({captured.error})")
+                return captured.path
+            steps.append(("audio", audio, False))
+        else:
+            try:
+                # Where this take sits in the project, read now, before the next take adds a clip
+                region = self.audacity_export.locate()
+            except Exception as e:
+                self.log(f"Cannot export {clip_name}'s audio: {e}", "error")
+            else:
+                def audio(job):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    return self.audacity_export.export(path, region)
+                steps.append(("audio", audio, True))
+
+        command = self.config_manager.get("export_rokoko_command")
+        if exporting and command:
+            steps.append(("mocap", lambda job: self.rokoko_backend.export(command, clip_name), False))
+
+        if steps and steps[0][0] == "audio" and self.config_manager.get("sync_offset_enabled"):
+            def sync_offset(job):
+                if "audio" not in job.results:
+                    raise OSError("no audio was exported")
+                return self.sync_offset.run(clip_name, started_at, job.results["audio"])
+            steps.append(("sync offset", sync_offset, False))
+
+        if steps:
+            self.exports.submit(ExportJob(clip_name, steps))
+            self.log(f"Exporting {clip_name} in the background ({', '.join(step[0] for step in steps)}); "
+                     f"{self.exports.backlog()} export(s) pending.")
+
+    def _take_begun(self, result):
+        """Remember when a successful take started, for the post-take sync offset."""
+        if result.success:
+            self._take_started = (time.time(), result.released_ns)
+            if self.shot_list is not None:
+                self.shot_list.started()
+            self._open_take_file(result.released_ns)
+            self._stamp_clocks("start")
+            self._begin_markers(result)
+
+    def _begin_markers(self, result):
+        """Point this take's markers at its take file and Audacity's timeline."""
+        sinks = []
+        container = self.take_file
+        if container is not None:
+            sinks.append(lambda markers, final: container.append_events("markers", markers))
+        timing = next((t for t in result.timings if t.name == self.audacity_backend.name), None)
+        if self.audacity_labels is not None and timing is not None:
+            self.audacity_labels.begin(timing.ack_ns)
+            sinks.append(self.audacity_labels.write)
+        self.markers.begin(sinks)
+
+    def _stamp_clocks(self, action):
+        """Record when each Rokoko host acted, on its own clock as well as ours."""
+        events = self.rokoko_backend.clock_events(action)
+        for event in events:
+            self.tracer.mark("clock", **event)
+            self.log(f"Rokoko {event['host']} {action} at its "
+                     f"{time.strftime('%H:%M:%S', time.localtime(event['remote_wall_ns'] // 10**9))}"
+                     f".{event['remote_wall_ns'] // 10**6 % 1000:03d} "
+                     f"(offset {event['offset_ns'] / 1e6:+.1f} ms ± {event['uncertainty_ns'] / 1e6:.1f} ms).")
+        if events and self.take_file is not None:
+            try:
+                self.take_file.append_events("clock", events)
+            except OSError as e:
+                self.log(f"Could not write clock stamps to {self.take_file.path}: {e}", "warning")
+
+    def _open_take_file(self, released_ns):
+        """Create the take's container for the live mocap stream and in-process audio."""
+        captured = getattr(self.audio_backend, "last_take", None)
+        stream = self.mocap_stream
+        if stream is None and captured is None:
+            return
+        clip_name = self.rokoko_backend.current_clip
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(os.path.abspath(self.config_manager.get("capture_directory")),
+                            f"{clip_name}-{stamp}.rktake")
+        try:
+            container = TakeFileWriter(path, {
+                "clip": clip_name,
+                "start_perf_ns": released_ns,
+                "start_wall_ns": released_ns + time.time_ns() - time.perf_counter_ns(),
+            })
+        except OSError as e:
+            self.log(f"Cannot create take file {path}: {e}", "error")
+            return
+        self.take_file = container
+        self._take_parts = []
+        if captured is not None:
+            captured.attach(container)
+            self._take_parts.append(captured)
+        if stream is not None:
+            last = stream.last_frame_ns
+            if last is None or released_ns - last > 1e9:
+                self.log("Mocap stream: no frames from Rokoko Studio; is custom streaming (JSON v3) "
+                         f"to port {stream.port} enabled?", "warning")
+            self._take_parts.append(stream.start_take(container, released_ns))
+
+    def _close_take_file(self):
+        """Close the take's container once everything in it has been written."""
+        container, parts = self.take_file, self._take_parts
+        self.take_file, self._take_parts = None, []
+
+        def close():
+            for part in parts:
+                part.wait(30.0)
+            try:
+                container.close()
+            except OSError as e:
+                self.log(f"Could not finish take file {container.path}: {e}", "error")
+
+        thread = threading.Thread(target=close, daemon=True)
+        thread.start()
+        return thread
+
+    def _select_shot(self):
+        """Point Rokoko at the shot list's current take."""
+        entry = self.shot_list.current
+        if entry is None:
+            self.rokoko_backend.select_clip(None)
+            self.log("Shot list complete; recording to the configured clip name again.")
+            return
+        self.rokoko_backend.select_clip(entry["clip_name"])
+        self.log(f"Next take: {entry['clip_name']} ({self.shot_list.progress()}).")
+
+    def _log_start(self, result):
+        if result.success:
+            self.log(f"Recording started successfully on both Rokoko and {self.audio_backend.name}.")
+            self.log(result.summary())
+        else:
+            error_msg = "Failed to start recording: "
+            error_msg += ", ".join(result.failed)
+            self.log(error_msg, "error")
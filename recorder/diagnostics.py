@@ -0,0 +1,230 @@
+"""Event-loop stall detection and opt-in session profiling.
+
+``StallWatchdog`` measures how late a UI event loop runs a periodic
+heartbeat and, when it is stuck, samples the stack of every thread while
+it still is, so the log shows what the loop was doing instead of where it
+resumed. ``SessionProfiler`` runs cProfile, a stack sampler and
+tracemalloc for a whole session and writes a report when it is closed.
+Neither costs anything unless it is created; the profilers are only
+imported when profiling starts.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from .trace import NullTracer, percentile
+
+
+def thread_stacks(limit=8):
+    """Return ``[(thread name, ident, [frame lines, innermost last])]`` for every thread."""
+    import traceback
+
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        lines = [f"{os.path.basename(f.filename)}:{f.lineno} in {f.name}"
+                 for f in traceback.extract_stack(frame, limit)]
+        stacks.append((names.get(ident, f"thread {ident}"), ident, lines))
+    return stacks
+
+
+class StallWatchdog:
+    """Logs UI event-loop stalls with a stack sample of every thread.
+
+    ``start(schedule)`` is called on the loop's thread and keeps a
+    heartbeat going through ``schedule(delay_ms, callback)`` (``root.after``
+    for Tk). Every beat records how late it ran. A monitor thread notices
+    a beat overdue by more than ``threshold`` seconds and samples every
+    thread's stack right then; the next beat logs the stall with that
+    sample.
+
+    ``lags`` keeps every beat's lag up to ``LAG_SAMPLES`` and from then on
+    a uniform random sample of all of them, so the summary's percentiles
+    cover the whole session in bounded memory; the count and the maximum
+    are kept exactly.
+    """
+
+    LAG_SAMPLES = 10000
+
+    def __init__(self, threshold=0.25, interval=0.1, log=None, tracer=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.log = log or (lambda message, level="info": None)
+        self.tracer = tracer or NullTracer()
+        self.lags = []
+        self.beats = 0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._random = random.Random()
+        self._schedule = None
+        self._loop_ident = None
+        self._expected = None
+        self._sample = None
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self, schedule):
+        """Start the heartbeat on the calling (event loop) thread and the monitor thread."""
+        self._schedule = schedule
+        self._loop_ident = threading.get_ident()
+        self._expected = time.perf_counter() + self.interval
+        schedule(int(self.interval * 1000), self._beat)
+        self._thread = threading.Thread(target=self._monitor, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def summary(self):
+        """One line with the loop's lag percentiles and the number of stalls."""
+        if not self.beats:
+            return "UI loop: no heartbeats measured."
+        return (f"UI loop lag p50 {percentile(self.lags, 50) * 1e3:.1f} ms, "
+                f"p99 {percentile(self.lags, 99) * 1e3:.1f} ms, max {self.max_lag * 1e3:.1f} ms "
+                f"over {self.beats} beats; {self.stalls} stall(s) over {self.threshold * 1e3:.0f} ms.")
+
+    def _beat(self):
+        """Heartbeat on the event loop thread."""
+        now = time.perf_counter()
+        expected = self._expected
+        lag = max(0.0, now - expected)
+        self._record_lag(lag)
+        sample, self._sample = self._sample, None
+        if lag > self.threshold:
+            self._report(lag, sample[1] if sample is not None and sample[0] == expected else None)
+        self._expected = now + self.interval
+        if not self._closed.is_set():
+            self._schedule(int(self.interval * 1000), self._beat)
+
+    def _record_lag(self, lag):
+        """Count ``lag`` and keep it in the reservoir sample (Algorithm R)."""
+        self.beats += 1
+        self.max_lag = max(self.max_lag, lag)
+        if len(self.lags) < self.LAG_SAMPLES:
+            self.lags.append(lag)
+        else:
+            slot = self._random.randrange(self.beats)
+            if slot < self.LAG_SAMPLES:
+                self.lags[slot] = lag
+
+    def _monitor(self):
+        """Thread function: sample every stack once per overdue heartbeat."""
+        while not self._closed.wait(self.threshold / 2):
+            expected = self._expected
+            if time.perf_counter() - expected > self.threshold and self._sample is None:
+                self._sample = (expected, thread_stacks())
+
+    def _report(self, lag, stacks):
+        self.stalls += 1
+        self.tracer.mark("ui_stall", lag_ms=lag * 1e3)
+        lines = [f"UI thread stalled for {lag * 1e3:.0f} ms."]
+        if stacks:
+            # The loop's own stack first: that is what held it up
+            stacks.sort(key=lambda stack: stack[1] != self._loop_ident)
+            for name, ident, frames in stacks:
+                if ident == self._thread.ident:
+                    continue
+                lines.append(f"  {name}:" + "".join(f"\n      {frame}" for frame in frames))
+        self.log("\n".join(lines), "warning")
+
+
+class SessionProfiler:
+    """Profiles a whole session and writes a report to ``directory`` on ``close``.
+
+    cProfile covers the thread that calls ``start`` (the Tk loop in the
+    GUI). A sampler thread records every thread's stack each
+    ``sample_interval`` seconds, which covers the engine, dispatch and
+    writer threads too, and tracks tracemalloc's current and peak usage.
+    ``close`` writes ``cprofile.txt``/``cprofile.pstats``, ``stacks.txt``
+    (collapsed stacks with their sample counts, for flame graph tools)
+    and ``memory.txt`` (allocation growth over the session by line).
+    """
+
+    def __init__(self, directory="profiles", sample_interval=0.01, log=None):
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.log = log or (lambda message, level="info": None)
+        self.samples = {}
+        self.memory = []
+        self._profile = None
+        self._baseline = None
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start cProfile on the calling thread, tracemalloc and the stack sampler."""
+        import cProfile
+        import tracemalloc
+
+        tracemalloc.start(10)
+        self._baseline = tracemalloc.take_snapshot()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+        self.log(f"Profiling this session; the report goes to {self.directory} on exit.")
+
+    def close(self):
+        """Stop profiling and write the report; returns its directory."""
+        import pstats
+        import tracemalloc
+
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        self._closed.set()
+        self._thread.join(timeout=1.0)
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        path = os.path.join(self.directory, datetime.now().strftime("profile-%Y%m%d-%H%M%S"))
+        os.makedirs(path, exist_ok=True)
+        self._profile.dump_stats(os.path.join(path, "cprofile.pstats"))
+        with open(os.path.join(path, "cprofile.txt"), "w") as f:
+            stats = pstats.Stats(self._profile, stream=f)
+            stats.sort_stats("cumulative").print_stats(40)
+            stats.sort_stats("tottime").print_stats(40)
+        with open(os.path.join(path, "stacks.txt"), "w") as f:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(path, "memory.txt"), "w") as f:
+            f.write(f"Peak traced memory: {peak / 1e6:.1f} MB\n")
+            for elapsed, current in self.memory[::max(1, len(self.memory) // 60)]:
+                f.write(f"  {elapsed:8.1f} s  {current / 1e6:8.1f} MB\n")
+            f.write("\nLargest growth since the session started:\n")
+            for stat in snapshot.compare_to(self._baseline, "lineno")[:30]:
+                f.write(f"{stat}\n")
+        self._profile = None
+        return path
+
+    def _sample_loop(self):
+        """Thread function: count every thread's stack, and note memory once a second."""
+        import tracemalloc
+
+        own = threading.get_ident()
+        began = time.perf_counter()
+        next_memory = began
+        while not self._closed.wait(self.sample_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join([names.get(ident, str(ident))] + stack[::-1])
+                self.samples[key] = self.samples.get(key, 0) + 1
+            now = time.perf_counter()
+            if now >= next_memory:
+                self.memory.append((now - began, tracemalloc.get_traced_memory()[0]))
+                next_memory = now + 1.0
@@ -0,0 +1,317 @@
+"""Long-lived worker that owns a Recorder's state and all of its backend I/O.
+
+Front ends never call the Recorder from their own threads. They submit
+commands (``start``, ``stop``, ``arm``, ``disarm``, ``shotlist``,
+``skip``) to a ``RecorderEngine``, which runs them one at a time on a
+single worker thread that is already waiting on its queue, so a press
+costs the same queue hand-off every time instead of a thread start.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+IDLE = "idle"
+STARTING = "starting"
+ARMED = "armed"
+RECORDING = "recording"
+STOPPING = "stopping"
+
+
+class RecorderEngine:
+    """Runs every Recorder command on one worker thread, in order.
+
+    ``submit`` checks a command against the state the queued commands
+    will leave behind, so STOP pressed while a start is still in flight
+    is queued behind it instead of racing it, and a second START is
+    refused. A start (or arm) and a stop that are both still waiting in
+    the queue cancel each other out. ``toggle`` picks start or stop the
+    same way and ignores presses within ``debounce`` seconds of the last
+    one. STOP or DISARM while armed cancels the scheduled start from the
+    calling thread, since the worker is waiting for it to fire.
+
+    Every command returns a Future of a status dict. Listeners get the
+    status on the worker thread after every state change; a GUI hands it
+    to its own thread from there. ``mark`` is the exception: markers
+    bypass the queue and are dropped on the calling thread.
+    """
+
+    def __init__(self, recorder, tracer, debounce=0.25, log=None):
+        self.recorder = recorder
+        self.tracer = tracer
+        self.debounce = debounce
+        self.log = log or recorder.log
+        self.state = IDLE
+        self.take = 0
+        self.last_result = None
+        # State once every queued command has run
+        self._intended = IDLE
+        self._last_toggle = None
+        self._disarmed = False
+        self._listeners = []
+        self._commands = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Call ``callback(status)`` on the worker thread after every state change."""
+        self._listeners.append(callback)
+
+    def open(self):
+        """Start the worker thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="recorder-engine", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=30.0):
+        """Let the worker finish the queued commands, then stop it."""
+        if self._thread is not None:
+            self._commands.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self, error=None):
+        """Return the current state without touching the backends."""
+        status = {
+            "ok": error is None,
+            "state": self.state,
+            "take": self.take,
+            "clip": self.recorder.rokoko_backend.current_clip,
+        }
+        shot_list = self.recorder.shot_list
+        if shot_list is not None:
+            status["shot"] = shot_list.progress()
+        status["health"] = {
+            name: {"healthy": health.healthy, "rtt_ms": health.rtt_ms, "error": health.error}
+            for name, health in self.recorder.health.snapshot().items()
+        }
+        exports = self.recorder.exports.recent()
+        if exports:
+            status["exports"] = [job.status() for job in exports]
+        if error is not None:
+            status["error"] = error
+        result = self.last_result
+        if result is not None:
+            status["last"] = {
+                "action": result.action,
+                "success": result.success,
+                "failed": result.failed,
+                "ack_skew_ms": result.ack_skew_ms,
+                "confirmed_skew_ms": result.confirmed_skew_ms,
+                "rolled_back": result.rolled_back,
+            }
+        return status
+
+    def toggle(self):
+        """Start if idle, stop otherwise, as the RECORD/STOP button does."""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_toggle is not None and now - self._last_toggle < self.debounce:
+                return self._done(self.status("ignored: pressed again too quickly"))
+            self._last_toggle = now
+            command = "start" if self._intended == IDLE else "stop"
+        return self.submit(command)
+
+    def mark(self, text=None):
+        """Drop a marker in the running take right away; markers never queue behind commands."""
+        if self.state != RECORDING:
+            return self._done(self.status(f"cannot mark while {self.state}"))
+        marker = self.recorder.mark(text)
+        if marker is None:
+            return self._done(self.status("not recording"))
+        status = self.status()
+        status["marker"] = {"index": marker["index"], "text": marker["text"]}
+        return self._done(status)
+
+    def submit(self, command, argument=None):
+        """Queue a command and return a Future of its status dict."""
+        press_ns = time.perf_counter_ns()
+        with self._lock:
+            error = self._refuse(command)
+            if error is not None:
+                return self._done(self.status(error))
+
+            if command in ("stop", "disarm") and self.state == ARMED:
+                # The worker is waiting for the scheduled instant; cancel it from here
+                self._disarmed = True
+                self._intended = IDLE
+                self.recorder.disarm()
+                return self._done(self.status())
+
+            # The take is numbered and traced once the worker runs it, so
+            # a start coalesced away with its stop leaves no gap
+            if command == "start":
+                self._intended = RECORDING
+            elif command == "arm":
+                self._intended = ARMED
+            elif command in ("stop", "disarm"):
+                self._intended = IDLE
+
+            future = Future()
+            self._commands.put((command, argument, future, press_ns))
+        return future
+
+    def _refuse(self, command):
+        """Return why ``command`` cannot follow the queued commands, or None."""
+        intended = self._intended
+        if command in ("start", "arm"):
+            if intended != IDLE:
+                return f"cannot {command} while {intended}"
+        elif command == "stop":
+            if intended not in (RECORDING, ARMED):
+                return f"cannot stop while {intended}"
+        elif command == "disarm":
+            if intended != ARMED:
+                return "not armed"
+        elif command in ("shotlist", "skip"):
+            if intended != IDLE:
+                return f"cannot change the shot list while {intended}"
+        else:
+            return f"unknown command: {command}"
+        return None
+
+    def _run(self):
+        """Thread function: run queued commands in order."""
+        pending = []
+        while True:
+            if not pending:
+                pending.append(self._commands.get())
+            # Take everything that queued up while the last command ran
+            while True:
+                try:
+                    pending.append(self._commands.get_nowait())
+                except queue.Empty:
+                    break
+
+            item = pending.pop(0)
+            if item is None:
+                for leftover in pending:
+                    if leftover is not None:
+                        leftover[2].set_result(self.status("recorder closed"))
+                return
+            command, argument, future, press_ns = item
+            undone = pending and pending[0] is not None and pending[0][0] in ("stop", "disarm")
+
+            if command in ("start", "arm") and undone:
+                # Pressed and undone before the worker got to it: skip both
+                stop_future = pending.pop(0)[2]
+                self.log(f"{command.capitalize()} and stop queued up while busy; skipped both.", "warning")
+                self.tracer.mark("coalesced", action=command)
+                future.set_result(self.status())
+                stop_future.set_result(self.status())
+            else:
+                try:
+                    status = self._execute(command, argument, future, press_ns)
+                except Exception as e:
+                    self.log(f"Recorder command '{command}' failed: {e}", "error")
+                    self._set_state(self.state if self.state in (IDLE, RECORDING) else IDLE)
+                    status = self.status(str(e))
+                if not future.done():
+                    future.set_result(status)
+
+            with self._lock:
+                if not pending and self._commands.empty():
+                    self._intended = self.state
+
+    def _execute(self, command, argument, future, press_ns=None):
+        if command in ("start", "arm") and self.state != IDLE:
+            return self.status(f"cannot {command} while {self.state}")
+        if command == "stop" and self.state != RECORDING:
+            # The start it was queued behind failed
+            return self.status(f"cannot stop while {self.state}")
+
+        if command == "start":
+            self._begin_take()
+            self.tracer.mark_press("start", press_ns)
+        elif command == "stop":
+            self.tracer.mark_press("stop", press_ns)
+        self.tracer.mark("engine_dispatch", action=command)
+
+        if command == "start":
+            self._set_state(STARTING)
+            return self._finish_start(self.recorder.start())
+
+        if command == "arm":
+            with self._lock:
+                if self._intended != ARMED:
+                    # Stopped after the worker had already taken the arm off the queue
+                    return self.status("disarmed")
+                self._disarmed = False
+                self.state = ARMED
+            self._begin_take()
+            self.tracer.mark("button_press", action="arm")
+            self._publish()
+            # Armed is the answer; the start itself is published when it fires
+            future.set_result(self.status())
+            result = self.recorder.arm(argument)
+            if result is None or result.cancelled:
+                self._set_state(IDLE)
+                return self.status("invalid start time" if result is None else "disarmed")
+            status = self._finish_start(result)
+            if self._disarmed:
+                # STOP came as the start fired: the cancel missed, so honour it with a stop
+                self._disarmed = False
+                self.recorder.coordinator.clear_cancel()
+                if self.state == RECORDING:
+                    self.log("Stop pressed as the armed start fired; stopping the take.", "warning")
+                    return self._execute("stop", None, future)
+            return status
+
+        if command == "stop":
+            self._set_state(STOPPING)
+            self.last_result = self.recorder.stop()
+            self._set_state(IDLE)
+            return self.status()
+
+        if command == "disarm":
+            # Queued behind the arm it cancels, which has already returned
+            return self.status()
+
+        if command == "shotlist":
+            try:
+                if argument:
+                    self.recorder.load_shot_list(argument)
+                else:
+                    self.recorder.clear_shot_list()
+            except (OSError, ValueError, KeyError) as e:
+                return self.status(f"could not load shot list: {e}")
+            self._publish()
+            return self.status()
+
+        if command == "skip":
+            if self.recorder.shot_list is None:
+                return self.status("no shot list loaded")
+            self.recorder.skip_take()
+            self._publish()
+            return self.status()
+
+    def _begin_take(self):
+        self.take += 1
+        self.tracer.begin_take()
+
+    def _finish_start(self, result):
+        self.last_result = result
+        self._set_state(RECORDING if result.success else IDLE)
+        if result.success:
+            return self.status()
+        return self.status("failed to start " + ", ".join(result.failed))
+
+    def _set_state(self, state):
+        self.state = state
+        self._publish()
+
+    def _publish(self):
+        status = self.status()
+        for callback in self._listeners:
+            try:
+                callback(status)
+            except Exception as e:
+                self.log(f"Recorder state listener failed: {e}", "error")
+
+    @staticmethod
+    def _done(status):
+        future = Future()
+        future.set_result(status)
+        return future
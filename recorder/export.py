@@ -0,0 +1,242 @@
+"""Post-take exports that run in the background while the next take records.
+
+After a stop the Recorder hands the take to an ``ExportPipeline`` as an
+``ExportJob``: a list of steps such as writing the take's audio out of
+Audacity, asking Rokoko Studio to export the clip and estimating the
+sync offset. A small pool of worker threads runs the jobs, so the next
+take can start straight away. Steps that drive Audacity through the
+scripting pipe are "exclusive": Audacity cannot export while it
+records, and a command in its queue would hold up a record command, so
+they only run between takes and a start waits for one already under
+way (see ``hold``). The take's region is read from Audacity at the stop,
+so an export that has to wait for the next take still gets its own audio.
+"""
+
+import json
+import queue
+import threading
+import time
+
+from .audacity import response_payload
+
+
+QUEUED = "queued"
+EXPORTING = "exporting"
+DONE = "done"
+FAILED = "failed"
+
+
+class ExportJob:
+    """The export steps of one take and how far they have got.
+
+    ``steps`` is a list of ``(name, function, exclusive)``; each function
+    gets the job and returns what it produced (usually a path), which is
+    kept in ``results`` under the step's name for the steps after it.
+    """
+
+    def __init__(self, clip_name, steps):
+        self.clip_name = clip_name
+        self.steps = list(steps)
+        self.number = None
+        self.state = QUEUED
+        self.step = None
+        self.results = {}
+        self.errors = {}
+        self.queued_at = time.monotonic()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until every step has run; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def describe(self):
+        """Short text for a status bar."""
+        if self.state == EXPORTING:
+            return f"{self.clip_name}: {self.step}..."
+        if self.state == FAILED:
+            return f"{self.clip_name}: {', '.join(self.errors)} failed"
+        if self.state == DONE:
+            return f"{self.clip_name}: done in {self.finished_at - self.queued_at:.0f} s"
+        return f"{self.clip_name}: queued"
+
+    def status(self):
+        """State, results and errors as a JSON-friendly dict."""
+        return {
+            "number": self.number,
+            "clip": self.clip_name,
+            "state": self.state,
+            "step": self.step,
+            "results": {name: str(value) for name, value in self.results.items()},
+            "errors": dict(self.errors),
+        }
+
+
+class ExportPipeline:
+    """Runs ExportJobs on up to ``workers`` background threads.
+
+    At most ``max_pending`` jobs may be unfinished; ``full`` tells the
+    Recorder to refuse new takes until the exports catch up, rather than
+    let a backlog grow without bound. ``busy`` (the coordinator's
+    start/stop event) is set while an exclusive step runs, so health
+    checks and clock probes keep off the pipe meanwhile. Listeners get
+    every job whose state changed, on the worker thread.
+    """
+
+    def __init__(self, workers=2, max_pending=4, busy=None, log=None):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.busy = busy or threading.Event()
+        self.log = log or (lambda message, level="info": None)
+        self.jobs = []
+        self._listeners = []
+        self._queue = queue.Queue()
+        self._threads = []
+        self._count = 0
+        # Exclusive steps run only while no take is held, one at a time
+        self._condition = threading.Condition()
+        self._held = False
+        self._exclusive = None
+
+    def add_listener(self, callback):
+        """Call ``callback(job)`` on a worker thread whenever a job changes state."""
+        self._listeners.append(callback)
+
+    def backlog(self):
+        """Number of jobs that have not finished yet."""
+        return sum(1 for job in self.jobs if not job.finished)
+
+    @property
+    def full(self):
+        return bool(self.max_pending) and self.backlog() >= self.max_pending
+
+    def recent(self, count=3):
+        """The newest ``count`` jobs, newest first."""
+        return self.jobs[::-1][:count]
+
+    def submit(self, job):
+        """Queue a job and return it; starts the workers on first use."""
+        self._count += 1
+        job.number = self._count
+        # Finished jobs are only kept for the status display
+        self.jobs = [old for old in self.jobs[-20:] if not old.finished or old in self.jobs[-3:]] + [job]
+        if not self._threads:
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"export-{index + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put(job)
+        self._notify(job)
+        return job
+
+    def hold(self):
+        """Keep exclusive steps off Audacity for a take; waits for one that is under way."""
+        with self._condition:
+            self._held = True
+            if self._exclusive is not None:
+                job, step = self._exclusive
+                self.log(f"Waiting for the {step} export of {job.clip_name} to finish before starting...")
+                self._condition.wait_for(lambda: self._exclusive is None)
+
+    def release(self):
+        """Let exclusive steps run again once a take has stopped (or failed to start)."""
+        with self._condition:
+            self._held = False
+            self._condition.notify_all()
+
+    def close(self, timeout=30.0):
+        """Let the queued jobs finish for up to ``timeout`` seconds, then stop the workers."""
+        self.release()
+        deadline = time.monotonic() + timeout
+        for job in list(self.jobs):
+            job.wait(max(0.0, deadline - time.monotonic()))
+        left = self.backlog()
+        if left:
+            self.log(f"{left} take export(s) did not finish before closing.", "warning")
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def _worker(self):
+        """Thread function: run queued jobs until closed."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        job.state = EXPORTING
+        began = time.monotonic()
+        for name, function, exclusive in job.steps:
+            job.step = name
+            self._notify(job)
+            try:
+                if exclusive:
+                    job.results[name] = self._run_exclusive(job, name, function)
+                else:
+                    job.results[name] = function(job)
+            except Exception as e:
+                job.errors[name] = str(e)
+                self.log(f"Export of {job.clip_name}: {name} failed: {e}", "error")
+        job.step = None
+        job.finished_at = time.monotonic()
+        job.state = FAILED if job.errors else DONE
+        job._done.set()
+        if not job.errors:
+            self.log(f"Export of {job.clip_name} finished in {job.finished_at - began:.1f} s.")
+        self._notify(job)
+
+    def _run_exclusive(self, job, name, function):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._held and self._exclusive is None)
+            self._exclusive = (job, name)
+            self.busy.set()
+        try:
+            return function(job)
+        finally:
+            with self._condition:
+                self._exclusive = None
+                self.busy.clear()
+                self._condition.notify_all()
+
+    def _notify(self, job):
+        for callback in self._listeners:
+            try:
+                callback(job)
+            except Exception as e:
+                self.log(f"Export listener failed: {e}", "error")
+
+
+class AudacityExport:
+    """Writes a take's audio out of the Audacity project through the scripting transport.
+
+    ``locate`` reads where the newest recording sits in the project right
+    after the stop; ``export`` selects exactly that region later on and
+    exports it, however many takes have been recorded since.
+    """
+
+    def __init__(self, transport, timeout=300.0):
+        self.transport = transport
+        self.timeout = timeout
+
+    def locate(self):
+        """Return the ``(start, end)`` in project seconds of the newest recording."""
+        clips = json.loads(response_payload(self.transport.do("GetInfo: Type=Clips Format=JSON")) or "[]")
+        if not clips:
+            raise ValueError("Audacity reports no recorded clips")
+        start = max(clip["start"] for clip in clips)
+        end = max(clip["end"] for clip in clips if clip["start"] == start)
+        return start, end
+
+    def export(self, path, region):
+        """Export ``region`` of every track as a WAV file at ``path``; a failed export raises."""
+        start, end = region
+        self.transport.do(f"Select: Start={start:.6f} End={end:.6f} RelativeTo=ProjectStart "
+                          "Track=0 TrackCount=1000 Mode=Set", timeout=self.timeout)
+        self.transport.do(f'Export2: Filename="{path}"', timeout=self.timeout)
+        return path
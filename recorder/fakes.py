@@ -0,0 +1,453 @@
+"""Local stand-ins for Audacity and Rokoko Studio used for testing and benchmarks."""
+
+import json
+import math
+import os
+import random
+import re
+import select
+import shlex
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import wave
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FaultInjector:
+    """Adds configurable latency, jitter, stalls and random failures to a stand-in.
+
+    A ``stall_rate`` share of calls is held for ``stall`` extra seconds, like
+    a response stuck behind a lost packet.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None, stall_rate=0.0, stall=5.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self._random = random.Random(seed)
+
+    def delay(self):
+        """Sleep for the configured latency plus a random share of the jitter."""
+        delay = self.latency + self._random.uniform(0.0, self.jitter)
+        if self.stall_rate > 0 and self._random.random() < self.stall_rate:
+            delay += self.stall
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self):
+        """True for a random ``failure_rate`` share of calls."""
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+
+def parse_command(line):
+    """Split a scripting command line into its id and Key=Value arguments."""
+    name, _, rest = line.partition(":")
+    args = {}
+    for token in shlex.split(rest):
+        key, sep, value = token.partition("=")
+        if sep:
+            args[key] = value
+    return name.strip(), args
+
+
+class FakeAudacity:
+    """Answers mod-script-pipe commands over a FIFO pair like Audacity would (POSIX only).
+
+    The FIFOs are created in a temporary directory; point an ``AudacityPipe``
+    at ``to_pipe``/``from_pipe`` (or use ``pipe()``) to talk to it. Commands
+    are processed one at a time in arrival order, as in Audacity. Record
+    and stop commands honour the latency, jitter and failure settings.
+    ``Export2`` copies ``export_source`` to the requested file, or writes a
+    second of silence when it is not set. Every recording becomes a new
+    clip at the end of the project, and ``Select``/``AddLabel``/``SetLabel``
+    maintain ``labels`` like one label track, so both show up in
+    ``GetInfo``. With ``capture`` False, record commands succeed without
+    recording anything, like Audacity without a working input device.
+    """
+
+    version = ("3", "7", "5")
+
+    commands = [
+        "Record1stChoice",
+        "Record2ndChoice",
+        "Stop",
+        "Message",
+        "GetInfo",
+        "GetPreference",
+        "SelectTime",
+        "Select",
+        "AddLabel",
+        "SetLabel",
+        "Export2",
+    ]
+
+    def __init__(self, directory=None, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.directory = directory or tempfile.mkdtemp(prefix="fake-audacity-")
+        self.to_pipe = os.path.join(self.directory, "audacity_script_pipe.to")
+        self.from_pipe = os.path.join(self.directory, "audacity_script_pipe.from")
+        self.faults = FaultInjector(latency, jitter, failure_rate, seed)
+        self.received = []
+        self.recording = False
+        self.capture = True
+        self.export_source = None
+        self.clips = []
+        # [start, end, text] in time order
+        self.labels = []
+        self.selection = (0.0, 0.0)
+        self._recording_since = None
+        self._to_fd = None
+        self._from_fd = None
+        self._running = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def pipe(self, **kwargs):
+        """Return an AudacityPipe connected to this fake."""
+        from .pipe import AudacityPipe
+        return AudacityPipe(self.to_pipe, self.from_pipe, **kwargs)
+
+    def start(self):
+        """Create the FIFOs and start serving commands."""
+        for path in (self.to_pipe, self.from_pipe):
+            if not os.path.exists(path):
+                os.mkfifo(path)
+        # O_RDWR keeps both FIFOs open without waiting for a client
+        self._to_fd = os.open(self.to_pipe, os.O_RDWR)
+        self._from_fd = os.open(self.from_pipe, os.O_RDWR)
+        self._running.set()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self, remove=True):
+        """Stop serving; clients see end-of-file on the from-srv pipe."""
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for fd in (self._to_fd, self._from_fd):
+            if fd is not None:
+                os.close(fd)
+        self._to_fd = None
+        self._from_fd = None
+        if remove:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def handle(self, line):
+        """Return (ok, payload) for one command line."""
+        name, args = parse_command(line)
+        if name not in self.commands:
+            return False, f"Your batch command of {name} was not recognized."
+
+        if name in ("Record1stChoice", "Record2ndChoice", "Stop"):
+            self.faults.delay()
+            if self.faults.should_fail():
+                return False, "Injected failure."
+            self._record(name != "Stop")
+            return True, ""
+        if name == "Message":
+            return True, args.get("Text", "")
+        if name == "GetPreference":
+            keys = {"Version/Major": 0, "Version/Minor": 1, "Version/Micro": 2}
+            index = keys.get(args.get("Name"))
+            return True, self.version[index] if index is not None else ""
+        if name == "GetInfo" and args.get("Type") == "Commands":
+            return True, json.dumps([{"id": cmd} for cmd in self.commands])
+        if name == "GetInfo" and args.get("Type") == "Clips":
+            return True, json.dumps([{"track": 0, "start": start, "end": self._clip_end(i), "color": 0}
+                                     for i, (start, _) in enumerate(self.clips)])
+        if name == "GetInfo" and args.get("Type") == "Labels":
+            return True, json.dumps([[1, [list(label) for label in self.labels]]] if self.labels else [])
+        if name == "Select":
+            start = float(args.get("Start", self.selection[0]))
+            self.selection = (start, float(args.get("End", start)))
+            return True, ""
+        if name == "AddLabel":
+            start, end = self.selection
+            index = sum(1 for label in self.labels if label[0] <= start)
+            self.labels.insert(index, [start, end, ""])
+            return True, ""
+        if name == "SetLabel":
+            index = int(args.get("Label", -1))
+            if not 0 <= index < len(self.labels):
+                return False, f"Label {index} not found."
+            self.labels[index][2] = args.get("Text", self.labels[index][2])
+            return True, ""
+        if name == "Export2":
+            return self._export(args.get("Filename", ""))
+        return True, ""
+
+    def _record(self, recording):
+        """Open a new clip at the end of the project, or close the one being recorded."""
+        now = time.monotonic()
+        if recording and not self.capture:
+            return
+        if recording and not self.recording:
+            start = max([self._clip_end(i) for i in range(len(self.clips))] or [0.0])
+            self.clips.append((start, None))
+            self._recording_since = now
+        elif not recording and self.recording and self.clips:
+            start, _ = self.clips[-1]
+            self.clips[-1] = (start, start + now - self._recording_since)
+        self.recording = recording
+
+    def _clip_end(self, index):
+        start, end = self.clips[index]
+        if end is None:
+            return start + time.monotonic() - self._recording_since
+        return end
+
+    def _export(self, filename):
+        """Write the export file for an Export2 command."""
+        try:
+            if self.export_source:
+                shutil.copyfile(self.export_source, filename)
+            else:
+                with open(filename, 'wb') as raw, wave.open(raw, 'wb') as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(2)
+                    f.setframerate(8000)
+                    f.writeframes(b"\0\0" * 8000)
+        except OSError as e:
+            return False, f"Export failed: {e}"
+        return True, ""
+
+    def _serve(self):
+        """Thread function: read commands and write responses."""
+        buffer = b""
+        while self._running.is_set():
+            ready, _, _ = select.select([self._to_fd], [], [], 0.1)
+            if not ready:
+                continue
+            buffer += os.read(self._to_fd, 65536)
+            *complete, buffer = buffer.split(b"\n")
+            for raw in complete:
+                line = raw.decode("utf-8").strip("\r\0")
+                if not line:
+                    continue
+                self.received.append(line)
+                ok, payload = self.handle(line)
+                status = "OK" if ok else "Failed!"
+                text = (payload + "\n" if payload else "") + f"BatchCommand finished: {status}\n\n"
+                os.write(self._from_fd, text.encode("utf-8"))
+
+
+class MockRokokoStudio:
+    """Serves the Rokoko Studio ``/v1/{api_key}/...`` command endpoints on localhost.
+
+    Start and stop requests honour the latency, jitter, stall and failure
+    settings; failures answer HTTP 500 like Studio does for a rejected command.
+    ``clock_offset`` seconds are added to the Date header of every response,
+    to stand in for a host whose clock is off. Any command ending in
+    ``export`` is accepted as a clip export and its filename kept in ``exports``.
+    """
+
+    def __init__(self, api_key="1234", host="127.0.0.1", port=0,
+                 latency=0.0, jitter=0.0, failure_rate=0.0, seed=None, stall_rate=0.0, stall=5.0,
+                 clock_offset=0.0):
+        self.api_key = api_key
+        self.clock_offset = clock_offset
+        self.faults = FaultInjector(latency, jitter, failure_rate, seed, stall_rate, stall)
+        self.recording = False
+        self.requests = []
+        self.exports = []
+        self._connections = set()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Shut the server down and drop open keep-alive connections, like a closed Studio."""
+        self._server.shutdown()
+        self._server.server_close()
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle(self, path, body):
+        """Return (status, payload) for one POST request."""
+        self.requests.append(path)
+        match = re.match(r"^/v1/([^/]+)/(.+)$", path)
+        if not match:
+            return 404, {"response_code": "NOT_FOUND"}
+        if match.group(1) != self.api_key:
+            return 401, {"response_code": "INVALID_API_KEY"}
+
+        command = match.group(2)
+        if command == "info":
+            return 200, {"response_code": "OK", "recording": self.recording}
+        if command in ("recording/start", "recording/stop"):
+            self.faults.delay()
+            if self.faults.should_fail():
+                return 500, {"response_code": "INJECTED_FAILURE"}
+            self.recording = command == "recording/start"
+            return 200, {"response_code": "OK"}
+        if command.rsplit("/", 1)[-1] == "export":
+            self.faults.delay()
+            self.exports.append(body.get("filename"))
+            return 200, {"response_code": "OK"}
+        return 404, {"response_code": "NOT_FOUND"}
+
+    def _make_handler(self):
+        studio = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                studio._connections.add(self.connection)
+
+            def finish(self):
+                studio._connections.discard(self.connection)
+                super().finish()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                status, payload = studio.handle(self.path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                try:
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on a stalled request
+                    self.close_connection = True
+
+            def date_time_string(self, timestamp=None):
+                return formatdate(time.time() + studio.clock_offset, usegmt=True)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+STREAM_JOINTS = (
+    "hip", "spine", "chest", "neck", "head",
+    "leftShoulder", "leftUpperArm", "leftLowerArm", "leftHand",
+    "rightShoulder", "rightUpperArm", "rightLowerArm", "rightHand",
+    "leftUpLeg", "leftLeg", "leftFoot", "leftToe",
+    "rightUpLeg", "rightLeg", "rightFoot", "rightToe",
+) + tuple(
+    f"{side}{finger}{segment}"
+    for side in ("left", "right")
+    for finger in ("Thumb", "Index", "Middle", "Ring", "Little")
+    for segment in ("Proximal", "Medial", "Distal")
+)
+
+
+class RokokoStreamReplay:
+    """Sends Rokoko Studio JSON v3 frames over UDP at a fixed rate, like Studio's custom streaming.
+
+    Frames for ``actors`` actors are generated with every joint moving on a
+    slow circle, or the raw ``packets`` given are replayed in a loop. A
+    ``loss_rate`` share of frames is skipped, like packets lost on the way.
+    """
+
+    def __init__(self, host="127.0.0.1", port=14043, fps=120, actors=1, packets=None,
+                 loss_rate=0.0, seed=None):
+        self.address = (host, port)
+        self.fps = fps
+        self.actors = actors
+        self.packets = packets
+        self.loss_rate = loss_rate
+        self.sent = 0
+        self._random = random.Random(seed)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Start sending frames in a background thread."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sending."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._socket.close()
+
+    def frame(self, index):
+        """Return the JSON v3 packet of frame ``index``."""
+        if self.packets:
+            return self.packets[index % len(self.packets)]
+        t = index / self.fps
+        actors = []
+        for a in range(self.actors):
+            body = {}
+            for j, joint in enumerate(STREAM_JOINTS):
+                phase = t + 0.1 * j + a
+                body[joint] = {
+                    "position": {"x": a + 0.1 * math.cos(phase), "y": 0.02 * j, "z": 0.1 * math.sin(phase)},
+                    "rotation": {"x": 0.0, "y": math.sin(phase / 2), "z": 0.0, "w": math.cos(phase / 2)},
+                }
+            actors.append({"name": f"Actor{a + 1}", "body": body})
+        scene = {"timestamp": t, "actors": actors, "props": []}
+        return json.dumps({"version": "3,0", "fps": self.fps, "scene": scene}).encode("utf-8")
+
+    def _run(self):
+        """Thread function: send one frame per period."""
+        began = time.perf_counter()
+        index = 0
+        while not self._stopped.is_set():
+            delay = began + index / self.fps - time.perf_counter()
+            if delay > 0 and self._stopped.wait(delay):
+                return
+            if not (self.loss_rate and self._random.random() < self.loss_rate):
+                self._socket.sendto(self.frame(index), self.address)
+                self.sent += 1
+            index += 1
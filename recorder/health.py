@@ -0,0 +1,101 @@
+"""Background health checks of the recording backends."""
+
+import collections
+import threading
+import time
+
+
+class BackendHealth(collections.namedtuple("BackendHealth", "name healthy rtt_ms checked_at error")):
+    """Result of the latest health check of one backend.
+
+    ``healthy`` is None until the first check has finished; ``checked_at``
+    is a ``time.monotonic()`` stamp.
+    """
+
+    @property
+    def age(self):
+        """Seconds since the check, or None if there was none yet."""
+        if self.checked_at is None:
+            return None
+        return time.monotonic() - self.checked_at
+
+    def describe(self):
+        """Short text for a status bar."""
+        if self.healthy is None:
+            return f"{self.name}: checking..."
+        if self.healthy:
+            return f"{self.name}: OK {self.rtt_ms:.1f} ms"
+        return f"{self.name}: unreachable"
+
+
+class HealthMonitor:
+    """Pings every backend every ``interval`` seconds and caches the outcome.
+
+    Each backend's ``ping(timeout)`` returns the round trip in milliseconds
+    or raises. Checks are skipped while ``busy`` (an Event set by the
+    coordinator during a start or stop) is set, so a ping never queues in
+    front of a record command. ``snapshot`` and ``unhealthy`` only read the
+    cache, so the record path can consult them for free.
+    """
+
+    def __init__(self, backends, log=None, interval=2.0, timeout=1.0, busy=None):
+        self.backends = list(backends)
+        self.log = log or (lambda message, level="info": None)
+        self.interval = interval
+        self.timeout = timeout
+        self.busy = busy or threading.Event()
+        self._health = {
+            backend.name: BackendHealth(backend.name, None, None, None, None)
+            for backend in self.backends
+        }
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start checking in the background; does nothing when ``interval`` is 0."""
+        if self._thread is not None or not self.interval:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop the background checks."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1.0)
+            self._thread = None
+
+    def snapshot(self):
+        """Return the latest BackendHealth of every backend, by name."""
+        return dict(self._health)
+
+    def unhealthy(self):
+        """Names of the backends whose latest check failed."""
+        return [name for name, health in self._health.items() if health.healthy is False]
+
+    def check_now(self):
+        """Check every backend once on the calling thread."""
+        for backend in self.backends:
+            if self.busy.is_set() or self._closed.is_set():
+                return
+            self._check(backend)
+
+    def _check(self, backend):
+        try:
+            rtt_ms = backend.ping(self.timeout)
+            health = BackendHealth(backend.name, True, rtt_ms, time.monotonic(), None)
+        except Exception as e:
+            health = BackendHealth(backend.name, False, None, time.monotonic(), str(e))
+
+        previous = self._health[backend.name]
+        self._health[backend.name] = health
+        if health.healthy and previous.healthy is False:
+            self.log(f"{backend.name} is reachable again ({health.rtt_ms:.1f} ms).")
+        elif not health.healthy and previous.healthy is not False:
+            self.log(f"{backend.name} is not reachable: {health.error}", "warning")
+
+    def _loop(self):
+        """Thread function: check all backends at a fixed interval."""
+        while not self._closed.is_set():
+            self.check_now()
+            self._closed.wait(self.interval)
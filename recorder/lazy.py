@@ -0,0 +1,27 @@
+"""Deferred import of numpy, which takes longer to import than the rest of the app.
+
+Modules use ``np`` from here as they would ``import numpy as np``; numpy
+is only imported when one of its attributes is first looked up, so
+importing the app does not load it.
+"""
+
+import importlib
+import importlib.util
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._module_name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._module_name)
+        # Later lookups find the module's names here and never reach this method
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+np = LazyModule("numpy")
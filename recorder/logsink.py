@@ -0,0 +1,157 @@
+"""Structured JSON lines log file written off the recording path."""
+
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+class LogSink:
+    """Writes log messages as JSON lines from a background thread.
+
+    ``write`` only stamps the message and puts it on a queue, so recording
+    threads never wait for the console or the disk. The writer thread
+    appends batches to ``recorder-YYYYMMDD-HHMMSS.jsonl`` in ``directory``,
+    flushes once per batch, starts a new file when the current one exceeds
+    ``max_bytes`` or is older than ``rotate_seconds``, and deletes files
+    beyond ``max_files`` or older than ``retention_days``. With ``console``
+    set, each message is also printed to stdout by the writer thread.
+    """
+
+    def __init__(self, directory="logs", max_bytes=5000000, rotate_seconds=86400,
+                 max_files=50, retention_days=30, console=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.retention_days = retention_days
+        self.console = console
+        self.path = None
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, message, level="info", take=None):
+        """Queue one log message; never blocks."""
+        self._queue.put((time.time_ns(), time.monotonic_ns(), level, take, message))
+
+    def close(self):
+        """Write out everything queued so far and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def _open(self):
+        """Start a new log file and apply the retention limits."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now().strftime("recorder-%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, name + ".jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}-{suffix}.jsonl")
+            suffix += 1
+        self.path = path
+        handle = open(path, 'a')
+        self._prune()
+        return handle
+
+    def _prune(self):
+        """Delete old log files beyond the count and age limits."""
+        files = sorted(glob.glob(os.path.join(self.directory, "recorder-*.jsonl")), key=os.path.getmtime)
+        files = [f for f in files if f != self.path]
+        cutoff = time.time() - self.retention_days * 86400
+        excess = len(files) + 1 - self.max_files
+        for index, path in enumerate(files):
+            try:
+                if index < excess or os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _write_loop(self):
+        """Thread function: write queued messages in batches."""
+        handle = None
+        opened = 0.0
+        size = 0
+        done = False
+
+        while not done:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in batch:
+                if item is None:
+                    done = True
+                    break
+                wall_ns, mono_ns, level, take, message = item
+                record = {
+                    "time": datetime.fromtimestamp(wall_ns / 1e9).isoformat(timespec="milliseconds"),
+                    "wall_ns": wall_ns,
+                    "mono_ns": mono_ns,
+                    "level": level,
+                    "take": take,
+                    "message": message,
+                }
+                lines.append(json.dumps(record) + "\n")
+                if self.console:
+                    self._print(wall_ns, level, message)
+
+            if not lines:
+                continue
+            if self.console:
+                try:
+                    sys.stdout.flush()
+                except (AttributeError, OSError, ValueError):
+                    pass
+
+            try:
+                if handle is not None and (size >= self.max_bytes or time.time() - opened >= self.rotate_seconds):
+                    handle.close()
+                    handle = None
+                if handle is None:
+                    handle = self._open()
+                    opened = time.time()
+                    size = 0
+                data = "".join(lines)
+                handle.write(data)
+                handle.flush()
+                size += len(data)
+            except OSError:
+                handle = None
+
+        if handle is not None:
+            handle.close()
+
+    @staticmethod
+    def _print(wall_ns, level, message):
+        """Print a message in the same format as the GUI log window."""
+        prefix = datetime.fromtimestamp(wall_ns / 1e9).strftime("[%H:%M:%S] ")
+        if level == "error":
+            prefix += "ERROR: "
+        elif level == "warning":
+            prefix += "WARNING: "
+        try:
+            print(prefix + message)
+        except (AttributeError, OSError, ValueError):
+            # No console, e.g. a --windowed executable
+            pass
+
+
+def log_sink_from_config(config_manager, console=True):
+    """Create a LogSink with the log_* settings from the configuration."""
+    return LogSink(
+        config_manager.get("log_directory"),
+        max_bytes=config_manager.get("log_max_bytes"),
+        rotate_seconds=config_manager.get("log_rotate_hours") * 3600,
+        max_files=config_manager.get("log_max_files"),
+        retention_days=config_manager.get("log_retention_days"),
+        console=console
+    )
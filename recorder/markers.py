@@ -0,0 +1,189 @@
+"""Timeline markers dropped during a take.
+
+``Recorder.mark`` stamps a marker on the perf_counter_ns clock the take's
+start was released on and hands it to a ``MarkerBatcher``. The batcher's
+thread waits a moment for more markers, then writes the whole burst at
+once: as one ``markers`` events chunk in the take file and, when
+Audacity records the audio, as labels in a single pipe write. Nothing is
+written while a start or stop is in flight, so a burst of markers never
+sits in front of a stop in Audacity's command queue.
+"""
+
+import bisect
+import json
+import threading
+import time
+
+from .audacity import response_payload
+
+
+class AudacityLabels:
+    """Places markers as labels on Audacity's timeline.
+
+    Once per take, GetInfo tells where the take's audio begins in the
+    project (the newest clip's start, since every recording goes to a new
+    clip) and which labels exist already. A marker's label then goes at
+    that position plus the marker's offset from ``record_ns``, the moment
+    Audacity acknowledged the record command. Labels that Audacity
+    refuses while recording are retried after the stop.
+    """
+
+    def __init__(self, transport, log, timeout=2.0):
+        self.transport = transport
+        self.log = log
+        self.timeout = timeout
+        self.record_ns = None
+        self.origin = None
+        self._label_times = []
+        self._deferred = []
+
+    def begin(self, record_ns):
+        """Start placing labels for a take whose recording began at ``record_ns``."""
+        self.record_ns = record_ns
+        self.origin = None
+        self._label_times = []
+        self._deferred = []
+
+    def write(self, markers, final=False):
+        """Add labels for ``markers``; ``final`` after the stop, when Audacity is idle again."""
+        markers = self._deferred + list(markers)
+        self._deferred = []
+        if not markers or self.record_ns is None:
+            return
+        try:
+            if self.origin is None:
+                self._locate()
+            self._send(self._label_commands(markers))
+        except Exception as e:
+            if final:
+                self.log(f"Could not add {len(markers)} marker label(s) to Audacity: {e}", "warning")
+            else:
+                self._deferred = markers
+
+    def _locate(self):
+        """Read where this take starts in the project and the labels already there."""
+        clips, labels = self._send(["GetInfo: Type=Clips Format=JSON", "GetInfo: Type=Labels Format=JSON"])
+        clips = json.loads(response_payload(clips) or "[]")
+        self.origin = max((clip["start"] for clip in clips), default=0.0)
+        self._label_times = sorted(
+            label[0] for _, track in json.loads(response_payload(labels) or "[]") for label in track
+        )
+
+    def _label_commands(self, markers):
+        commands = []
+        for marker in markers:
+            at = max(0.0, self.origin + (marker["t_ns"] - self.record_ns) / 1e9)
+            # SetLabel counts labels in time order; the new one lands after any at the same time
+            index = bisect.bisect_right(self._label_times, at)
+            self._label_times.insert(index, at)
+            text = marker["text"].replace('"', "'")
+            commands += [
+                f"Select: Start={at:.6f} End={at:.6f} RelativeTo=ProjectStart",
+                "AddLabel:",
+                f'SetLabel: Label={index} Text="{text}"',
+            ]
+        return commands
+
+    def _send(self, commands):
+        """Send commands in one write when the transport can, and return their responses."""
+        if hasattr(self.transport, "send_many"):
+            futures = self.transport.send_many(commands)
+            return [future.result(timeout=self.timeout) for future in futures]
+        return [self.transport.do(command) for command in commands]
+
+
+class MarkerBatcher:
+    """Collects a take's markers and writes them out in bursts on its own thread.
+
+    ``sinks`` are called with a list of markers (dicts with ``t_ns``,
+    ``index`` and ``text``) and ``final=True`` for the writes after the
+    take has stopped. Writes wait ``window`` seconds after the first
+    marker of a burst, and for ``busy`` (the coordinator's start/stop
+    event) to clear.
+    """
+
+    def __init__(self, busy=None, log=None, window=0.05):
+        self.busy = busy or threading.Event()
+        self.log = log or (lambda message, level="info": None)
+        self.window = window
+        self.markers = []
+        self._sinks = []
+        self._queue = []
+        self._final = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self._thread = None
+
+    def begin(self, sinks):
+        """Start collecting markers for a new take."""
+        with self._lock:
+            self.markers = []
+            self._sinks = list(sinks)
+            self._queue = []
+            self._final = False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="markers", daemon=True)
+            self._thread.start()
+
+    def add(self, text=None, at_ns=None):
+        """Queue a marker and return it."""
+        with self._lock:
+            marker = {"t_ns": at_ns, "index": len(self.markers) + 1}
+            marker["text"] = text or f"Marker {marker['index']}"
+            self.markers.append(marker)
+            self._queue.append(marker)
+            self._idle.clear()
+        self._wake.set()
+        return marker
+
+    def finish(self, stop_ns=None):
+        """Write what is left once the take has stopped; markers after ``stop_ns`` are dropped."""
+        with self._lock:
+            if stop_ns is not None:
+                self._queue = [marker for marker in self._queue if marker["t_ns"] < stop_ns]
+                self.markers = [marker for marker in self.markers if marker["t_ns"] < stop_ns]
+            self._final = True
+            self._idle.clear()
+        self._wake.set()
+        return self
+
+    def wait(self, timeout=None):
+        """Wait until every queued marker has been written; returns False on timeout."""
+        return self._idle.wait(timeout)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _loop(self):
+        """Thread function: write each burst of markers to every sink."""
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            if not self._final:
+                # Let the rest of a burst arrive, and keep out of the way of a start or stop
+                time.sleep(self.window)
+                while self.busy.is_set() and not self._final and not self._closed:
+                    time.sleep(0.005)
+            with self._lock:
+                batch, self._queue = self._queue, []
+                sinks, final = self._sinks, self._final
+            for sink in sinks:
+                try:
+                    sink(batch, final=final)
+                except Exception as e:
+                    self.log(f"Could not write {len(batch)} marker(s): {e}", "warning")
+            with self._lock:
+                # A finish() that came in meanwhile still needs its final pass
+                if not self._queue and self._final == final:
+                    self._idle.set()
+                    if final:
+                        self._sinks = []
@@ -0,0 +1,349 @@
+"""Capture of Rokoko Studio's live UDP stream into compact columnar chunks.
+
+Studio's custom streaming (JSON v3) sends one packet per frame with every
+actor's joints and every prop. ``MocapStreamReceiver`` keeps a socket open
+in the background, decodes each packet into the next row of a
+preallocated chunk (one float32 column per actor/joint/channel, plus the
+receive time on the perf_counter_ns clock and Studio's own timestamp) and
+hands full chunks to a writer thread, which writes the arrays straight
+from their buffers. Between takes the chunks are reused as a rolling
+buffer, so a take can begin at the release instant even though the
+receiver learns about it a moment later.
+
+Chunks go to the ``mocap`` stream of the take's ``TakeFileWriter``
+container with the fields of ``mocap_fields``; ``read_mocap_take`` loads
+them back. Needs numpy.
+"""
+
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+from .lazy import NUMPY_AVAILABLE, np  # noqa: F401
+from .takefile import TakeFileReader
+
+
+CHANNELS = ("px", "py", "pz", "rx", "ry", "rz", "rw")
+
+
+def mocap_fields(columns):
+    """Fields of the ``mocap`` stream for ``columns`` value columns."""
+    return [("recv_ns", "<i8", 1, "columns"), ("studio_time", "<f8", 1, "columns"),
+            ("values", "<f4", columns, "columns")]
+
+
+def decode_packet(packet):
+    """Return ``(studio_time, {(actor, joint): (px, py, pz, rx, ry, rz, rw)})`` for a JSON v3 packet.
+
+    Props are returned as joint ``"prop"`` of an actor named after the prop.
+    Raises ValueError for anything that is not a JSON v3 frame.
+    """
+    try:
+        scene = json.loads(packet)["scene"]
+        joints = {}
+        for actor in scene.get("actors") or ():
+            name = actor.get("name", "")
+            for joint, pose in (actor.get("body") or {}).items():
+                joints[(name, joint)] = _pose(pose)
+        for prop in scene.get("props") or ():
+            joints[(prop.get("name", ""), "prop")] = _pose(prop)
+        return scene.get("timestamp", 0.0), joints
+    except (KeyError, TypeError, AttributeError, UnicodeDecodeError) as e:
+        raise ValueError(f"not a Rokoko JSON v3 frame: {e}")
+
+
+def _pose(pose):
+    p = pose["position"]
+    r = pose["rotation"]
+    return (p["x"], p["y"], p["z"], r["x"], r["y"], r["z"], r["w"])
+
+
+class _Chunk:
+    """Preallocated columns for ``capacity`` frames."""
+
+    def __init__(self, capacity, columns):
+        self.recv_ns = np.zeros(capacity, dtype=np.int64)
+        self.studio_time = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((columns, capacity), np.nan, dtype=np.float32)
+        self.capacity = capacity
+        self.rows = 0
+        self.first = 0
+        self.end = None
+
+    def reset(self):
+        self.rows = 0
+        self.first = 0
+        self.end = None
+
+
+class MocapTake:
+    """The frames of one take, written to the ``mocap`` stream of ``container``."""
+
+    def __init__(self, container, start_ns):
+        self.container = container
+        self.path = container.path
+        self.start_ns = start_ns
+        self.stop_ns = None
+        self.columns = None
+        self.frames = 0
+        self.gaps = 0
+        self.error = None
+        self.finished = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait until the file is complete; returns False on timeout."""
+        return self.finished.wait(timeout)
+
+
+class MocapStreamReceiver:
+    """Receives Studio's UDP stream in the background and writes takes from it.
+
+    The column layout is taken from the first frame and rebuilt between
+    takes when actors or joints change; during a take, joints that were
+    not in the layout are ignored and missing ones are NaN.
+    """
+
+    def __init__(self, host="0.0.0.0", port=14043, chunk_frames=1024, log=None):
+        self.host = host
+        self.port = port
+        self.chunk_frames = chunk_frames
+        self.log = log or (lambda message, level="info": None)
+        self.columns = None
+        self.frames_received = 0
+        self.decode_errors = 0
+        self.last_frame_ns = None
+
+        self._layout = None
+        self._template = None
+        self._chunk = None
+        self._pool = queue.SimpleQueue()
+        self._writes = queue.SimpleQueue()
+        self._take = None
+        self.take = None
+        self._requests = queue.SimpleQueue()
+        self._socket = None
+        self._closed = threading.Event()
+        self._threads = []
+
+    @property
+    def address(self):
+        return self._socket.getsockname()[:2] if self._socket is not None else None
+
+    def open(self):
+        """Bind the UDP port and start the receiver and writer threads."""
+        if self._socket is not None:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Room for a burst of frames while the receiver thread waits for the GIL
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+        sock.bind((self.host, self.port))
+        sock.settimeout(0.1)
+        self._socket = sock
+        self._closed.clear()
+        self._threads = [
+            threading.Thread(target=self._receive_loop, daemon=True),
+            threading.Thread(target=self._write_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """Finish any take in progress and stop both threads."""
+        if self._socket is None:
+            return
+        if self.take is not None:
+            self.stop_take()
+        self._closed.set()
+        for thread in self._threads:
+            thread.join(timeout=5.0)
+        self._threads = []
+        self._socket.close()
+        self._socket = None
+
+    def start_take(self, container, at_ns=None):
+        """Write the frames received from ``at_ns`` (default now) on to a TakeFileWriter."""
+        take = MocapTake(container, time.perf_counter_ns() if at_ns is None else at_ns)
+        self.take = take
+        self._requests.put(("start", take))
+        return take
+
+    def stop_take(self, at_ns=None):
+        """End the take with the frames received before ``at_ns`` (default now)."""
+        take, self.take = self.take, None
+        self._requests.put(("stop", time.perf_counter_ns() if at_ns is None else at_ns))
+        return take
+
+    def _receive_loop(self):
+        """Thread function: decode every packet into the current chunk."""
+        buffer = bytearray(1 << 16)
+        view = memoryview(buffer)
+        while not self._closed.is_set():
+            try:
+                size = self._socket.recv_into(buffer)
+            except socket.timeout:
+                self._service_requests()
+                continue
+            except OSError:
+                break
+            recv_ns = time.perf_counter_ns()
+            try:
+                studio_time, joints = decode_packet(bytes(view[:size]))
+            except ValueError:
+                self.decode_errors += 1
+                continue
+            self.frames_received += 1
+            self.last_frame_ns = recv_ns
+            self._add_frame(recv_ns, studio_time, joints)
+            self._service_requests()
+        self._service_requests()
+        if self._take is not None:
+            self._end_take(time.perf_counter_ns())
+
+    def _add_frame(self, recv_ns, studio_time, joints):
+        if self._layout is None or (self._take is None and not joints.keys() <= self._layout.keys()):
+            self._build_layout(joints)
+        row = list(self._template)
+        layout = self._layout
+        for key, pose in joints.items():
+            base = layout.get(key)
+            if base is not None:
+                row[base:base + 7] = pose
+
+        chunk = self._chunk
+        index = chunk.rows
+        chunk.recv_ns[index] = recv_ns
+        chunk.studio_time[index] = studio_time
+        chunk.values[:, index] = row
+        chunk.rows += 1
+        if chunk.rows == chunk.capacity:
+            if self._take is not None:
+                self._writes.put((self._take, chunk))
+                self._chunk = self._next_chunk()
+            else:
+                chunk.reset()
+
+    def _build_layout(self, joints):
+        """Assign seven columns to every (actor, joint) of ``joints``."""
+        keys = sorted(joints)
+        self._layout = {key: 7 * i for i, key in enumerate(keys)}
+        self.columns = [f"{actor}/{joint}/{channel}" for actor, joint in keys for channel in CHANNELS]
+        self._template = [float("nan")] * len(self.columns)
+        self._pool = queue.SimpleQueue()
+        self._chunk = _Chunk(self.chunk_frames, len(self.columns))
+        if self._take is not None:
+            self._take.columns = self.columns
+
+    def _next_chunk(self):
+        try:
+            chunk = self._pool.get_nowait()
+            chunk.reset()
+            return chunk
+        except queue.Empty:
+            # The writer is behind or still holds every chunk; never drop frames for it
+            return _Chunk(self.chunk_frames, len(self.columns))
+
+    def _service_requests(self):
+        while True:
+            try:
+                action, argument = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if action == "start":
+                self._begin_take(argument)
+            elif self._take is not None:
+                self._end_take(argument)
+
+    def _begin_take(self, take):
+        if self._take is not None:
+            self._end_take(take.start_ns)
+        self._take = take
+        take.columns = self.columns
+        chunk = self._chunk
+        if chunk is not None:
+            chunk.first = int(np.searchsorted(chunk.recv_ns[:chunk.rows], take.start_ns))
+
+    def _end_take(self, stop_ns):
+        take = self._take
+        take.stop_ns = stop_ns
+        chunk = self._chunk
+        if chunk is not None:
+            chunk.end = int(np.searchsorted(chunk.recv_ns[:chunk.rows], stop_ns))
+            self._writes.put((take, chunk))
+            self._chunk = self._next_chunk()
+        self._writes.put((take, None))
+        self._take = None
+
+    def _write_loop(self):
+        """Thread function: write full chunks straight from their arrays."""
+        while True:
+            try:
+                take, chunk = self._writes.get(timeout=0.1)
+            except queue.Empty:
+                if self._closed.is_set() and not self._threads[0].is_alive():
+                    return
+                continue
+            if chunk is None:
+                self._finish(take)
+                continue
+            try:
+                self._write_chunk(take, chunk)
+            except OSError as e:
+                take.error = take.error or e
+            finally:
+                if chunk.values.shape[0] == len(self.columns or ()):
+                    self._pool.put(chunk)
+
+    def _write_chunk(self, take, chunk):
+        first = chunk.first
+        end = chunk.rows if chunk.end is None else chunk.end
+        frames = end - first
+        if frames <= 0:
+            return
+        take.container.add_stream("mocap", mocap_fields(len(take.columns)), kind="mocap",
+                                  time_field="recv_ns", columns=take.columns)
+        if first == 0 and end == chunk.capacity:
+            values = chunk.values
+        else:
+            values = chunk.values[:, first:end]
+        recv_ns = chunk.recv_ns[first:end]
+        studio_time = chunk.studio_time[first:end]
+        take.container.append("mocap", frames, int(recv_ns[0]), int(recv_ns[-1]),
+                              [recv_ns, studio_time, values])
+        if frames > 1:
+            steps = np.diff(studio_time)
+            step = np.median(steps)
+            if step > 0:
+                take.gaps += int(np.count_nonzero(steps > 1.5 * step))
+        take.frames += frames
+
+    def _finish(self, take):
+        if take.error is not None:
+            self.log(f"Mocap stream capture to {take.path} failed: {take.error}", "error")
+        else:
+            gaps = f", {take.gaps} gaps in Studio's timestamps" if take.gaps else ""
+            self.log(f"Mocap stream: {take.frames} frames written to {os.path.basename(take.path)}{gaps}.")
+        take.finished.set()
+
+
+def read_mocap_take(path, start_ns=None, end_ns=None):
+    """Load the mocap stream of a take file, optionally only [start_ns, end_ns).
+
+    Returns a dict with ``columns``, ``recv_ns``, ``studio_time`` and
+    ``values`` (one row per column, one column per frame).
+    """
+    with TakeFileReader(path) as reader:
+        stream = reader.streams["mocap"]
+        if start_ns is None or end_ns is None:
+            span = reader.time_range("mocap") or (0, 0)
+            start_ns = span[0] if start_ns is None else start_ns
+            end_ns = span[1] + 1 if end_ns is None else end_ns
+        window = reader.window("mocap", start_ns, end_ns)
+        return {
+            "columns": stream["columns"],
+            "recv_ns": window["recv_ns"].copy(),
+            "studio_time": window["studio_time"].copy(),
+            "values": window["values"].copy(),
+        }
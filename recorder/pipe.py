@@ -0,0 +1,204 @@
+"""Persistent mod-script-pipe client for Audacity."""
+
+import collections
+import os
+import select
+import sys
+import threading
+from concurrent.futures import Future
+
+if sys.platform == "win32":
+    TO_PIPE = r"\\.\pipe\ToSrvPipe"
+    FROM_PIPE = r"\\.\pipe\FromSrvPipe"
+    EOL = "\r\n\0"
+else:
+    TO_PIPE = f"/tmp/audacity_script_pipe.to.{os.getuid()}"
+    FROM_PIPE = f"/tmp/audacity_script_pipe.from.{os.getuid()}"
+    EOL = "\n"
+
+FINISHED_PREFIX = "BatchCommand finished:"
+
+
+class AudacityPipeError(Exception):
+    """Raised when Audacity cannot be reached or a command fails."""
+
+
+class AudacityPipe:
+    """Keeps Audacity's to-srv/from-srv pipes open for the life of the app.
+
+    Commands are written as soon as they are sent and matched to responses
+    in order by a reader thread that parses the from-srv stream
+    incrementally, so several commands can be in flight at once. ``send``
+    returns a Future; ``do`` waits for it like ``pyaudacity.do``.
+    """
+
+    name = "native pipe"
+    available = True
+
+    def __init__(self, to_pipe=TO_PIPE, from_pipe=FROM_PIPE, timeout=5.0):
+        self.to_pipe = to_pipe
+        self.from_pipe = from_pipe
+        self.timeout = timeout
+        self._write_fd = None
+        self._read_fd = None
+        self._reader = None
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._connection_listeners = []
+
+    @property
+    def connected(self):
+        """True while both pipes are open."""
+        return self._write_fd is not None
+
+    def add_connection_listener(self, callback):
+        """Register a callback invoked with True/False when the pipes open or close."""
+        self._connection_listeners.append(callback)
+
+    def connect(self):
+        """Open both pipes if they are not already open."""
+        with self._lock:
+            if self.connected:
+                return
+            try:
+                if sys.platform == "win32":
+                    write_fd = open(self.to_pipe, "wb", buffering=0)
+                    read_fd = open(self.from_pipe, "rb", buffering=0)
+                else:
+                    # Non-blocking open fails fast instead of hanging when Audacity is not reading
+                    write_fd = os.open(self.to_pipe, os.O_WRONLY | os.O_NONBLOCK)
+                    try:
+                        os.set_blocking(write_fd, True)
+                        # Audacity opens its end of from-srv right after accepting to-srv
+                        read_fd = os.open(self.from_pipe, os.O_RDONLY)
+                    except OSError:
+                        os.close(write_fd)
+                        raise
+            except OSError as e:
+                raise AudacityPipeError(f"Could not open Audacity pipes: {e}") from e
+
+            self._write_fd = write_fd
+            self._read_fd = read_fd
+            self._reader = threading.Thread(target=self._read_loop, args=(read_fd,), daemon=True)
+            self._reader.start()
+
+        for callback in self._connection_listeners:
+            callback(True)
+
+    def close(self):
+        """Close both pipes and fail any command still in flight."""
+        with self._lock:
+            write_fd, read_fd = self._write_fd, self._read_fd
+            if write_fd is None:
+                return
+            self._write_fd = None
+            self._read_fd = None
+            pending = list(self._pending)
+            self._pending.clear()
+
+        for fd in (write_fd, read_fd):
+            if fd is None:
+                continue
+            try:
+                if sys.platform == "win32":
+                    fd.close()
+                else:
+                    os.close(fd)
+            except OSError:
+                pass
+
+        for future in pending:
+            if not future.done():
+                future.set_exception(AudacityPipeError("Audacity pipe closed"))
+
+        for callback in self._connection_listeners:
+            callback(False)
+
+    def send(self, command):
+        """Write one command and return a Future for its response."""
+        return self.send_many([command])[0]
+
+    def send_many(self, commands):
+        """Write several commands in a single write and return their Futures."""
+        if not self.connected:
+            self.connect()
+
+        data = "".join(command + EOL for command in commands).encode("utf-8")
+        futures = [Future() for _ in commands]
+        with self._lock:
+            if not self.connected:
+                raise AudacityPipeError("Audacity pipe closed")
+            self._pending.extend(futures)
+            try:
+                if sys.platform == "win32":
+                    self._write_fd.write(data)
+                else:
+                    view = memoryview(data)
+                    while view:
+                        written = os.write(self._write_fd, view)
+                        view = view[written:]
+            except OSError as e:
+                for future in futures:
+                    self._pending.remove(future)
+                failed = AudacityPipeError(f"Error writing to Audacity: {e}")
+            else:
+                failed = None
+
+        if failed is not None:
+            self.close()
+            raise failed
+        return futures
+
+    def do(self, command, timeout=None):
+        """Send one command and wait for its response text."""
+        future = self.send(command)
+        return future.result(timeout=timeout or self.timeout)
+
+    def _read_loop(self, read_fd):
+        """Thread function: split the from-srv stream into responses."""
+        buffer = b""
+        lines = []
+        finished = False
+
+        while True:
+            try:
+                if sys.platform == "win32":
+                    chunk = read_fd.read(65536)
+                else:
+                    # Wake up periodically so close() can end this thread
+                    ready, _, _ = select.select([read_fd], [], [], 0.2)
+                    if self._read_fd != read_fd:
+                        return
+                    if not ready:
+                        continue
+                    chunk = os.read(read_fd, 65536)
+            except (OSError, ValueError):
+                chunk = b""
+
+            if not chunk:
+                if self._read_fd == read_fd:
+                    self.close()
+                return
+
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            for raw in complete:
+                line = raw.decode("utf-8", errors="replace").strip("\r\0")
+                if line == "" and finished:
+                    self._resolve("\n".join(lines))
+                    lines = []
+                    finished = False
+                    continue
+                lines.append(line)
+                finished = line.startswith(FINISHED_PREFIX)
+
+    def _resolve(self, response):
+        """Hand a complete response to the oldest command waiting for one."""
+        with self._lock:
+            future = self._pending.popleft() if self._pending else None
+        if future is None:
+            return
+        if response.rstrip().endswith(FINISHED_PREFIX + " OK"):
+            future.set_result(response + "\n")
+        else:
+            future.set_exception(AudacityPipeError(response))
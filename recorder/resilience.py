@@ -0,0 +1,97 @@
+"""Adaptive timeouts and a circuit breaker for network control paths."""
+
+import threading
+import time
+
+
+class CircuitOpenError(OSError):
+    """Raised instead of sending a request to a host that is known to be down."""
+
+
+class RttEstimator:
+    """Smoothed round-trip time and derived timeout for one endpoint.
+
+    Uses the TCP retransmission-timer estimator (RFC 6298): the timeout is
+    the smoothed RTT plus four times its mean deviation, clamped to
+    ``[min_timeout, max_timeout]``. Until the first sample it is
+    ``max_timeout``.
+    """
+
+    def __init__(self, min_timeout=0.25, max_timeout=5.0):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+
+    def add(self, rtt):
+        """Feed one measured round trip in seconds."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+
+    def timeout(self):
+        """Seconds to wait for a response before giving up."""
+        if self.srtt is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.srtt + 4.0 * self.rttvar))
+
+    def hedge_delay(self, floor=0.02):
+        """Seconds after which a response is unusually late (about the 95th percentile)."""
+        if self.srtt is None:
+            return self.max_timeout / 2.0
+        return min(self.timeout(), max(floor, self.srtt + 2.0 * self.rttvar))
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, then lets a single trial through.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    ``check`` raises CircuitOpenError for ``reset_timeout`` seconds. Then
+    one call is let through (half-open); its success closes the circuit
+    and its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=5.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError(
+                f"{self.name} failed {self.failures} times in a row; not retrying for "
+                f"{self.reset_timeout:.0f} s"
+            )
+
+    def success(self):
+        """Record a successful call; closes the circuit."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        """Record a failed call; may open the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
@@ -0,0 +1,368 @@
+"""Persistent HTTP client for the Rokoko Studio command API."""
+
+import collections
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .clocksync import ClockEstimator
+from .resilience import CircuitBreaker, RttEstimator
+
+
+class RokokoTarget(collections.namedtuple("RokokoTarget", "ip port api_key")):
+    """Address and API key of one Rokoko Studio host."""
+
+    def __str__(self):
+        return f"{self.ip}:{self.port}"
+
+
+def rokoko_targets(config):
+    """Return every Rokoko Studio host in the configuration, the main one first.
+
+    ``rokoko_targets`` lists additional hosts as objects with an ``ip`` and
+    optional ``port``/``api_key`` that default to the main host's values.
+    """
+    port = config.get("rokoko_port")
+    api_key = config.get("rokoko_api_key")
+    targets = [RokokoTarget(config.get("rokoko_ip"), port, api_key)]
+    for entry in config.get("rokoko_targets") or []:
+        target = RokokoTarget(entry["ip"], entry.get("port", port), entry.get("api_key", api_key))
+        if target not in targets:
+            targets.append(target)
+    return targets
+
+
+class TargetResult:
+    """Outcome and timestamps of one command sent to one Rokoko host."""
+
+    def __init__(self, target):
+        self.target = target
+        self.success = False
+        self.dispatch_ns = None
+        self.ack_ns = None
+        # When the host acted, on its own clock, if its offset is known
+        self.remote_ns = None
+        self.clock_uncertainty_ns = None
+
+    @property
+    def latency_ms(self):
+        """Time from dispatch to response in milliseconds."""
+        if self.dispatch_ns is None or self.ack_ns is None:
+            return None
+        return (self.ack_ns - self.dispatch_ns) / 1e6
+
+    def stamp_remote(self, clock):
+        """Place the command on the host's clock from a ClockEstimator.
+
+        The host acted somewhere between dispatch and ack, so half the
+        round trip is added to the clock's own uncertainty.
+        """
+        if self.dispatch_ns is None or self.ack_ns is None:
+            return
+        stamp = clock.to_remote((self.dispatch_ns + self.ack_ns) // 2)
+        if stamp is not None:
+            self.remote_ns = stamp[0]
+            self.clock_uncertainty_ns = stamp[1] + (self.ack_ns - self.dispatch_ns) // 2
+
+
+class RokokoClient:
+    """Keeps a warm keep-alive connection and pre-built requests for one Studio host.
+
+    The start and stop requests are prepared once per configuration change,
+    so a record press only has to write them to an already open socket. A
+    background thread refreshes the pooled connection with a cheap info
+    request whenever it has been idle for ``keepalive_interval`` seconds.
+
+    Timeouts adapt to the round trips observed per endpoint (start, stop
+    and info) instead of a fixed five seconds. A start is sent at most once
+    unless the connection could not even be opened, so Studio never sees a
+    duplicate start. A stop is idempotent: when its response is late a
+    second copy is sent on another connection and the first answer wins.
+    After ``failure_threshold`` consecutive connection failures the client
+    fails fast until a ping or a trial request gets through again.
+
+    Every response's Date header also feeds ``clock``, the host's clock
+    offset (see ``recorder.clocksync``).
+
+    ``requests`` is imported when the first client is created rather than
+    with this module, so front ends can paint their window first.
+    """
+
+    def __init__(self, timeout=5.0, keepalive_interval=5.0, start_attempts=2, stop_attempts=3,
+                 failure_threshold=3, reset_timeout=5.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self.start_attempts = start_attempts
+        self.stop_attempts = stop_attempts
+        # Room for attempts abandoned by earlier stops that have not timed out yet
+        self.hedge_workers = stop_attempts * 3
+        # Start and stop get a generous floor: giving up on a start that
+        # Studio is still processing leaves it recording on its own
+        self.rtt = {
+            "start": RttEstimator(min_timeout=1.0, max_timeout=timeout),
+            "stop": RttEstimator(min_timeout=1.0, max_timeout=timeout),
+            "info": RttEstimator(min_timeout=0.25, max_timeout=timeout),
+        }
+        self.breaker = CircuitBreaker("Rokoko Studio", failure_threshold, reset_timeout)
+        self.clock = ClockEstimator()
+        self._hedge_pool = None
+
+        self.session = requests.Session()
+        self.session.trust_env = False
+        # One pooled connection per stop worker, plus one for starts, pings and keep-alives
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.hedge_workers + 1, max_retries=0)
+        self.session.mount("http://", adapter)
+
+        self.base_url = None
+        self.frame_rate = None
+        self.clip_name = None
+        self.start_request = None
+        self.stop_request = None
+        self.info_request = None
+        self._clip_requests = {}
+
+        self._last_used = 0.0
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def configure(self, ip, port, api_key, clip_name, frame_rate, clip_names=()):
+        """Rebuild the prepared requests for new connection or clip settings.
+
+        ``clip_names`` are further clips (e.g. a shot list) whose requests
+        are prepared now so ``select_clip`` can switch to them instantly.
+        """
+        import requests
+
+        base_url = f"http://{ip}:{port}/v1/{api_key}"
+        info = requests.Request("POST", base_url + "/info", json={
+            "devices_info": False,
+            "clips_info": False
+        })
+
+        new_host = base_url != self.base_url
+        self.base_url = base_url
+        self.frame_rate = frame_rate
+        self._clip_requests = {}
+        self.info_request = self.session.prepare_request(info)
+        self.prepare_clips(clip_names)
+        self.select_clip(clip_name)
+
+        if new_host:
+            # New host: open a connection to it straight away
+            self._last_used = 0.0
+            self._wake.set()
+
+    def prepare_clips(self, clip_names):
+        """Prepare the start and stop requests for several clip names ahead of time."""
+        import requests
+
+        for clip_name in clip_names:
+            if clip_name in self._clip_requests:
+                continue
+            start = requests.Request("POST", self.base_url + "/recording/start", json={
+                "filename": clip_name,
+                "frame_rate": self.frame_rate
+            })
+            stop = requests.Request("POST", self.base_url + "/recording/stop", json={
+                "filename": clip_name,
+                "frame_rate": self.frame_rate,
+                "back_to_live": True
+            })
+            self._clip_requests[clip_name] = (
+                self.session.prepare_request(start),
+                self.session.prepare_request(stop)
+            )
+
+    def select_clip(self, clip_name):
+        """Make the next start and stop use ``clip_name``; call between takes only."""
+        if clip_name not in self._clip_requests:
+            self.prepare_clips([clip_name])
+        self.start_request, self.stop_request = self._clip_requests[clip_name]
+        self.clip_name = clip_name
+
+    @property
+    def ready(self):
+        """True once the start and stop requests have been prepared."""
+        return self.start_request is not None and self.stop_request is not None
+
+    def start(self):
+        """Send the prepared start request and return the response.
+
+        Retried only when the connection could not be opened, i.e. the
+        request provably never reached Studio.
+        """
+        self.breaker.check()
+        for attempt in range(1, self.start_attempts + 1):
+            try:
+                response = self._timed_send("start", self.start_request)
+            except OSError as e:
+                if attempt < self.start_attempts and _never_sent(e):
+                    continue
+                self.breaker.failure()
+                raise
+            self.breaker.success()
+            return response
+
+    def stop(self):
+        """Send the prepared stop request, hedged and retried; return the first response."""
+        self.breaker.check()
+        pool = self._hedge_executor()
+        pending = {pool.submit(self._timed_send, "stop", self.stop_request)}
+        attempts = 1
+        error = None
+        while pending:
+            delay = self.rtt["stop"].hedge_delay() if attempts < self.stop_attempts else None
+            done, pending = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except OSError as e:
+                    error = e
+                    continue
+                self.breaker.success()
+                return response
+            if attempts < self.stop_attempts:
+                # Late or failed: send another copy on a second connection
+                pending.add(pool.submit(self._timed_send, "stop", self.stop_request))
+                attempts += 1
+        self.breaker.failure()
+        raise error
+
+    def send(self, prepared, timeout=None):
+        """Send a prepared request over the pooled session."""
+        try:
+            return self.session.send(prepared, timeout=timeout or self.timeout)
+        finally:
+            self._last_used = time.monotonic()
+
+    def export(self, command, clip_name, timeout=60.0):
+        """Ask Studio to export ``clip_name`` with ``command`` of its API; raises on failure.
+
+        Exports are rare and slow, so the request is built here and its
+        round trip is kept out of the start/stop timeout estimates.
+        """
+        import requests
+
+        self.breaker.check()
+        request = requests.Request("POST", f"{self.base_url}/{command.strip('/')}", json={
+            "filename": clip_name
+        })
+        response = self.send(self.session.prepare_request(request), timeout=timeout)
+        if response.status_code != 200:
+            raise OSError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def timeouts(self, endpoint):
+        """Return the (connect, read) timeouts for ``endpoint`` from its observed round trips."""
+        return self.rtt["info"].timeout(), self.rtt[endpoint].timeout()
+
+    def ping(self, timeout=1.0):
+        """Send the info request and return its round trip in milliseconds; raises on failure.
+
+        Pings bypass the circuit breaker, so a host that is back closes it.
+        """
+        began = time.perf_counter_ns()
+        try:
+            response = self.send(self.info_request, timeout=timeout)
+        except OSError:
+            self.breaker.failure()
+            raise
+        ended = time.perf_counter_ns()
+        rtt_ns = ended - began
+        self.breaker.success()
+        if response.status_code != 200:
+            raise OSError(f"HTTP {response.status_code}")
+        self.rtt["info"].add(rtt_ns / 1e9)
+        self.clock.add_response(began, ended, response)
+        return rtt_ns / 1e6
+
+    def recording(self, timeout=1.0):
+        """Ask Studio whether it is recording; None when its info response does not say."""
+        began = time.perf_counter_ns()
+        response = self.send(self.info_request, timeout=timeout)
+        self.clock.add_response(began, time.perf_counter_ns(), response)
+        if response.status_code != 200:
+            raise OSError(f"HTTP {response.status_code}")
+        try:
+            info = response.json()
+        except ValueError:
+            return None
+        for section in (info, info.get("parameters")):
+            if isinstance(section, dict) and "recording" in section:
+                return bool(section["recording"])
+        return None
+
+    def warm(self):
+        """Open or refresh the pooled connection with a cheap info request."""
+        if self.info_request is None:
+            return False
+        try:
+            self._timed_send("info", self.info_request)
+            return True
+        except OSError:
+            # requests' RequestException is an OSError
+            return False
+
+    def open(self):
+        """Start the background thread that keeps the connection warm."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+        self._thread.start()
+        # The executor starts its threads on demand; start the first one
+        # now so the first stop does not pay for it
+        self._hedge_executor().submit(_spawn_worker)
+
+    def close(self):
+        """Stop the keep-alive thread and close pooled connections."""
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+        self.session.close()
+
+    def _timed_send(self, endpoint, prepared):
+        """Send with the endpoint's adaptive timeouts and feed back the round trip."""
+        began = time.perf_counter_ns()
+        response = self.send(prepared, timeout=self.timeouts(endpoint))
+        ended = time.perf_counter_ns()
+        self.rtt[endpoint].add((ended - began) / 1e9)
+        self.clock.add_response(began, ended, response)
+        return response
+
+    def _hedge_executor(self):
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                  thread_name_prefix="rokoko-stop")
+        return self._hedge_pool
+
+    def _keepalive_loop(self):
+        """Thread function to keep the pooled connection open."""
+        while not self._closed.is_set():
+            if time.monotonic() - self._last_used >= self.keepalive_interval:
+                self.warm()
+            self._wake.wait(self.keepalive_interval)
+            self._wake.clear()
+
+
+def _spawn_worker():
+    """Do nothing; submitted only to make an executor start a worker thread."""
+
+
+def _never_sent(error):
+    """True if a request failed before its connection was open, so resending cannot duplicate it."""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
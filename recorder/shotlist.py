@@ -0,0 +1,142 @@
+"""Shot lists: a planned sequence of takes with precomputed clip names."""
+
+import csv
+import json
+import os
+import time
+
+
+PENDING = "pending"
+RECORDING = "recording"
+RECORDED = "recorded"
+SKIPPED = "skipped"
+INTERRUPTED = "interrupted"
+
+
+class ShotList:
+    """Scenes and takes to record back to back, with status saved after every change.
+
+    The list is a CSV file with one scene per row: the scene name and an
+    optional number of takes (default 1); a header row starting with
+    ``scene`` is skipped. Every take gets a clip name from ``clip_format``
+    (``{scene}``, ``{take}`` and ``{index}`` are available) up front.
+
+    Status is kept in ``<list>.status.json``. Loading a list with a status
+    file resumes at the first pending take; a take that was still recording
+    when the application stopped is marked interrupted.
+    """
+
+    def __init__(self, path, clip_format="{scene}_T{take:02d}"):
+        self.path = path
+        self.status_path = path + ".status.json"
+        self.entries = []
+
+        with open(path, 'r', newline='') as f:
+            for row in csv.reader(f):
+                cells = [cell.strip() for cell in row]
+                if not cells or not cells[0] or cells[0].startswith("#"):
+                    continue
+                if not self.entries and cells[0].lower() == "scene":
+                    continue
+                scene = cells[0]
+                takes = int(cells[1]) if len(cells) > 1 and cells[1] else 1
+                for take in range(1, takes + 1):
+                    index = len(self.entries) + 1
+                    self.entries.append({
+                        "index": index,
+                        "scene": scene,
+                        "take": take,
+                        "clip_name": clip_format.format(scene=scene, take=take, index=index),
+                        "status": PENDING,
+                    })
+
+        if not self.entries:
+            raise ValueError(f"{path} lists no scenes")
+        self._restore()
+        self.position = self._next_pending(0)
+
+    @property
+    def clip_names(self):
+        return [entry["clip_name"] for entry in self.entries]
+
+    @property
+    def current(self):
+        """The take the next start records, or None when the list is done."""
+        if self.position is None:
+            return None
+        return self.entries[self.position]
+
+    @property
+    def done(self):
+        return self.position is None
+
+    def progress(self):
+        """Return 'N/total' for the current take, or 'done'."""
+        if self.position is None:
+            return "done"
+        return f"{self.position + 1}/{len(self.entries)}"
+
+    def started(self):
+        """Mark the current take as recording."""
+        entry = self.current
+        if entry is not None:
+            entry["status"] = RECORDING
+            entry["started_at"] = time.time()
+            self.save()
+
+    def stopped(self, success, failed=()):
+        """Mark the current take as recorded and move on to the next pending one."""
+        entry = self.current
+        if entry is None:
+            return None
+        entry["status"] = RECORDED
+        entry["stopped_at"] = time.time()
+        if not success:
+            entry["stop_failed"] = list(failed)
+        return self._advance()
+
+    def skip(self):
+        """Leave the current take unrecorded and move on."""
+        entry = self.current
+        if entry is None:
+            return None
+        entry["status"] = SKIPPED
+        return self._advance()
+
+    def save(self):
+        """Write the status file atomically."""
+        data = {"shot_list": os.path.abspath(self.path), "entries": self.entries}
+        temp = self.status_path + ".tmp"
+        with open(temp, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(temp, self.status_path)
+
+    def _advance(self):
+        self.position = self._next_pending(self.position + 1)
+        self.save()
+        return self.current
+
+    def _next_pending(self, start):
+        for position in range(start, len(self.entries)):
+            if self.entries[position]["status"] == PENDING:
+                return position
+        return None
+
+    def _restore(self):
+        """Apply the statuses saved by an earlier session to matching takes."""
+        try:
+            with open(self.status_path, 'r') as f:
+                saved = json.load(f).get("entries", [])
+        except (OSError, ValueError):
+            return
+
+        by_clip = {entry["clip_name"]: entry for entry in saved}
+        for entry in self.entries:
+            previous = by_clip.get(entry["clip_name"])
+            if previous is None:
+                continue
+            for key, value in previous.items():
+                if key not in ("index", "scene", "take", "clip_name"):
+                    entry[key] = value
+            if entry["status"] == RECORDING:
+                entry["status"] = INTERRUPTED
@@ -0,0 +1,431 @@
+"""Barrier-synchronised start/stop of several recording backends."""
+
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .trace import NullTracer
+
+# Spin on the clock for the last few milliseconds before a scheduled release
+SPIN_NS = 2_000_000
+
+# GIL switch interval while spinning and releasing, so other threads cannot hold it for long
+SPIN_SWITCH_INTERVAL = 0.0001
+
+
+def wait_until(deadline_ns, cancel=None, spin_ns=SPIN_NS):
+    """Wait for a perf_counter_ns deadline with a hybrid sleep/spin.
+
+    Sleeps (in short slices, so ``cancel`` is noticed) until ``spin_ns``
+    before the deadline, then busy-waits on the clock with a short GIL
+    switch interval. Returns False if ``cancel`` was set.
+    """
+    while True:
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining <= spin_ns:
+            break
+        timeout = min((remaining - spin_ns) / 1e9, 0.05)
+        if cancel is not None:
+            if cancel.wait(timeout):
+                return False
+        else:
+            time.sleep(timeout)
+
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(SPIN_SWITCH_INTERVAL)
+    try:
+        while time.perf_counter_ns() < deadline_ns:
+            pass
+    finally:
+        sys.setswitchinterval(previous)
+    return True
+
+
+def poll_until(check, deadline_ns, first=0.001, longest=0.02, growth=1.5):
+    """Call ``check()`` until it returns something other than None, and return that.
+
+    The first polls follow each other closely and the gaps grow by
+    ``growth`` up to ``longest`` seconds, so a state that flips quickly is
+    seen within a millisecond or two without hammering a slow one. Raises
+    TimeoutError once the perf_counter_ns ``deadline_ns`` has passed.
+    """
+    interval = first
+    while True:
+        result = check()
+        if result is not None:
+            return result
+        remaining = (deadline_ns - time.perf_counter_ns()) / 1e9
+        if remaining <= 0:
+            raise TimeoutError("timed out")
+        time.sleep(min(interval, remaining))
+        interval = min(interval * growth, longest)
+
+
+def wall_to_perf_ns(wall_ns, samples=5):
+    """Convert a time.time_ns() instant to the perf_counter_ns() timebase."""
+    best = None
+    for _ in range(samples):
+        before = time.perf_counter_ns()
+        wall = time.time_ns()
+        after = time.perf_counter_ns()
+        if best is None or after - before < best[0]:
+            best = (after - before, wall - (before + after) // 2)
+    return wall_ns - best[1]
+
+
+def next_start_instant(at=None, frame_rate=None, min_lead=0.5, now=None):
+    """Return the wall-clock datetime a scheduled start should fire at.
+
+    ``at`` may be None (the next whole second at least ``min_lead`` seconds
+    away), a datetime, or a time of day ``HH:MM:SS``, ``HH:MM:SS.fff`` or
+    timecode ``HH:MM:SS:FF`` (frames at ``frame_rate``). Raises ValueError
+    for malformed or past times.
+    """
+    now = now or datetime.now()
+    if at is None or at == "":
+        target = now.replace(microsecond=0) + timedelta(seconds=1)
+        while (target - now).total_seconds() < min_lead:
+            target += timedelta(seconds=1)
+        return target
+    if isinstance(at, datetime):
+        target = at
+    else:
+        match = re.match(r"^(\d{1,2}):(\d{2}):(\d{2})(?:([.:])(\d+))?$", at.strip())
+        if not match:
+            raise ValueError(f"Invalid start time: {at}")
+        hours, minutes, seconds = (int(match.group(i)) for i in (1, 2, 3))
+        fraction = 0.0
+        if match.group(4) == ".":
+            fraction = float("0." + match.group(5))
+        elif match.group(4) == ":":
+            if not frame_rate:
+                raise ValueError("A timecode needs a frame rate")
+            fraction = int(match.group(5)) / float(frame_rate)
+        target = now.replace(hour=hours, minute=minutes, second=seconds, microsecond=0)
+        target += timedelta(seconds=fraction)
+    if target <= now:
+        raise ValueError(f"Start time {target.strftime('%H:%M:%S.%f')[:-3]} has already passed")
+    return target
+
+
+class BackendTiming:
+    """Monotonic timestamps for one backend within a start or stop phase."""
+
+    def __init__(self, name):
+        self.name = name
+        self.prepared = False
+        self.dispatch_ns = None
+        self.ack_ns = None
+        # When the backend was seen to actually record (or stop), if it can tell
+        self.confirmed_ns = None
+        self.success = False
+
+    @property
+    def latency_ms(self):
+        """Time from dispatch to acknowledgement in milliseconds."""
+        if self.dispatch_ns is None or self.ack_ns is None:
+            return None
+        return (self.ack_ns - self.dispatch_ns) / 1e6
+
+
+class PhaseResult:
+    """Outcome and measured skew of a coordinated start or stop."""
+
+    def __init__(self, action, timings, released_ns, scheduled_ns=None, cancelled=False):
+        self.action = action
+        self.timings = timings
+        self.released_ns = released_ns
+        self.scheduled_ns = scheduled_ns
+        self.cancelled = cancelled
+        # Backends stopped again because the start did not succeed everywhere
+        self.rolled_back = []
+
+    @property
+    def success(self):
+        """True when every backend acknowledged the command."""
+        return all(t.success for t in self.timings)
+
+    @property
+    def failed(self):
+        """Names of the backends that did not acknowledge the command."""
+        return [t.name for t in self.timings if not t.success]
+
+    @staticmethod
+    def _spread_ms(values):
+        values = [v for v in values if v is not None]
+        if len(values) < 2:
+            return None
+        return (max(values) - min(values)) / 1e6
+
+    @property
+    def dispatch_skew_ms(self):
+        """Spread between the earliest and latest dispatch in milliseconds."""
+        return self._spread_ms(t.dispatch_ns for t in self.timings)
+
+    @property
+    def ack_skew_ms(self):
+        """Spread between the earliest and latest acknowledgement in milliseconds."""
+        return self._spread_ms(t.ack_ns for t in self.timings)
+
+    @property
+    def confirmed_skew_ms(self):
+        """Spread between the backends' confirmed start (or stop) instants in milliseconds."""
+        return self._spread_ms(t.confirmed_ns for t in self.timings)
+
+    @property
+    def deviation_ms(self):
+        """How late the first command left relative to the scheduled instant."""
+        dispatched = [t.dispatch_ns for t in self.timings if t.dispatch_ns is not None]
+        if self.scheduled_ns is None or not dispatched:
+            return None
+        return (min(dispatched) - self.scheduled_ns) / 1e6
+
+    def deviation_summary(self):
+        """One-line description of the dispatch deviation from the scheduled instant."""
+        if self.scheduled_ns is None:
+            return None
+        parts = [f"release {(self.released_ns - self.scheduled_ns) / 1e6:+.3f} ms"]
+        for t in self.timings:
+            if t.dispatch_ns is not None:
+                parts.append(f"{t.name} {(t.dispatch_ns - self.scheduled_ns) / 1e6:+.3f} ms")
+        return "Scheduled start deviation: " + ", ".join(parts)
+
+    def summary(self):
+        """One-line human readable description of the measured skew."""
+        parts = []
+        for t in self.timings:
+            if t.latency_ms is not None:
+                parts.append(f"{t.name} {t.latency_ms:.1f} ms")
+        text = f"{self.action.capitalize()} skew:"
+        if self.ack_skew_ms is not None:
+            text += f" {self.ack_skew_ms:.1f} ms (dispatch {self.dispatch_skew_ms:.3f} ms)"
+        else:
+            text += " n/a"
+        if parts:
+            text += " | " + ", ".join(parts)
+        if self.confirmed_skew_ms is not None:
+            text += f" | confirmed {self.confirmed_skew_ms:.1f} ms apart"
+        return text
+
+
+class RecordingCoordinator:
+    """Prepares every backend, then releases their commands together from a barrier.
+
+    Each backend gets its own dispatch thread. The threads prepare their
+    request, wait on a shared barrier, and send the command as soon as the
+    coordinator passes the barrier, so no backend waits on another's I/O.
+
+    An acknowledged command is not taken as proof: a backend with a
+    ``confirm(action, deadline_ns)`` method is then polled, on its own
+    dispatch thread, until it reports the new state. ``confirm`` returns
+    the perf_counter_ns instant the backend actually started (or stopped)
+    recording, None when it cannot tell, or raises when the deadline,
+    ``confirm_timeout`` seconds after the acknowledgement, passes first.
+    A start that did not succeed on every backend is rolled back: every
+    backend it was sent to is stopped again within ``rollback_timeout``
+    seconds, through its ``roll_back`` method if it has one, so no take is
+    left recording on one side only. That includes backends that refused
+    or timed out, as a command whose answer was lost may still have run.
+    """
+
+    def __init__(self, backends, log=None, prepare_timeout=5.0, tracer=None, confirm_timeout=1.0,
+                 rollback_timeout=3.0):
+        self.backends = list(backends)
+        self.log = log or (lambda message, level="info": None)
+        self.prepare_timeout = prepare_timeout
+        self.confirm_timeout = confirm_timeout
+        self.rollback_timeout = rollback_timeout
+        self.tracer = tracer or NullTracer()
+        # Set while a start or stop is in progress
+        self.busy = threading.Event()
+        self._cancel = threading.Event()
+
+    def open(self):
+        """Open connections and warm up every backend."""
+        for backend in self.backends:
+            backend.open()
+
+    def close(self):
+        """Release every backend's connections."""
+        for backend in self.backends:
+            backend.close()
+
+    def warm(self):
+        """Refresh every backend's connection ahead of a scheduled start."""
+        for backend in self.backends:
+            backend.warm()
+
+    def start(self, at_ns=None):
+        """Start recording on all backends at once, optionally at a perf_counter_ns instant."""
+        self.busy.set()
+        try:
+            return self._run("start", at_ns)
+        finally:
+            self.busy.clear()
+
+    def stop(self):
+        """Stop recording on all backends at once."""
+        self.busy.set()
+        try:
+            return self._run("stop")
+        finally:
+            self.busy.clear()
+
+    def cancel(self):
+        """Abort a scheduled start that has not fired yet."""
+        self._cancel.set()
+
+    def clear_cancel(self):
+        """Forget a cancel that came too late, so it does not abort the next scheduled start."""
+        self._cancel.clear()
+
+    def _run(self, action, at_ns=None):
+        timings = [BackendTiming(b.name) for b in self.backends]
+        barrier = threading.Barrier(len(self.backends) + 1, timeout=self.prepare_timeout)
+
+        # Dispatch threads may have to wait at the barrier until the scheduled instant
+        wait_timeout = self.prepare_timeout
+        if at_ns is not None:
+            wait_timeout += max(0, at_ns - time.perf_counter_ns()) / 1e9
+
+        threads = []
+        for backend, timing in zip(self.backends, timings):
+            thread = threading.Thread(
+                target=self._dispatch,
+                args=(backend, timing, timings, action, barrier, wait_timeout),
+                daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+        cancelled = False
+        if at_ns is not None:
+            # A cancel that arrived while warming up still counts
+            if not wait_until(at_ns, self._cancel):
+                cancelled = True
+                barrier.abort()
+                self.log("Scheduled start cancelled.", "warning")
+            self._cancel.clear()
+
+        # Short GIL slices while releasing, so no dispatch thread waits behind another
+        previous = sys.getswitchinterval()
+        sys.setswitchinterval(SPIN_SWITCH_INTERVAL)
+        try:
+            # Release every dispatch thread as soon as all of them are prepared
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                if not cancelled:
+                    self.log(f"Timed out preparing backends for {action}.", "warning")
+            released_ns = time.perf_counter_ns()
+            self.tracer.mark("release", action=action)
+
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(previous)
+
+        # Only once every backend has answered, so polling one cannot hold up another's command
+        if self.confirm_timeout and not cancelled:
+            self._confirm_all(action, timings)
+
+        if action == "start" and not all(t.prepared for t in timings):
+            not_ready = [t.name for t in timings if not t.prepared]
+            self.log(f"Start aborted, not ready: {', '.join(not_ready)}", "error")
+
+        result = PhaseResult(action, timings, released_ns, scheduled_ns=at_ns, cancelled=cancelled)
+        if action == "start" and not result.success and any(t.dispatch_ns is not None for t in timings):
+            result.rolled_back = self._roll_back(timings)
+        self.tracer.record_phase(result)
+        return result
+
+    def _roll_back(self, timings):
+        """Stop every backend a failed start was sent to; returns the names of those stopped."""
+        reached = [backend for backend, timing in zip(self.backends, timings) if timing.dispatch_ns is not None]
+        stopped = []
+        lock = threading.Lock()
+
+        def stop(backend):
+            try:
+                acknowledged = getattr(backend, "roll_back", backend.stop)()
+                # One that refused the start may refuse the stop too; seeing it stopped is enough
+                seen = self._confirm(backend, "stop", time.perf_counter_ns() + int(self.confirm_timeout * 1e9))
+                if acknowledged or seen is not None:
+                    with lock:
+                        stopped.append(backend.name)
+            except Exception as e:
+                self.log(f"Error stopping {backend.name} after the failed start: {e}", "error")
+
+        deadline = time.monotonic() + self.rollback_timeout
+        threads = [threading.Thread(target=stop, args=(backend,), daemon=True) for backend in reached]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        # Stops still running past the deadline must not change what is reported
+        with lock:
+            done = list(stopped)
+        left = [backend.name for backend in reached if backend.name not in done]
+        if left:
+            self.log(f"Could not roll back the partial start on {', '.join(left)} within "
+                     f"{self.rollback_timeout:g} s; stop it there by hand.", "error")
+        else:
+            self.log(f"Rolled back the partial start: stopped {', '.join(done)} again.", "warning")
+        self.tracer.mark("rollback", stopped=done, left=left)
+        return done
+
+    def _confirm(self, backend, action, deadline_ns):
+        """Wait for ``backend`` to report the state ``action`` leads to; see the class docstring."""
+        confirm = getattr(backend, "confirm", None)
+        if confirm is None or not self.confirm_timeout:
+            return None
+        return confirm(action, deadline_ns)
+
+    def _dispatch(self, backend, timing, timings, action, barrier, wait_timeout):
+        """Thread function: prepare, wait for release, then send the command."""
+        try:
+            timing.prepared = bool(backend.prepare(action))
+        except Exception as e:
+            self.log(f"Error preparing {backend.name}: {e}", "error")
+
+        try:
+            barrier.wait(wait_timeout)
+        except threading.BrokenBarrierError:
+            # Never start half a take; stops still go out to whoever is ready
+            if action == "start":
+                return
+
+        if not timing.prepared:
+            return
+        if action == "start" and not all(t.prepared for t in timings):
+            return
+
+        timing.dispatch_ns = time.perf_counter_ns()
+        try:
+            timing.success = bool(getattr(backend, action)())
+        except Exception as e:
+            self.log(f"Unexpected error during {backend.name} {action}: {e}", "error")
+        timing.ack_ns = time.perf_counter_ns()
+
+    def _confirm_all(self, action, timings):
+        """Poll every backend that acknowledged ``action``, concurrently, until it is seen in its new state."""
+        threads = [
+            threading.Thread(target=self._confirm_one, args=(backend, timing, action), daemon=True)
+            for backend, timing in zip(self.backends, timings) if timing.success
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _confirm_one(self, backend, timing, action):
+        try:
+            timing.confirmed_ns = self._confirm(backend, action, timing.ack_ns + int(self.confirm_timeout * 1e9))
+        except Exception as e:
+            timing.success = False
+            state = "recording" if action == "start" else "stopped"
+            self.log(f"{backend.name} acknowledged the {action} but was not seen {state} "
+                     f"within {self.confirm_timeout:g} s ({e}).", "error")
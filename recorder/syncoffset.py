@@ -0,0 +1,309 @@
+"""Estimate the audio-to-mocap sync offset of a take from a clap or other transient.
+
+The audio is reduced to an onset envelope (rectified rise of the log peak
+level) and the mocap to hand/wrist deceleration, both at ``rate`` Hz. The
+offset is the lag with the highest cross-correlation within
+``max_offset`` seconds, computed with FFTs over fixed-size chunks, so an
+hour-long take needs a few seconds and bounded memory.
+"""
+
+import glob
+import json
+import os
+import struct
+import time
+
+from .lazy import NUMPY_AVAILABLE, np
+
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Substrings that mark hand/wrist joints in a mocap CSV header
+HAND_JOINTS = ("hand", "wrist")
+TIME_COLUMNS = ("time", "timestamp", "seconds", "time_s")
+
+
+def read_wav(path):
+    """Memory-map a PCM or float WAV/RF64 file.
+
+    Returns ``(data, sample_rate)`` where ``data`` is a read-only array of
+    shape (frames, channels); 24-bit files map to (frames, channels, 3)
+    bytes and are converted chunk by chunk by ``audio_onset_envelope``.
+    """
+    with open(path, 'rb') as f:
+        riff, size, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff not in (b"RIFF", b"RF64") or wave != b"WAVE":
+            raise ValueError(f"{path} is not a WAV file")
+
+        fmt = None
+        data_size = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            start = f.tell()
+            if chunk_id == b"ds64":
+                # RF64: the real data size replaces the 0xFFFFFFFF placeholder
+                _, data_size64 = struct.unpack("<QQ", f.read(16))
+            elif chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                if fmt[0] == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                    f.seek(start + 24)
+                    fmt = (struct.unpack("<H", f.read(2))[0],) + fmt[1:]
+            elif chunk_id == b"data":
+                data_offset = start
+                data_size = data_size64 if riff == b"RF64" and chunk_size == 0xFFFFFFFF else chunk_size
+                break
+            f.seek(start + chunk_size + (chunk_size & 1))
+
+    if fmt is None or data_size is None:
+        raise ValueError(f"{path} has no fmt or data chunk")
+
+    format_tag, channels, sample_rate, _, block_align, bits = fmt
+    dtypes = {
+        (WAVE_FORMAT_PCM, 8): np.uint8,
+        (WAVE_FORMAT_PCM, 16): np.int16,
+        (WAVE_FORMAT_PCM, 32): np.int32,
+        (WAVE_FORMAT_IEEE_FLOAT, 32): np.float32,
+        (WAVE_FORMAT_IEEE_FLOAT, 64): np.float64,
+    }
+    frames = data_size // block_align
+    if format_tag == WAVE_FORMAT_PCM and bits == 24:
+        data = np.memmap(path, np.uint8, 'r', data_offset, (frames, channels, 3))
+    elif (format_tag, bits) in dtypes:
+        data = np.memmap(path, dtypes[(format_tag, bits)], 'r', data_offset, (frames, channels))
+    else:
+        raise ValueError(f"Unsupported WAV format {format_tag} with {bits} bits")
+    return data, sample_rate
+
+
+def _to_float(block):
+    """Convert a block of WAV frames to float32 mono in the range [-1, 1]."""
+    if block.ndim == 3:
+        # 24-bit little-endian: assemble and sign-extend
+        ints = (block[..., 0].astype(np.int32) | (block[..., 1].astype(np.int32) << 8)
+                | (block[..., 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif block.dtype == np.uint8:
+        samples = (block.astype(np.float32) - 128.0) / 128.0
+    elif block.dtype.kind == "i":
+        samples = block.astype(np.float32) / float(np.iinfo(block.dtype).max)
+    else:
+        samples = block.astype(np.float32)
+    return samples.mean(axis=1)
+
+
+def audio_onset_envelope(data, sample_rate, rate=1000, chunk_seconds=60):
+    """Return the transient envelope of WAV frames at about ``rate`` Hz and the exact rate."""
+    hop = max(1, int(round(sample_rate / float(rate))))
+    blocks_per_chunk = max(1, int(chunk_seconds * sample_rate) // hop)
+    total_blocks = len(data) // hop
+
+    # Peak level per hop, one chunk of the memory map at a time
+    peaks = np.empty(total_blocks, dtype=np.float32)
+    for first in range(0, total_blocks, blocks_per_chunk):
+        count = min(blocks_per_chunk, total_blocks - first)
+        block = _to_float(data[first * hop:(first + count) * hop])
+        peaks[first:first + count] = np.abs(block).reshape(count, hop).max(axis=1)
+
+    # Rises of the log level mark transients such as a clap
+    level = np.log(peaks + 1e-4)
+    onset = np.maximum(np.diff(level, prepend=level[:1]), 0.0)
+    return onset, sample_rate / float(hop)
+
+
+def load_mocap_csv(path, columns=None, frame_rate=None):
+    """Load hand/wrist positions from a mocap CSV export.
+
+    ``columns`` lists position column names (x, y, z per joint); by default
+    every column whose name mentions a hand or wrist and ends in x/y/z is
+    used. The frame rate comes from a time column when there is one,
+    otherwise ``frame_rate`` must be given. Returns
+    ``(positions, frame_rate)`` with positions shaped (frames, joints, 3).
+    """
+    with open(path, 'r') as f:
+        header = [name.strip().strip('"') for name in f.readline().split(",")]
+    lower = [name.lower() for name in header]
+
+    if columns is None:
+        columns = [name for name, low in zip(header, lower)
+                   if any(joint in low for joint in HAND_JOINTS) and low[-1:] in ("x", "y", "z")]
+    if not columns or len(columns) % 3:
+        raise ValueError(f"No hand/wrist x/y/z position columns found in {path}")
+    indices = [header.index(name) for name in columns]
+
+    time_index = next((i for i, low in enumerate(lower) if low in TIME_COLUMNS), None)
+    usecols = indices + ([time_index] if time_index is not None else [])
+    table = np.loadtxt(path, delimiter=",", skiprows=1, usecols=usecols, ndmin=2)
+
+    if time_index is not None and len(table) > 1:
+        # Over the whole clip, so rounded timestamps do not add up to drift
+        frame_rate = (len(table) - 1) / float(table[-1, -1] - table[0, -1])
+    if not frame_rate:
+        raise ValueError(f"{path} has no time column; pass the frame rate")
+
+    positions = table[:, :len(indices)].reshape(len(table), -1, 3)
+    return positions, float(frame_rate)
+
+
+def mocap_onset_envelope(positions, frame_rate, rate):
+    """Return hand/wrist deceleration resampled to ``rate`` Hz.
+
+    A clap is the instant the hands stop, so the audio transient lines up
+    with the drop in hand speed rather than with the speed itself.
+    """
+    # speed[i] spans frames i..i + 1, so a drop from speed[i - 1] to speed[i] falls on frame i
+    speed = np.linalg.norm(np.diff(positions, axis=0), axis=2).sum(axis=1) * frame_rate
+    deceleration = np.maximum(-np.diff(speed, prepend=speed[:1]), 0.0)
+    source_times = np.arange(len(deceleration)) / frame_rate
+    target_times = np.arange(int(source_times[-1] * rate)) / rate
+    return np.interp(target_times, source_times, deceleration)
+
+
+def cross_correlate(a, b, max_lag, chunk=1 << 18):
+    """Cross-correlation ``sum(a[n] * b[n + k])`` for lags ``-max_lag..max_lag``.
+
+    ``a`` is processed in chunks of ``chunk`` samples, each correlated by FFT
+    against the matching stretch of ``b`` widened by ``max_lag`` on both
+    sides, so cost and memory stay proportional to the chunk size.
+    """
+    result = np.zeros(2 * max_lag + 1)
+    for start in range(0, len(a), chunk):
+        segment_a = a[start:start + chunk]
+        first = start - max_lag
+        segment_b = np.zeros(len(segment_a) + 2 * max_lag)
+        src_first = max(first, 0)
+        src_last = min(start + len(segment_a) + max_lag, len(b))
+        if src_last <= src_first:
+            continue
+        segment_b[src_first - first:src_last - first] = b[src_first:src_last]
+
+        size = 1 << int(len(segment_b) - 1).bit_length()
+        spectrum = np.conj(np.fft.rfft(segment_a, size)) * np.fft.rfft(segment_b, size)
+        result += np.fft.irfft(spectrum, size)[:2 * max_lag + 1]
+    return result
+
+
+def estimate_offset(audio_onset, mocap_onset, rate, max_offset=10.0):
+    """Return the sync offset between two onset envelopes sampled at ``rate``.
+
+    ``offset_s`` is how much later an event appears in the audio than in
+    the mocap (audio time minus mocap time); ``confidence`` is the ratio of
+    the correlation peak to the next highest peak at least 100 ms away.
+    """
+    max_lag = int(max_offset * rate)
+    a = (audio_onset - audio_onset.mean()) / (audio_onset.std() or 1.0)
+    b = (mocap_onset - mocap_onset.mean()) / (mocap_onset.std() or 1.0)
+    corr = cross_correlate(a, b, max_lag)
+
+    peak = int(np.argmax(corr))
+    shift = 0.0
+    if 0 < peak < len(corr) - 1:
+        # Parabolic interpolation between samples
+        left, centre, right = corr[peak - 1:peak + 2]
+        denominator = left - 2 * centre + right
+        if denominator:
+            shift = 0.5 * (left - right) / denominator
+    lag = peak - max_lag + shift
+
+    guard = max(1, int(0.1 * rate))
+    others = np.concatenate([corr[:max(0, peak - guard)], corr[peak + guard + 1:]])
+    runner_up = others.max() if len(others) else 0.0
+    confidence = float(corr[peak] / runner_up) if runner_up > 0 else float("inf")
+
+    return {
+        "offset_s": -lag / rate,
+        "confidence": confidence,
+        "rate_hz": rate,
+        "max_offset_s": max_offset,
+    }
+
+
+def estimate_file_offset(audio_path, mocap_path, frame_rate=None, rate=1000, max_offset=10.0,
+                         columns=None):
+    """Estimate the sync offset between a WAV file and a mocap CSV file."""
+    data, sample_rate = read_wav(audio_path)
+    audio_onset, exact_rate = audio_onset_envelope(data, sample_rate, rate)
+    positions, mocap_rate = load_mocap_csv(mocap_path, columns, frame_rate)
+    mocap_onset = mocap_onset_envelope(positions, mocap_rate, exact_rate)
+
+    result = estimate_offset(audio_onset, mocap_onset, exact_rate, max_offset)
+    result.update({
+        "audio_file": os.path.abspath(audio_path),
+        "mocap_file": os.path.abspath(mocap_path),
+        "audio_duration_s": len(data) / float(sample_rate),
+        "mocap_frame_rate": mocap_rate,
+    })
+    return result
+
+
+def write_sidecar(result, path):
+    """Write an offset estimate as JSON next to the take's files."""
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=4)
+    return path
+
+
+class SyncOffsetStage:
+    """Post-take step: find the Rokoko CSV of a take and write its sync offset.
+
+    Runs as the last step of the take's ExportJob, on the audio that the
+    job's audio step exported from Audacity or captured in-process. The
+    newest CSV in ``rokoko_export_directory`` that is at least as new as the
+    take and mentions the clip name is taken as the mocap, waiting up to
+    ``sync_mocap_wait`` seconds for it to be exported from Rokoko Studio.
+    The result goes to ``<take>.sync.json`` next to the audio.
+    """
+
+    def __init__(self, config_manager, log, export_timeout=300.0):
+        self.config_manager = config_manager
+        self.log = log
+        self.export_timeout = export_timeout
+
+    def run(self, clip_name, started_at, audio_path):
+        """Correlate the take's WAV with its mocap and write the sidecar; returns its path or None."""
+        if not NUMPY_AVAILABLE:
+            self.log("Sync offset skipped: numpy is not installed (pip install numpy).", "warning")
+            return None
+
+        deadline = time.monotonic() + self.config_manager.get("sync_mocap_wait")
+        mocap_path = self.find_mocap_export(clip_name, started_at)
+        while mocap_path is None and time.monotonic() < deadline:
+            time.sleep(1.0)
+            mocap_path = self.find_mocap_export(clip_name, started_at)
+        if mocap_path is None:
+            self.log("Sync offset skipped: no Rokoko CSV export found for this take.", "warning")
+            return None
+
+        began = time.perf_counter()
+        try:
+            result = estimate_file_offset(
+                audio_path, mocap_path,
+                frame_rate=self.config_manager.get("rokoko_frame_rate"),
+                max_offset=self.config_manager.get("sync_max_offset"),
+            )
+        except (OSError, ValueError) as e:
+            self.log(f"Sync offset failed: {e}", "error")
+            return None
+
+        path = write_sidecar(result, os.path.splitext(audio_path)[0] + ".sync.json")
+        self.log(f"Sync offset {result['offset_s'] * 1000:+.1f} ms "
+                 f"(confidence {result['confidence']:.1f}, {time.perf_counter() - began:.1f} s) "
+                 f"written to {path}")
+        return path
+
+    def find_mocap_export(self, clip_name, started_at):
+        """Return the newest Rokoko CSV export for the take, or None."""
+        directory = self.config_manager.get("rokoko_export_directory")
+        if not directory:
+            return None
+        candidates = [
+            path for path in glob.glob(os.path.join(directory, "*.csv"))
+            if clip_name.lower() in os.path.basename(path).lower()
+            and os.path.getmtime(path) >= started_at
+        ]
+        return max(candidates, key=os.path.getmtime) if candidates else None
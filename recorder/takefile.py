@@ -0,0 +1,332 @@
+"""Chunked, time-indexed container for the data captured during a take.
+
+A take file holds several streams (e.g. ``mocap``, ``audio`` and
+``markers``), each written as a sequence of chunks in time order::
+
+    MAGIC, uint32 length, JSON metadata
+    record*                     STRM (stream declaration) or CHNK (data)
+    INDX record, uint64 index offset, INDEX_MAGIC      (written on close)
+
+Every record has a fixed header with its stream, frame count, first and
+last timestamp (perf_counter_ns) and a CRC-32 of its payload. The footer
+index lists every chunk's stream, time range and offset, so
+``TakeFileReader`` can memory-map the file and find the chunks of any time
+window by binary search without reading the rest. A file without a valid
+footer (still being written, or left behind by a crash) is indexed by
+scanning its records up to the first incomplete one; ``TakeFileWriter``
+reopens such a file, cuts it there and keeps appending.
+
+Fields of a chunk are stored one after another. A field of width ``w``
+is either ``"columns"`` (``w`` runs of ``frames`` values, one per column)
+or ``"rows"`` (``frames`` rows of ``w`` values, e.g. interleaved audio).
+Needs numpy.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from .lazy import NUMPY_AVAILABLE, np  # noqa: F401
+
+
+MAGIC = b"RKTAKE01"
+INDEX_MAGIC = b"RKTKIDX1"
+RECORD = struct.Struct("<4sHHIqqQI")
+TRAILER = struct.Struct("<Q8s")
+INDEX_DTYPE = [("stream", "<u4"), ("frames", "<u4"), ("t_first", "<i8"), ("t_last", "<i8"), ("offset", "<u8")]
+
+
+def _scan(buffer, position):
+    """Yield ``(offset, tag, stream, frames, t_first, t_last, payload_start, length)`` of every intact record."""
+    size = len(buffer)
+    while position + RECORD.size <= size:
+        tag, stream, _, frames, t_first, t_last, length, crc = RECORD.unpack_from(buffer, position)
+        start = position + RECORD.size
+        if tag not in (b"STRM", b"CHNK") or start + length > size:
+            return
+        if zlib.crc32(buffer[start:start + length]) != crc:
+            return
+        yield position, tag, stream, frames, t_first, t_last, start, length
+        position = start + length
+
+
+def _read_header(buffer, path):
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a take file")
+    (length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    return json.loads(bytes(buffer[start:start + length])), start + length
+
+
+class TakeFileWriter:
+    """Appends chunks to a take file; safe to share between writer threads.
+
+    Opening an existing file continues it: a closed file loses its footer
+    until the next ``close``, a crashed one is cut after its last intact
+    record. Every record is flushed to the OS as soon as it is written, so
+    a dying process loses at most the record it was writing.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.streams = {}
+        self._index = []
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, 'r+b')
+            self.metadata = self._recover()
+        else:
+            self._file = open(path, 'w+b')
+            self.metadata = dict(metadata or {})
+            header = json.dumps(self.metadata).encode("utf-8")
+            self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+            self._file.flush()
+
+    def add_stream(self, name, fields, **attributes):
+        """Declare a stream; ``fields`` are ``(name, dtype, width, order)`` tuples.
+
+        Returns the existing declaration when the stream is already in the file.
+        """
+        with self._lock:
+            if name in self.streams:
+                return self.streams[name]
+            declaration = dict(attributes, name=name, id=len(self.streams) + 1,
+                               fields=[list(field) for field in fields])
+            payload = json.dumps(declaration).encode("utf-8")
+            self._write_record(b"STRM", declaration["id"], 0, 0, 0, [payload])
+            self.streams[name] = declaration
+            return declaration
+
+    def append(self, name, frames, t_first, t_last, arrays):
+        """Write one chunk of ``frames`` frames; ``arrays`` match the stream's fields.
+
+        Arrays are written from their own buffers without copying.
+        """
+        with self._lock:
+            stream = self.streams[name]["id"]
+            buffers = [memoryview(np.ascontiguousarray(array)).cast('B') for array in arrays]
+            offset = self._write_record(b"CHNK", stream, frames, t_first, t_last, buffers)
+            self._index.append((stream, frames, t_first, t_last, offset))
+
+    def append_events(self, name, events):
+        """Write events (dicts with a ``t_ns`` key) as one JSON chunk of an ``events`` stream."""
+        if not events:
+            return
+        if name not in self.streams:
+            self.add_stream(name, [], kind="events")
+        payload = json.dumps(events).encode("utf-8")
+        times = [event["t_ns"] for event in events]
+        with self._lock:
+            stream = self.streams[name]["id"]
+            offset = self._write_record(b"CHNK", stream, len(events), min(times), max(times), [payload])
+            self._index.append((stream, len(events), min(times), max(times), offset))
+
+    def close(self):
+        """Write the footer index and close the file."""
+        with self._lock:
+            if self._file is None:
+                return
+            position = self._file.tell()
+            streams = json.dumps(list(self.streams.values())).encode("utf-8")
+            index = np.array(self._index, dtype=INDEX_DTYPE)
+            payload = struct.pack("<I", len(streams)) + streams + index.tobytes()
+            self._file.write(RECORD.pack(b"INDX", 0, 0, len(self._index), 0, 0, len(payload),
+                                         zlib.crc32(payload)))
+            self._file.write(payload)
+            self._file.write(TRAILER.pack(position, INDEX_MAGIC))
+            self._file.close()
+            self._file = None
+
+    def _write_record(self, tag, stream, frames, t_first, t_last, buffers):
+        crc = 0
+        length = 0
+        for buffer in buffers:
+            crc = zlib.crc32(buffer, crc)
+            length += len(buffer)
+        offset = self._file.tell()
+        self._file.write(RECORD.pack(tag, stream, 0, frames, t_first, t_last, length, crc))
+        for buffer in buffers:
+            self._file.write(buffer)
+        self._file.flush()
+        return offset
+
+    def _recover(self):
+        """Index the records of an existing file and cut it after the last intact one."""
+        with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            metadata, position = _read_header(buffer, self.path)
+            end = position
+            for offset, tag, stream, frames, t_first, t_last, start, length in _scan(buffer, position):
+                if tag == b"STRM":
+                    declaration = json.loads(bytes(buffer[start:start + length]))
+                    self.streams[declaration["name"]] = declaration
+                else:
+                    self._index.append((stream, frames, t_first, t_last, offset))
+                end = start + length
+        self._file.truncate(end)
+        self._file.seek(end)
+        return metadata
+
+
+class TakeFileReader:
+    """Memory-maps a take file and returns time windows of its streams.
+
+    ``recovered`` is True when the file had no footer index and its
+    records were scanned instead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.metadata, position = _read_header(self._map, path)
+        self.recovered = False
+        self.streams = {}
+        if not self._read_footer():
+            self.recovered = True
+            entries = []
+            for offset, tag, stream, frames, t_first, t_last, start, length in _scan(self._map, position):
+                if tag == b"STRM":
+                    declaration = json.loads(bytes(self._map[start:start + length]))
+                    self.streams[declaration["name"]] = declaration
+                else:
+                    entries.append((stream, frames, t_first, t_last, offset))
+            self._set_index(np.array(entries, dtype=INDEX_DTYPE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._chunks = {}
+        self._map.close()
+        self._file.close()
+
+    def time_range(self, name):
+        """Return the first and last timestamp of a stream, or None if it has no chunks."""
+        chunks = self._chunks.get(self.streams[name]["id"])
+        if chunks is None or not len(chunks):
+            return None
+        return int(chunks["t_first"][0]), int(chunks["t_last"][-1])
+
+    def window(self, name, start_ns, end_ns):
+        """Return the frames of stream ``name`` timed in [start_ns, end_ns).
+
+        The result maps every field name (and ``"time_ns"``) to an array;
+        column fields have one row per column. Only the chunks that
+        overlap the window are touched, found by binary search.
+        """
+        stream = self.streams[name]
+        if stream.get("kind") == "events":
+            return self.events(name, start_ns, end_ns)
+        chunks = self._overlapping(stream, start_ns, end_ns)
+        parts = [self._decode(stream, chunk) for chunk in chunks]
+        result = {}
+        keys = ["time_ns"] + [field[0] for field in stream["fields"]]
+        for key in keys:
+            pieces = []
+            for fields in parts:
+                keep = (fields["time_ns"] >= start_ns) & (fields["time_ns"] < end_ns)
+                value = fields[key]
+                pieces.append(value[:, keep] if self._is_columns(stream, key) else value[keep])
+            result[key] = self._concatenate(stream, key, pieces)
+        return result
+
+    def events(self, name, start_ns=None, end_ns=None):
+        """Return the events of an events stream timed in [start_ns, end_ns)."""
+        stream = self.streams[name]
+        if start_ns is None:
+            chunks = self._chunks.get(stream["id"], np.zeros(0, dtype=INDEX_DTYPE))
+        else:
+            chunks = self._overlapping(stream, start_ns, end_ns)
+        events = []
+        for chunk in chunks:
+            start, length = self._payload(chunk)
+            for event in json.loads(bytes(self._map[start:start + length])):
+                if start_ns is None or start_ns <= event["t_ns"] < end_ns:
+                    events.append(event)
+        return events
+
+    def _read_footer(self):
+        size = len(self._map)
+        if size < TRAILER.size + RECORD.size:
+            return False
+        position, magic = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        if magic != INDEX_MAGIC or position + RECORD.size > size:
+            return False
+        tag, _, _, count, _, _, length, crc = RECORD.unpack_from(self._map, position)
+        start = position + RECORD.size
+        if tag != b"INDX" or zlib.crc32(self._map[start:start + length]) != crc:
+            return False
+        (streams_length,) = struct.unpack_from("<I", self._map, start)
+        for declaration in json.loads(bytes(self._map[start + 4:start + 4 + streams_length])):
+            self.streams[declaration["name"]] = declaration
+        entries = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=count, offset=start + 4 + streams_length)
+        self._set_index(entries.copy())
+        return True
+
+    def _set_index(self, entries):
+        self._chunks = {}
+        for declaration in self.streams.values():
+            self._chunks[declaration["id"]] = entries[entries["stream"] == declaration["id"]]
+
+    def _overlapping(self, stream, start_ns, end_ns):
+        chunks = self._chunks.get(stream["id"], np.zeros(0, dtype=INDEX_DTYPE))
+        # Chunks of a stream are in time order: first chunk ending at or after
+        # the start, up to the last one beginning before the end
+        first = np.searchsorted(chunks["t_last"], start_ns, side="left")
+        last = np.searchsorted(chunks["t_first"], end_ns, side="left")
+        return chunks[first:last]
+
+    def _payload(self, chunk):
+        length = RECORD.unpack_from(self._map, int(chunk["offset"]))[6]
+        return int(chunk["offset"]) + RECORD.size, length
+
+    def _decode(self, stream, chunk):
+        """Map the fields of one chunk as arrays over the file without copying."""
+        frames = int(chunk["frames"])
+        offset, _ = self._payload(chunk)
+        fields = {}
+        for name, dtype, width, order in stream["fields"]:
+            dtype = np.dtype(dtype)
+            count = frames * width
+            array = np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            if order == "columns" and width > 1:
+                array = array.reshape(width, frames)
+            elif width > 1:
+                array = array.reshape(frames, width)
+            fields[name] = array
+            offset += count * dtype.itemsize
+        time_field = stream.get("time_field")
+        if time_field:
+            fields["time_ns"] = fields[time_field]
+        else:
+            # Evenly sampled stream (e.g. audio): derive each frame's time from the chunk's range
+            rate = stream["sample_rate"]
+            fields["time_ns"] = int(chunk["t_first"]) + np.round(np.arange(frames) * 1e9 / rate).astype(np.int64)
+        return fields
+
+    @staticmethod
+    def _is_columns(stream, key):
+        for name, _, width, order in stream["fields"]:
+            if name == key:
+                return order == "columns" and width > 1
+        return False
+
+    def _concatenate(self, stream, key, pieces):
+        if not pieces:
+            for name, dtype, width, order in stream["fields"]:
+                if name == key:
+                    if width == 1:
+                        return np.zeros(0, dtype)
+                    return np.zeros((width, 0) if order == "columns" else (0, width), dtype)
+            return np.zeros(0, np.int64)
+        return np.concatenate(pieces, axis=1 if self._is_columns(stream, key) else 0)
@@ -0,0 +1,191 @@
+"""Per-take timing traces written as JSON lines off the recording path."""
+
+import collections
+import json
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class NullTracer:
+    """Tracer that records nothing; used when tracing is not wanted."""
+
+    take_id = None
+
+    def begin_take(self):
+        return None
+
+    def mark(self, event, **fields):
+        pass
+
+    def mark_press(self, action, at_ns=None):
+        pass
+
+    def record_phase(self, result):
+        pass
+
+    def close(self):
+        return None
+
+
+class TakeTracer:
+    """Collects high-resolution timing events for every take.
+
+    ``mark`` only reads the clocks and puts a tuple on a queue; a writer
+    thread serialises the events to one ``take-NNNN.jsonl`` file per take
+    inside a per-session directory. Each event carries ``perf_counter_ns``
+    and wall-clock ``time_ns`` stamps. ``close`` writes ``summary.json`` with
+    start latency and skew percentiles per backend.
+    """
+
+    def __init__(self, directory="traces"):
+        session = datetime.now().strftime("session-%Y%m%d-%H%M%S")
+        self.session_dir = os.path.join(directory, session)
+        self.take_id = None
+        self._takes = 0
+        self._press_ns = {}
+        self._latency_ms = collections.defaultdict(lambda: collections.defaultdict(list))
+        self._skew_ms = collections.defaultdict(lambda: collections.defaultdict(list))
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def begin_take(self):
+        """Start a new take; following events are written to its trace file."""
+        self._takes += 1
+        self.take_id = self._takes
+        return self.take_id
+
+    def mark(self, event, **fields):
+        """Record an event for the current take."""
+        self._queue.put((self.take_id, time.perf_counter_ns(), time.time_ns(), event, fields))
+
+    def mark_press(self, action, at_ns=None):
+        """Record a button press, at the perf_counter_ns ``at_ns`` or now; phase latencies are measured from it."""
+        now = time.perf_counter_ns()
+        wall_ns = time.time_ns()
+        if at_ns is not None:
+            wall_ns -= now - at_ns
+            now = at_ns
+        self._press_ns[(self.take_id, action)] = now
+        self._queue.put((self.take_id, now, wall_ns, "button_press", {"action": action}))
+
+    def record_phase(self, result):
+        """Record the per-backend timings of a coordinated start or stop."""
+        take_id = self.take_id
+        press_ns = self._press_ns.pop((take_id, result.action), None)
+        acks = [t.ack_ns for t in result.timings if t.ack_ns is not None]
+        first_ack = min(acks) if acks else None
+
+        for t in result.timings:
+            fields = {
+                "action": result.action,
+                "backend": t.name,
+                "success": t.success,
+                "dispatch_ns": t.dispatch_ns,
+                "ack_ns": t.ack_ns,
+                "confirmed_ns": t.confirmed_ns,
+            }
+            if t.ack_ns is not None:
+                origin = press_ns if press_ns is not None else t.dispatch_ns
+                latency = (t.ack_ns - origin) / 1e6
+                skew = (t.ack_ns - first_ack) / 1e6
+                fields["latency_ms"] = latency
+                fields["skew_ms"] = skew
+                if t.success:
+                    self._latency_ms[result.action][t.name].append(latency)
+                    self._skew_ms[result.action][t.name].append(skew)
+            self._queue.put((take_id, time.perf_counter_ns(), time.time_ns(), "backend_timing", fields))
+
+        self._queue.put((take_id, time.perf_counter_ns(), time.time_ns(), "phase_complete", {
+            "action": result.action,
+            "success": result.success,
+            "released_ns": result.released_ns,
+            "dispatch_skew_ms": result.dispatch_skew_ms,
+            "ack_skew_ms": result.ack_skew_ms,
+            "confirmed_skew_ms": result.confirmed_skew_ms,
+            "rolled_back": result.rolled_back,
+        }))
+
+    def summary(self):
+        """Return p50/p95/p99 start/stop latency and skew per backend."""
+        summary = {"takes": self._takes}
+        for action in ("start", "stop"):
+            backends = {}
+            for name, values in self._latency_ms[action].items():
+                skews = self._skew_ms[action][name]
+                backends[name] = {
+                    "count": len(values),
+                    "latency_ms": {f"p{p}": percentile(values, p) for p in (50, 95, 99)},
+                    "skew_ms": {f"p{p}": percentile(skews, p) for p in (50, 95, 99)},
+                }
+            summary[action] = backends
+        return summary
+
+    def close(self):
+        """Write the session summary and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+        if self._takes == 0:
+            return None
+        path = os.path.join(self.session_dir, "summary.json")
+        try:
+            with open(path, 'w') as f:
+                json.dump(self.summary(), f, indent=4)
+        except OSError:
+            return None
+        return path
+
+    def _write_loop(self):
+        """Thread function: write queued events in batches, one file per take."""
+        current_take = None
+        handle = None
+        done = False
+
+        while not done:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item is None:
+                    done = True
+                    break
+                take_id, perf_ns, wall_ns, event, fields = item
+                if take_id is None:
+                    continue
+                try:
+                    if take_id != current_take:
+                        if handle is not None:
+                            handle.close()
+                        os.makedirs(self.session_dir, exist_ok=True)
+                        path = os.path.join(self.session_dir, f"take-{take_id:04d}.jsonl")
+                        handle = open(path, 'a')
+                        current_take = take_id
+                    record = {"take": take_id, "event": event, "perf_ns": perf_ns, "wall_ns": wall_ns}
+                    record.update(fields)
+                    handle.write(json.dumps(record) + "\n")
+                except OSError:
+                    handle = None
+                    current_take = None
+
+            if handle is not None:
+                handle.flush()
+
+        if handle is not None:
+            handle.close()
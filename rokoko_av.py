@@ -1,83 +1,25 @@
-import requests
-import time
-import sys
-import json
+import collections
 import os
 import threading
+import time
 from datetime import datetime
 from tkinter import (
-    Tk, ttk, Button, Text, Scrollbar, Frame, Label,
-    messagebox, Toplevel, Entry, StringVar, IntVar
+    Tk, Button, Text, Scrollbar, Frame, Label,
+    messagebox, filedialog, Toplevel, Entry, StringVar, IntVar
 )
 
-# Try to import pyaudacity-x (better Windows support) or fallback to pyaudacity
-try:
-    import pyaudacity_x as pa
-    PA_AVAILABLE = True
-    PA_TYPE = "pyaudacity-x"
-except ImportError:
-    try:
-        import pyaudacity as pa
-        PA_AVAILABLE = True
-        PA_TYPE = "pyaudacity"
-    except ImportError:
-        PA_AVAILABLE = False
-        PA_TYPE = None
+from recorder import (
+    ConfigManager, Recorder, RecorderEngine, SessionProfiler, StallWatchdog, TakeTracer, log_sink_from_config
+)
+from recorder.engine import ARMED, IDLE, RECORDING, STARTING, STOPPING
 
+# Log window: drain interval, lines kept, and messages buffered between ticks
+LOG_TICK_MS = 100
+LOG_MAX_LINES = 2000
+LOG_QUEUE_LIMIT = 5000
 
-class ConfigManager:
-    """Manages configuration loading and saving from JSON file."""
-    
-    DEFAULT_CONFIG = {
-        "rokoko_ip": "192.168.0.163",
-        "rokoko_port": 14053,
-        "rokoko_api_key": "1234",
-        "rokoko_clip_name": "Clip",
-        "rokoko_frame_rate": 60
-    }
-    
-    def __init__(self, config_file="config.json"):
-        self.config_file = config_file
-        self.config = self.load_config()
-    
-    def load_config(self):
-        """Load configuration from JSON file, create with defaults if not exists."""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                # Merge with defaults to ensure all keys exist
-                merged = self.DEFAULT_CONFIG.copy()
-                merged.update(config)
-                return merged
-            except Exception as e:
-                print(f"Error loading config: {e}")
-                return self.DEFAULT_CONFIG.copy()
-        else:
-            # Create default config file
-            self.save_config(self.DEFAULT_CONFIG.copy())
-            return self.DEFAULT_CONFIG.copy()
-    
-    def save_config(self, config=None):
-        """Save configuration to JSON file."""
-        if config is None:
-            config = self.config
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=4)
-            self.config = config
-            return True
-        except Exception as e:
-            print(f"Error saving config: {e}")
-            return False
-    
-    def get(self, key, default=None):
-        """Get a configuration value."""
-        return self.config.get(key, default)
-    
-    def set(self, key, value):
-        """Set a configuration value."""
-        self.config[key] = value
+# How often the backend health row is refreshed from the monitor's cache
+HEALTH_TICK_MS = 500
 
 
 class SettingsDialog:
@@ -163,13 +105,15 @@ class SettingsDialog:
     def save(self):
         """Save settings and close dialog."""
         try:
-            config = {
+            # Keep settings that are not shown in this dialog
+            config = dict(self.config_manager.config)
+            config.update({
                 "rokoko_ip": self.vars["rokoko_ip"].get().strip(),
                 "rokoko_port": self.vars["rokoko_port"].get(),
                 "rokoko_api_key": self.vars["rokoko_api_key"].get().strip(),
                 "rokoko_clip_name": self.vars["rokoko_clip_name"].get().strip(),
                 "rokoko_frame_rate": self.vars["rokoko_frame_rate"].get()
-            }
+            })
             
             # Validate
             if not config["rokoko_ip"]:
@@ -221,18 +165,76 @@ class RokokoAVRecorderApp:
         # Settings dialog
         self.settings_dialog = SettingsDialog(self.root, self.config_manager)
         
-        # Recording state
-        self.is_recording = False
-        self.recording_thread = None
+        # Log messages from any thread, drained by the Tk loop
+        self.log_queue = collections.deque(maxlen=LOG_QUEUE_LIMIT)
+        self.log_sink = log_sink_from_config(self.config_manager)
+        
+        # State last published by the recorder engine
+        self.state = IDLE
+        
+        # Per-take timing traces
+        self.tracer = TakeTracer(self.config_manager.get("trace_directory"))
+        
+        # Opt-in profile of the whole session, written on exit
+        self.profiler = None
+        if self.config_manager.get("profile_session"):
+            self.profiler = SessionProfiler(self.config_manager.get("profile_directory"), log=self.log)
+            self.profiler.start()
+        
+        # Rokoko and Audacity backends and the engine that drives them, created once the window is up
+        self.recorder = None
+        self.engine = None
         
         # UI Components
         self.setup_ui()
+        self.root.after(LOG_TICK_MS, self._drain_log)
+        
+        # Warn when the Tk loop is held up, with what every thread was doing
+        self.watchdog = None
+        threshold = self.config_manager.get("stall_threshold_ms")
+        if threshold:
+            self.watchdog = StallWatchdog(threshold / 1000, log=self.log, tracer=self.tracer)
+            self.watchdog.start(self.root.after)
+        
+        # Loading requests and opening connections would delay the first paint
+        self.record_button.config(state="disabled")
+        self.arm_button.config(state="disabled")
+        self.status_label.config(text="Connecting...", fg="orange")
+        threading.Thread(target=self._open_recorder_thread, daemon=True).start()
+    
+    def _open_recorder_thread(self):
+        """Thread function to create the recorder and open its connections."""
+        recorder = Recorder(self.config_manager, log=self.log, tracer=self.tracer)
+        recorder.open()
+        engine = RecorderEngine(recorder, self.tracer, debounce=self.config_manager.get("toggle_debounce"))
+        # State changes arrive on the engine's thread; show them from the Tk loop
+        engine.add_listener(lambda status: self.root.after(0, self._show_state, status))
+        recorder.exports.add_listener(lambda job: self.root.after(0, self._show_exports))
+        engine.open()
+        self.root.after(0, self._recorder_ready, recorder, engine)
+    
+    def _recorder_ready(self, recorder, engine):
+        """Enable recording once the backends are open."""
+        self.recorder = recorder
+        self.engine = engine
+        self.record_button.config(state="normal")
+        self.arm_button.config(state="normal")
+        self.status_label.config(text="Ready", fg="green")
+        for backend in recorder.coordinator.backends:
+            label = Label(self.health_frame, text=f"{backend.name}: checking...", fg="gray")
+            label.pack(side="left", padx=(0, 15))
+            self.health_labels[backend.name] = label
+        self._refresh_health()
         
         # Initialize logging
         self.log("Application started. Ready to record.")
-        self.log(f"Using {PA_TYPE or 'no pyaudacity'} for Audacity control.")
+        transport = self.recorder.audacity_backend.transport
+        if self.recorder.audio_backend is not self.recorder.audacity_backend:
+            self.log(f"Recording audio in-process from {self.recorder.audio_backend.source_name}.")
+        else:
+            self.log(f"Using {transport.name or 'no pyaudacity'} for Audacity control.")
         
-        if not PA_AVAILABLE:
+        if self.recorder.audio_backend is self.recorder.audacity_backend and not transport.available:
             self.log("WARNING: pyaudacity not found. Install with: pip install pyaudacity-x", "error")
     
     def setup_ui(self):
@@ -268,6 +270,42 @@ class RokokoAVRecorderApp:
         )
         self.record_button.pack(fill="x", pady=10)
         
+        # Armed start at a precise instant
+        arm_frame = Frame(main_frame)
+        arm_frame.pack(fill="x")
+        
+        Label(arm_frame, text="Start at:").pack(side="left")
+        self.arm_time = StringVar()
+        Entry(arm_frame, textvariable=self.arm_time, width=14).pack(side="left", padx=5)
+        Label(arm_frame, text="(blank = next second, HH:MM:SS[.fff] or HH:MM:SS:FF)", fg="gray").pack(side="left")
+        self.arm_button = Button(arm_frame, text="ARM", command=self.arm_recording, width=10)
+        self.arm_button.pack(side="right")
+        
+        # Timeline marker during a take, also on a hotkey
+        hotkey = self.config_manager.get("marker_hotkey")
+        self.mark_button = Button(
+            arm_frame, text=f"MARK ({hotkey.strip('<>')})" if hotkey else "MARK",
+            command=self.add_marker, width=12, state="disabled"
+        )
+        self.mark_button.pack(side="right", padx=(0, 5))
+        if hotkey:
+            self.root.bind_all(hotkey, lambda event: self.add_marker())
+        
+        # Shot list: clip names advance on every stop
+        shot_frame = Frame(main_frame)
+        shot_frame.pack(fill="x", pady=(5, 0))
+        
+        Label(shot_frame, text="Shot list:").pack(side="left")
+        self.shot_label = Label(shot_frame, text="(none)", fg="gray")
+        self.shot_label.pack(side="left", padx=5)
+        self.shot_buttons = [
+            Button(shot_frame, text="Clear", command=self.clear_shot_list, width=6),
+            Button(shot_frame, text="Skip", command=self.skip_take, width=6),
+            Button(shot_frame, text="Load...", command=self.load_shot_list, width=8),
+        ]
+        for button in self.shot_buttons:
+            button.pack(side="right", padx=(5, 0))
+        
         # Log area
         log_frame = Frame(main_frame)
         log_frame.pack(fill="both", expand=True, pady=(10, 0))
@@ -292,9 +330,23 @@ class RokokoAVRecorderApp:
         self.log_text.pack(side="left", fill="both", expand=True)
         
         scrollbar.config(command=self.log_text.yview)
+        
+        # Backend health, refreshed from the health monitor's cache; one
+        # label per backend, added once the recorder knows which it uses
+        self.health_frame = Frame(main_frame)
+        self.health_frame.pack(fill="x", pady=(5, 0))
+        self.health_labels = {}
+        
+        # Post-take exports of the latest takes
+        self.export_label = Label(self.health_frame, text="", fg="gray")
+        self.export_label.pack(side="right")
+        
+        # Configure tag colors
+        self.log_text.tag_config("error", foreground="red")
+        self.log_text.tag_config("warning", foreground="orange")
     
     def log(self, message, level="info"):
-        """Add a message to the log window."""
+        """Queue a message for the log window and log file; safe to call from any thread."""
         timestamp = datetime.now().strftime("%H:%M:%S")
         prefix = f"[{timestamp}] "
         
@@ -306,284 +358,188 @@ class RokokoAVRecorderApp:
         
         full_message = prefix + message + "\n"
         
-        # Update UI in thread-safe way
-        self.root.after(0, self._append_log, full_message, level)
+        # The Tk loop picks this up on its next log tick
+        self.log_queue.append((full_message, level))
         
-        # Also print to console
-        print(full_message.strip())
+        # Also write to the log file and console, off this thread
+        self.log_sink.write(message, level, self.tracer.take_id)
     
-    def _append_log(self, message, level):
-        """Thread-safe method to append to log text widget."""
-        self.log_text.config(state="normal")
-        
-        # Color coding
-        if level == "error":
-            tag = "error"
-        elif level == "warning":
-            tag = "warning"
-        else:
-            tag = "info"
-        
-        start = self.log_text.index("end-1c")
-        self.log_text.insert("end", message)
-        end = self.log_text.index("end-1c")
-        
-        self.log_text.tag_add(tag, start, end)
-        
-        # Configure tag colors
-        if tag == "error":
-            self.log_text.tag_config("error", foreground="red")
-        elif tag == "warning":
-            self.log_text.tag_config("warning", foreground="orange")
+    def _drain_log(self):
+        """Append queued log messages to the log window in one batch."""
+        if self.log_queue:
+            chunks = []
+            while self.log_queue:
+                message, level = self.log_queue.popleft()
+                chunks.extend((message, level if level in ("error", "warning") else "info"))
+            
+            self.log_text.config(state="normal")
+            self.log_text.insert("end", *chunks)
+            
+            # Keep only the most recent lines
+            lines = int(self.log_text.index("end-1c").split(".")[0])
+            if lines > LOG_MAX_LINES:
+                self.log_text.delete("1.0", f"{lines - LOG_MAX_LINES + 1}.0")
+            
+            self.log_text.config(state="disabled")
+            self.log_text.see("end")
         
-        self.log_text.config(state="disabled")
-        self.log_text.see("end")
+        self.root.after(LOG_TICK_MS, self._drain_log)
     
     def open_settings(self):
         """Open the settings dialog."""
         self.settings_dialog.show()
     
-    def toggle_recording(self):
-        """Start or stop recording based on current state."""
-        if self.is_recording:
-            self.stop_recording()
+    def _refresh_health(self):
+        """Show the cached health of every backend."""
+        for name, health in self.recorder.health.snapshot().items():
+            label = self.health_labels.get(name)
+            if label is None:
+                continue
+            if health.healthy is None:
+                color = "gray"
+            else:
+                color = "green" if health.healthy else "red"
+            label.config(text=health.describe(), fg=color)
+        
+        self.root.after(HEALTH_TICK_MS, self._refresh_health)
+    
+    def _show_exports(self):
+        """Show how far the exports of the latest takes have got."""
+        jobs = self.recorder.exports.recent()
+        if any(not job.finished for job in jobs):
+            color = "orange"
         else:
-            self.start_recording()
+            color = "red" if jobs and jobs[0].errors else "green"
+        self.export_label.config(text="Exports: " + " | ".join(job.describe() for job in jobs), fg=color)
     
-    def start_recording(self):
-        """Start recording on both Rokoko and Audacity."""
-        if self.is_recording:
+    def load_shot_list(self):
+        """Pick a shot list CSV and record its takes back to back."""
+        if self.engine is None or self.state != IDLE:
             return
-        
-        self.is_recording = True
-        self.record_button.config(
-            text="STOP",
-            bg="#f44336",
-            activebackground="#da190b"
+        path = filedialog.askopenfilename(
+            title="Load shot list",
+            filetypes=[("Shot lists", "*.csv *.txt"), ("All files", "*.*")]
         )
-        self.status_label.config(text="Recording...", fg="red")
-        
-        # Start recording in a separate thread
-        self.recording_thread = threading.Thread(target=self._start_recording_thread, daemon=True)
-        self.recording_thread.start()
+        if path:
+            self._submit("shotlist", path)
     
-    def stop_recording(self):
-        """Stop recording on both Rokoko and Audacity."""
-        if not self.is_recording:
-            return
-        
-        self.is_recording = False
-        self.record_button.config(
-            text="RECORD",
-            bg="#4CAF50",
-            activebackground="#45a049"
-        )
-        self.status_label.config(text="Stopping...", fg="orange")
-        
-        # Stop recording in a separate thread
-        threading.Thread(target=self._stop_recording_thread, daemon=True).start()
+    def skip_take(self):
+        """Skip the current take of the shot list."""
+        if self.engine is not None:
+            self._submit("skip")
     
-    def _start_recording_thread(self):
-        """Thread function to start recording."""
-        self.log("Starting recording...")
-        
-        # Start Rokoko
-        rokoko_success = self.start_rokoko_recording()
-        
-        # Start Audacity
-        audacity_success = self.start_audacity_recording()
-        
-        if rokoko_success and audacity_success:
-            self.log("Recording started successfully on both Rokoko and Audacity.")
-            self.root.after(0, lambda: self.status_label.config(text="Recording...", fg="red"))
-        else:
-            error_msg = "Failed to start recording: "
-            errors = []
-            if not rokoko_success:
-                errors.append("Rokoko")
-            if not audacity_success:
-                errors.append("Audacity")
-            error_msg += ", ".join(errors)
-            self.log(error_msg, "error")
-            self.root.after(0, self._reset_to_ready_state)
+    def clear_shot_list(self):
+        """Stop using the shot list."""
+        if self.engine is not None:
+            self._submit("shotlist", None)
     
-    def _stop_recording_thread(self):
-        """Thread function to stop recording."""
-        self.log("Stopping recording...")
-        
-        # Stop both (order doesn't matter much, but stop Audacity first to minimize audio loss)
-        audacity_success = self.stop_audacity_recording()
-        rokoko_success = self.stop_rokoko_recording()
-        
-        if rokoko_success and audacity_success:
-            self.log("Recording stopped successfully.")
-        else:
-            warnings = []
-            if not rokoko_success:
-                warnings.append("Rokoko")
-            if not audacity_success:
-                warnings.append("Audacity")
-            if warnings:
-                self.log(f"Warning: Issues stopping {', '.join(warnings)}", "warning")
-        
-        self.log("Recording complete.")
-        self.log("  - Rokoko: Check Rokoko Studio for mocap file")
-        self.log("  - Audacity: Audio recorded (save project manually if needed)")
-        
-        self.root.after(0, lambda: self.status_label.config(text="Ready", fg="green"))
+    def _submit(self, command, argument=None):
+        """Queue a shot list command and report its outcome from the Tk loop."""
+        future = self.engine.submit(command, argument)
+        future.add_done_callback(lambda f: self.root.after(0, self._shot_list_done, f.result()))
     
-    def _reset_to_ready_state(self):
-        """Reset UI to ready state after failed start."""
-        self.is_recording = False
-        self.record_button.config(
-            text="RECORD",
-            bg="#4CAF50",
-            activebackground="#45a049"
-        )
-        self.status_label.config(text="Ready", fg="green")
+    def _shot_list_done(self, status):
+        if status.get("error", "").startswith("could not load"):
+            messagebox.showerror("Error", status["error"])
+        self._update_shot_label()
     
-    def start_rokoko_recording(self):
-        """Start Rokoko recording."""
-        try:
-            ip = self.config_manager.get("rokoko_ip")
-            port = self.config_manager.get("rokoko_port")
-            api_key = self.config_manager.get("rokoko_api_key")
-            clip_name = self.config_manager.get("rokoko_clip_name")
-            frame_rate = self.config_manager.get("rokoko_frame_rate")
-            
-            url = f"http://{ip}:{port}/v1/{api_key}/recording/start"
-            payload = {
-                "filename": clip_name,
-                "frame_rate": frame_rate
-            }
-            
-            response = requests.post(url, json=payload, timeout=5)
-            
-            if response.status_code == 200:
-                self.log(f"Rokoko recording started (clip: {clip_name}).")
-                return True
-            else:
-                self.log(f"Error starting Rokoko: {response.text}", "error")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            self.log(f"Error connecting to Rokoko: {e}", "error")
-            return False
-        except Exception as e:
-            self.log(f"Unexpected error starting Rokoko: {e}", "error")
-            return False
+    def _update_shot_label(self):
+        """Show the clip name and position of the next take."""
+        shot_list = self.recorder.shot_list
+        if shot_list is None:
+            self.shot_label.config(text="(none)", fg="gray")
+        elif shot_list.done:
+            self.shot_label.config(text="All takes recorded", fg="green")
+        else:
+            self.shot_label.config(
+                text=f"Next: {shot_list.current['clip_name']} ({shot_list.progress()})", fg="black"
+            )
     
-    def stop_rokoko_recording(self):
-        """Stop Rokoko recording."""
-        try:
-            ip = self.config_manager.get("rokoko_ip")
-            port = self.config_manager.get("rokoko_port")
-            api_key = self.config_manager.get("rokoko_api_key")
-            clip_name = self.config_manager.get("rokoko_clip_name")
-            frame_rate = self.config_manager.get("rokoko_frame_rate")
-            
-            url = f"http://{ip}:{port}/v1/{api_key}/recording/stop"
-            payload = {
-                "filename": clip_name,
-                "frame_rate": frame_rate,
-                "back_to_live": True
-            }
-            
-            response = requests.post(url, json=payload, timeout=5)
-            
-            if response.status_code == 200:
-                self.log("Rokoko recording stopped.")
-                return True
-            else:
-                self.log(f"Error stopping Rokoko: {response.text}", "error")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            self.log(f"Error connecting to Rokoko: {e}", "error")
-            return False
-        except Exception as e:
-            self.log(f"Unexpected error stopping Rokoko: {e}", "error")
-            return False
+    def toggle_recording(self):
+        """Start or stop recording based on current state."""
+        if self.engine is not None:
+            self.engine.toggle()
     
-    def start_audacity_recording(self):
-        """Start Audacity recording."""
-        if not PA_AVAILABLE:
-            self.log("ERROR: pyaudacity module not available!", "error")
-            return False
-        
-        try:
-            record_commands = [
-                "Record1stChoice",
-                "Transport: Record",
-                "Record2ndChoice",
-                "Record",
-            ]
-            
-            recording_started = False
-            last_error = None
-            
-            for cmd in record_commands:
-                try:
-                    pa.do(cmd)
-                    time.sleep(0.1)
-                    self.log(f"Audacity recording started (using: {cmd}).")
-                    recording_started = True
-                    break
-                except Exception as e:
-                    last_error = str(e)
-                    continue
-            
-            if not recording_started:
-                self.log(f"Error starting Audacity recording. Last error: {last_error}", "error")
-                self.log("Troubleshooting:", "warning")
-                self.log("  - Make sure Audacity is running and mod-script-pipe is enabled")
-                self.log("  - Try manually starting a recording in Audacity first")
-                self.log("  - Check that your audio device is properly configured")
-                return False
-            
-            return True
-            
-        except Exception as e:
-            self.log(f"Error setting up Audacity recording: {e}", "error")
-            self.log("Make sure Audacity is running and try again.", "warning")
-            return False
+    def arm_recording(self):
+        """Arm both backends and start recording at the chosen instant."""
+        if self.engine is not None:
+            self.engine.submit("arm", self.arm_time.get().strip() or None)
     
-    def stop_audacity_recording(self):
-        """Stop Audacity recording."""
-        if not PA_AVAILABLE:
-            return False
-        
-        stop_commands = [
-            "Transport: Stop",
-            "Stop",
-        ]
-        
-        stopped = False
-        last_error = None
-        
-        for cmd in stop_commands:
-            try:
-                pa.do(cmd)
-                stopped = True
-                break
-            except Exception as e:
-                last_error = str(e)
-                continue
-        
-        if not stopped:
-            self.log(f"Warning: Could not stop Audacity recording. Error: {last_error}", "warning")
-            self.log("You may need to manually stop recording in Audacity.", "warning")
-            return False
+    def add_marker(self):
+        """Drop a timeline marker in the running take."""
+        if self.engine is not None and self.state == RECORDING:
+            self.engine.mark()
+    
+    def _show_state(self, status):
+        """Show a state published by the recorder engine."""
+        previous, state = self.state, status["state"]
+        self.state = state
+        if state in (STARTING, ARMED, RECORDING):
+            self.record_button.config(text="STOP", bg="#f44336", activebackground="#da190b")
+        else:
+            self.record_button.config(text="RECORD", bg="#4CAF50", activebackground="#45a049")
+        self.arm_button.config(state="normal" if state == IDLE else "disabled")
+        self.mark_button.config(state="normal" if state == RECORDING else "disabled")
+        
+        if state == STARTING:
+            self.status_label.config(text="Starting...", fg="orange")
+        elif state == ARMED:
+            self.status_label.config(text="Armed...", fg="orange")
+        elif state == RECORDING:
+            if previous != RECORDING:
+                self._set_status("Recording...", "red", "start")
+        elif state == STOPPING:
+            self.status_label.config(text="Stopping...", fg="orange")
+        elif previous == STOPPING:
+            self._set_status("Ready", "green", "stop")
         else:
-            self.log("Audacity recording stopped.")
-            return True
+            self.status_label.config(text="Ready", fg="green")
+        if state == IDLE:
+            self._update_shot_label()
+    
+    def _set_status(self, text, color, action):
+        """Update the status label from the Tk thread and trace the update."""
+        self.status_label.config(text=text, fg=color)
+        self.tracer.mark("ui_update", action=action)
+    
+    def shutdown(self):
+        """Release backend connections and write the session trace summary."""
+        if self.watchdog is not None:
+            self.watchdog.close()
+            self.log(self.watchdog.summary())
+        if self.engine is not None:
+            self.engine.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        path = self.tracer.close()
+        if path:
+            self.log(f"Timing summary written to {path}")
+        if self.profiler is not None:
+            self.log(f"Session profile written to {self.profiler.close()}")
+        self.log_sink.close()
+
+
+def _report_first_paint(root, path):
+    """Write the wall-clock time of the first paint for startup_benchmark.py and exit."""
+    root.wait_visibility(root)
+    root.update_idletasks()
+    with open(path, 'w') as f:
+        f.write(str(time.time_ns()))
+    root.destroy()
 
 
 def main():
     """Main entry point for the application."""
     root = Tk()
     app = RokokoAVRecorderApp(root)
+    
+    # Set by startup_benchmark.py to measure time-to-window
+    probe = os.environ.get("ROKOKO_AV_STARTUP_PROBE")
+    if probe:
+        root.after(0, _report_first_paint, root, probe)
+    
     root.mainloop()
+    app.shutdown()
 
 
 if __name__ == "__main__":
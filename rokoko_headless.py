@@ -0,0 +1,104 @@
+"""
+Run the Rokoko Audio/Video Recorder without a GUI.
+
+Usage:
+    python rokoko_headless.py
+    python rokoko_headless.py --port 14060 --config stage.json
+    python rokoko_headless.py --send start
+
+The recorder opens its Rokoko and Audacity connections and then waits for
+start/stop/status/arm commands on a local TCP port (see recorder/control.py
+for the protocol). Nothing here imports tkinter, so it runs on machines
+without a display. ``--send`` talks to an already running instance, which
+makes it easy to trigger takes from scripts.
+"""
+
+import argparse
+import json
+import signal
+import sys
+import threading
+
+from recorder import (
+    ConfigManager, Recorder, RecorderEngine, SessionProfiler, TakeTracer, log_sink_from_config
+)
+from recorder.control import ControlServer, RecorderController, send_command
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.json", help="configuration file")
+    parser.add_argument("--host", help="control address to listen on or send to (default: control_host)")
+    parser.add_argument("--port", type=int, help="control port (default: control_port)")
+    parser.add_argument("--send", metavar="COMMAND", help="send a command to a running instance and exit")
+    args = parser.parse_args()
+
+    config_manager = ConfigManager(args.config)
+    host = args.host or config_manager.get("control_host")
+    port = args.port or config_manager.get("control_port")
+
+    if args.send:
+        try:
+            reply = send_command(args.send, host, port)
+        except OSError as e:
+            print(f"Cannot reach the recorder at {host}:{port}: {e}")
+            sys.exit(1)
+        print(json.dumps(reply))
+        sys.exit(0 if reply.get("ok") else 1)
+
+    tracer = TakeTracer(config_manager.get("trace_directory"))
+    log_sink = log_sink_from_config(config_manager)
+
+    def log(message, level="info"):
+        """Log to the console and the log file from the sink's writer thread."""
+        log_sink.write(message, level, tracer.take_id)
+
+    profiler = None
+    if config_manager.get("profile_session"):
+        profiler = SessionProfiler(config_manager.get("profile_directory"), log=log)
+        profiler.start()
+
+    recorder = Recorder(config_manager, log=log, tracer=tracer)
+    recorder.open()
+    if recorder.audio_backend is not recorder.audacity_backend:
+        log(f"Recording audio in-process from {recorder.audio_backend.source_name}.")
+    else:
+        transport = recorder.audacity_backend.transport
+        log(f"Using {transport.name or 'no pyaudacity'} for Audacity control.")
+
+    engine = RecorderEngine(recorder, tracer, debounce=config_manager.get("toggle_debounce"))
+    engine.open()
+    try:
+        server = ControlServer(RecorderController(engine), host, port, log=log)
+    except OSError as e:
+        log(f"Cannot listen on {host}:{port}: {e}", "error")
+        engine.close()
+        recorder.close()
+        tracer.close()
+        log_sink.close()
+        sys.exit(1)
+
+    # serve_forever runs on a helper thread so Ctrl+C/SIGTERM reach the main thread
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    server.start()
+    log(f"Headless recorder listening on {host}:{port}. Ready to record.")
+
+    while not stopped.wait(0.5):
+        pass
+
+    log("Shutting down...")
+    server.stop()
+    engine.close()
+    recorder.close()
+    path = tracer.close()
+    if path:
+        log(f"Timing summary written to {path}")
+    if profiler is not None:
+        log(f"Session profile written to {profiler.close()}")
+    log_sink.close()
+
+
+if __name__ == "__main__":
+    main()
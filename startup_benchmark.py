@@ -0,0 +1,185 @@
+"""
+Measure cold-start time of the recorder GUI from source and from the built executables.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 20 --json startup.json
+    python startup_benchmark.py --modes source onedir
+
+For each mode the application is launched ``--runs`` times in a scratch
+directory and timed from process launch until its window has been painted
+(the app reports that instant when ROKOKO_AV_STARTUP_PROBE is set, then
+exits). Modes:
+
+    source   python rokoko_av.py
+    onefile  dist/rokoko-av-recorder(.exe)          (python build_exe.py)
+    onedir   dist/rokoko-av-recorder/rokoko-av-recorder(.exe)  (python build_exe.py --onedir)
+
+For the source mode the report also lists the time to import rokoko_av in a
+fresh interpreter and checks that neither requests nor numpy is imported on
+the way to the first paint. Time-to-window needs a display.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from recorder.trace import percentile
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXE_SUFFIX = ".exe" if sys.platform == "win32" else ""
+NAME = "rokoko-av-recorder"
+
+MODES = {
+    "source": [sys.executable, os.path.join(HERE, "rokoko_av.py")],
+    "onefile": [os.path.join(HERE, "dist", NAME + EXE_SUFFIX)],
+    "onedir": [os.path.join(HERE, "dist", NAME, NAME + EXE_SUFFIX)],
+}
+
+# Modules that only the background connection and the takes need
+DEFERRED_MODULES = ("requests", "numpy")
+
+IMPORT_PROBE = (
+    "import sys, time; t = time.perf_counter(); import rokoko_av; "
+    "print((time.perf_counter() - t) * 1000, *(name in sys.modules for name in %r))" % (DEFERRED_MODULES,)
+)
+
+
+def stats(values):
+    """Return count, p50/p95 and min/max of a list of milliseconds."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "min": min(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values),
+    }
+
+
+def measure_import(runs):
+    """Time ``import rokoko_av`` in fresh interpreters."""
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=HERE,
+            stdout=subprocess.PIPE, check=True, universal_newlines=True
+        ).stdout.split()
+        times.append(float(output[0]))
+        loaded.update(name for name, flag in zip(DEFERRED_MODULES, output[1:]) if flag == "True")
+    result = {"import_ms": stats(times)}
+    for name in DEFERRED_MODULES:
+        result[f"{name}_imported"] = name in loaded
+    return result
+
+
+def measure_window(command, workdir, timeout):
+    """Launch the app once and return milliseconds until its first paint."""
+    probe = os.path.join(workdir, "first-paint")
+    if os.path.exists(probe):
+        os.remove(probe)
+    env = dict(os.environ, ROKOKO_AV_STARTUP_PROBE=probe)
+
+    launched_ns = time.time_ns()
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise RuntimeError(f"no window after {timeout} s")
+
+    if not os.path.exists(probe):
+        lines = stderr.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exited with code {process.returncode}")
+    with open(probe) as f:
+        return (int(f.read()) - launched_ns) / 1e6
+
+
+def run_benchmark(args):
+    """Measure every requested mode and return the report."""
+    report = {"runs": args.runs, "platform": sys.platform, "modes": {}}
+    workdir = tempfile.mkdtemp(prefix="rokoko-av-startup-")
+    # Point Rokoko at a closed local port so no real Studio is contacted
+    with open(os.path.join(workdir, "config.json"), 'w') as f:
+        json.dump({"rokoko_ip": "127.0.0.1", "rokoko_port": 9,
+                   "trace_directory": os.path.join(workdir, "traces")}, f)
+
+    try:
+        for mode in args.modes:
+            command = MODES[mode]
+            if not os.path.exists(command[-1]):
+                report["modes"][mode] = {"skipped": f"{command[-1]} not found"}
+                continue
+
+            result = {}
+            if mode == "source":
+                result.update(measure_import(args.runs))
+
+            times = []
+            try:
+                for i in range(args.warmup + args.runs):
+                    elapsed = measure_window(command, workdir, args.timeout)
+                    if i >= args.warmup:
+                        times.append(elapsed)
+            except RuntimeError as e:
+                result["error"] = str(e)
+            result["window_ms"] = stats(times)
+            report["modes"][mode] = result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def format_stats(values):
+    if not values.get("count"):
+        return "-"
+    return "  ".join(f"{key} {values[key]:8.1f}" for key in ("min", "p50", "p95", "max"))
+
+
+def print_report(report):
+    print(f"Runs per mode: {report['runs']} ({report['platform']})")
+    for mode, result in report["modes"].items():
+        print()
+        print(f"{mode}:")
+        if "skipped" in result:
+            print(f"  skipped: {result['skipped']}")
+            continue
+        if "import_ms" in result:
+            print(f"  import (ms)     {format_stats(result['import_ms'])}")
+            for name in DEFERRED_MODULES:
+                print(f"  {name} loaded at import: {'yes' if result[name + '_imported'] else 'no'}")
+        print(f"  window (ms)     {format_stats(result['window_ms'])}")
+        if "error" in result:
+            print(f"  error: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="measured launches per mode")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured launches per mode first")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES),
+                        help="what to launch (default: all that exist)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a window")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
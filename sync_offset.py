@@ -0,0 +1,56 @@
+"""
+Estimate the audio-to-mocap sync offset of a take from a clap.
+
+Usage:
+    python sync_offset.py take.wav take.csv
+    python sync_offset.py take.wav take.csv --frame-rate 60 --max-offset 5 --sidecar take.sync.json
+
+The WAV file is the take's audio and the CSV a Rokoko Studio export with
+hand or wrist positions. The offset is printed (and optionally written as a
+JSON sidecar) as audio time minus mocap time: a positive value means the
+clap is heard later than it is seen. Needs numpy.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from recorder.syncoffset import NUMPY_AVAILABLE, estimate_file_offset, write_sidecar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("audio", help="WAV file of the take")
+    parser.add_argument("mocap", help="CSV export of the take")
+    parser.add_argument("--frame-rate", type=float, help="mocap frame rate if the CSV has no time column")
+    parser.add_argument("--columns", nargs="+", help="position columns to use (x, y, z per joint)")
+    parser.add_argument("--rate", type=float, default=1000, help="analysis rate in Hz")
+    parser.add_argument("--max-offset", type=float, default=10.0, help="largest offset to search, in seconds")
+    parser.add_argument("--sidecar", metavar="PATH", help="also write the result as JSON")
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        print("numpy is required: pip install numpy")
+        sys.exit(1)
+
+    began = time.perf_counter()
+    try:
+        result = estimate_file_offset(args.audio, args.mocap, frame_rate=args.frame_rate,
+                                      rate=args.rate, max_offset=args.max_offset, columns=args.columns)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Offset:     {result['offset_s'] * 1000:+.1f} ms (audio minus mocap)")
+    print(f"Confidence: {result['confidence']:.1f} (peak / next peak)")
+    print(f"Took:       {time.perf_counter() - began:.2f} s for {result['audio_duration_s']:.0f} s of audio")
+
+    if args.sidecar:
+        write_sidecar(result, args.sidecar)
+    else:
+        print(json.dumps(result, indent=4))
+
+
+if __name__ == "__main__":
+    main()
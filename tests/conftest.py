@@ -0,0 +1,38 @@
+"""Shared fixtures for the recorder tests; everything runs against recorder.fakes."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import ConfigManager, Recorder  # noqa: E402
+
+
+@pytest.fixture
+def make_recorder(tmp_path):
+    """Return ``make(studios, audacity, **settings)``, giving a Recorder and the errors it logs."""
+    def make(studios, audacity, **settings):
+        config = {
+            "rokoko_ip": studios[0].host,
+            "rokoko_port": studios[0].port,
+            "rokoko_api_key": studios[0].api_key,
+            "rokoko_targets": [{"ip": s.host, "port": s.port} for s in studios[1:]],
+            "trace_directory": str(tmp_path / "traces"),
+            "health_check_interval": 0,
+        }
+        config.update(settings)
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(config))
+        errors = []
+
+        def log(message, level="info"):
+            if level == "error":
+                errors.append(message)
+
+        recorder = Recorder(ConfigManager(str(path)), log=log, audacity_transport=audacity.pipe())
+        return recorder, errors
+
+    return make
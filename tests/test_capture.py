@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from recorder.capture import AudioCapture, MmapWavWriter, RingBuffer, SyntheticSource
+from recorder.syncoffset import read_wav
+
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / "take.wav")
+    frames = (np.arange(6000, dtype=np.int16) - 3000).reshape(3000, 2)
+    writer = MmapWavWriter(path, 48000, 2, grow_bytes=4096)
+    writer.write(frames[:1000])
+    writer.write(frames[1000:])
+    writer.close()
+
+    data, sample_rate = read_wav(path)
+
+    assert sample_rate == 48000
+    assert np.array_equal(data, frames)
+    assert os.path.getsize(path) == MmapWavWriter.HEADER_SIZE + frames.nbytes
+
+
+def test_writer_switches_to_rf64(tmp_path):
+    path = str(tmp_path / "take.wav")
+    frames = np.ones((500, 1), dtype=np.int16)
+    writer = MmapWavWriter(path, 8000, 1)
+    writer.RIFF_LIMIT = 512
+    writer.write(frames)
+    writer.close()
+
+    with open(path, "rb") as f:
+        assert f.read(4) == b"RF64"
+    data, _ = read_wav(path)
+    assert np.array_equal(data, frames)
+
+
+def test_ring_stamps_can_be_read_while_blocks_arrive():
+    ring = RingBuffer(4096, 1, 48000)
+    block = np.zeros((16, 1), dtype=np.int16)
+    done = threading.Event()
+    errors = []
+
+    def produce():
+        stamp_ns = 0
+        while not done.is_set():
+            ring.write(block, stamp_ns)
+            stamp_ns += 333333
+
+    def consume():
+        try:
+            while not done.is_set():
+                position = ring.position_at(time.perf_counter_ns())
+                ring.stamp_of(position)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=produce)] + [threading.Thread(target=consume) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert ring.written > 256 * 16
+    frame, stamp_ns = ring.recent_blocks()[-1]
+    assert ring.stamp_of(frame) == stamp_ns
+    assert ring.position_at(stamp_ns) == frame
+
+
+def test_take_is_cut_at_the_stop(tmp_path):
+    capture = AudioCapture(SyntheticSource(8000, 1, blocksize=80), buffer_seconds=2.0)
+    capture.open()
+    try:
+        time.sleep(0.1)
+        take = capture.prepare_take(str(tmp_path / "take.wav"))
+        capture.start_take()
+        time.sleep(0.3)
+        capture.stop_take()
+        assert take.wait(2.0)
+    finally:
+        capture.close()
+
+    assert take.error is None
+    data, _ = read_wav(take.path)
+    assert len(data) == take.end_position - take.start_position > 0
+    with open(take.path + ".json") as f:
+        assert json.load(f)["frames"] == len(data)
+
+
+def test_unstarted_take_is_discarded(tmp_path):
+    capture = AudioCapture(SyntheticSource(8000, 1, blocksize=80), buffer_seconds=1.0)
+    capture.open()
+    try:
+        first = capture.prepare_take(str(tmp_path / "aborted.wav"))
+        second = capture.prepare_take(str(tmp_path / "next.wav"))
+        assert not os.path.exists(first.path)
+        assert first.writer._map is None
+    finally:
+        capture.close()
+
+    assert not os.path.exists(second.path)
+    assert os.listdir(str(tmp_path)) == []
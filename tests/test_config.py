@@ -0,0 +1,55 @@
+import json
+import os
+
+from recorder import ConfigManager
+
+
+def test_first_run_writes_defaults(tmp_path, capsys):
+    path = str(tmp_path / "config.json")
+    config = ConfigManager(path)
+
+    assert "Error" not in capsys.readouterr().out
+    assert os.path.exists(path)
+    with open(path) as f:
+        assert json.load(f) == ConfigManager.DEFAULT_CONFIG
+    assert config.get("rokoko_port") == 14053
+
+
+def test_missing_keys_are_filled_from_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"rokoko_ip": "10.0.0.5"}))
+
+    config = ConfigManager(str(path))
+
+    assert config.get("rokoko_ip") == "10.0.0.5"
+    assert config.get("toggle_debounce") == ConfigManager.DEFAULT_CONFIG["toggle_debounce"]
+
+
+def test_save_notifies_listeners(tmp_path):
+    config = ConfigManager(str(tmp_path / "config.json"))
+    seen = []
+    config.add_listener(seen.append)
+
+    config.set("rokoko_clip_name", "Intro")
+    assert config.save_config()
+
+    assert seen and seen[0]["rokoko_clip_name"] == "Intro"
+    with open(config.config_file) as f:
+        assert json.load(f)["rokoko_clip_name"] == "Intro"
+
+
+def test_failing_listener_does_not_fail_the_save(tmp_path, capsys):
+    config = ConfigManager(str(tmp_path / "config.json"))
+    seen = []
+
+    def broken(new_config):
+        raise ValueError("bad host")
+
+    config.add_listener(broken)
+    config.add_listener(seen.append)
+    config.set("rokoko_port", 14054)
+
+    assert config.save_config()
+    assert seen and seen[0]["rokoko_port"] == 14054
+    output = capsys.readouterr().out
+    assert "bad host" in output and "Error saving config" not in output
@@ -0,0 +1,17 @@
+from recorder.diagnostics import StallWatchdog
+
+
+def test_lag_summary_covers_the_whole_session():
+    watchdog = StallWatchdog()
+    watchdog.LAG_SAMPLES = 100
+    for beat in range(10000):
+        # Slow beats only long after the sample is full
+        watchdog._record_lag(0.5 if beat >= 5000 else 0.001)
+    watchdog._record_lag(2.0)
+
+    assert len(watchdog.lags) == 100
+    assert watchdog.beats == 10001
+    assert watchdog.max_lag == 2.0
+    # About half the kept lags come from the slow second half
+    assert 20 < sum(1 for lag in watchdog.lags if lag >= 0.5) < 80
+    assert "max 2000.0 ms over 10001 beats" in watchdog.summary()
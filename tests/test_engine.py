@@ -0,0 +1,129 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from recorder import NullTracer, RecorderEngine
+from recorder.engine import ARMED, IDLE, RECORDING, STARTING
+from recorder.fakes import FakeAudacity, MockRokokoStudio
+
+
+class CountingTracer(NullTracer):
+    def __init__(self):
+        self.takes = 0
+        self.presses = []
+
+    def begin_take(self):
+        self.takes += 1
+        return self.takes
+
+    def mark_press(self, action, at_ns=None):
+        self.presses.append((self.takes, action))
+
+
+@pytest.fixture
+def rig(make_recorder):
+    """A running engine over a MockRokokoStudio and a FakeAudacity."""
+    with MockRokokoStudio() as studio, FakeAudacity() as audacity:
+        recorder, errors = make_recorder([studio], audacity)
+        recorder.open()
+        tracer = CountingTracer()
+        engine = RecorderEngine(recorder, tracer, debounce=0)
+        engine.open()
+        try:
+            yield engine, studio, tracer, errors
+        finally:
+            engine.close()
+            recorder.close()
+
+
+def starts(studio):
+    return sum(1 for path in studio.requests if path.endswith("/recording/start"))
+
+
+def test_commands_are_checked_against_the_queued_state(rig):
+    engine, studio, tracer, errors = rig
+
+    assert engine.submit("stop").result(5)["error"] == "cannot stop while idle"
+    first = engine.submit("start")
+    # Refused at once: the queued start will leave the engine recording
+    assert engine.submit("start").result(5)["error"] == "cannot start while recording"
+    assert engine.submit("disarm").result(5)["error"] == "not armed"
+    assert first.result(5)["state"] == RECORDING
+    assert engine.submit("stop").result(5)["state"] == IDLE
+
+    assert starts(studio) == 1
+    assert engine.take == tracer.takes == 1
+    assert tracer.presses == [(1, "start"), (1, "stop")]
+    assert errors == []
+
+
+def test_start_and_stop_queued_while_busy_cancel_out(rig):
+    engine, studio, tracer, _ = rig
+    studio.faults.latency = 0.3
+
+    running = engine.submit("start")
+    deadline = time.monotonic() + 5
+    while engine.state != STARTING and time.monotonic() < deadline:
+        time.sleep(0.001)
+    stop = engine.submit("stop")
+    skipped_start = engine.submit("start")
+    skipped_stop = engine.submit("stop")
+    for future in (running, stop, skipped_start, skipped_stop):
+        future.result(10)
+
+    assert engine.state == IDLE
+    assert starts(studio) == 1
+    # The skipped take got no number and no trace
+    assert engine.take == tracer.takes == 1
+    assert not studio.recording
+
+
+def test_toggle_ignores_a_bounce(rig):
+    engine, studio, _, _ = rig
+    engine.debounce = 10.0
+
+    assert engine.toggle().result(5)["state"] == RECORDING
+    assert engine.toggle().result(5)["error"] == "ignored: pressed again too quickly"
+    assert engine.state == RECORDING
+
+    engine.debounce = 0
+    assert engine.toggle().result(5)["state"] == IDLE
+    assert starts(studio) == 1
+
+
+def test_stop_while_armed_cancels_the_start(rig):
+    engine, studio, _, _ = rig
+
+    armed = engine.submit("arm", datetime.now() + timedelta(seconds=2))
+    assert armed.result(5)["state"] == ARMED
+    # Answered from the calling thread while the worker waits for the instant
+    assert engine.submit("stop").result(1)["state"] == ARMED
+    deadline = time.monotonic() + 5
+    while engine.state != IDLE and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert engine.state == IDLE
+    assert starts(studio) == 0
+    assert engine.submit("start").result(5)["state"] == RECORDING
+    assert engine.submit("stop").result(5)["state"] == IDLE
+
+
+def test_stop_that_misses_the_armed_start_stops_the_take(rig):
+    engine, studio, tracer, errors = rig
+    # The cancel arrives just too late to stop the start from firing
+    engine.recorder.disarm = lambda: None
+
+    armed = engine.submit("arm", datetime.now() + timedelta(seconds=1))
+    assert armed.result(5)["state"] == ARMED
+    engine.submit("stop").result(1)
+    deadline = time.monotonic() + 5
+    while (engine.state != IDLE or studio.recording) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert engine.state == IDLE
+    assert starts(studio) == 1
+    assert not studio.recording
+    assert engine.last_result.action == "stop"
+    assert tracer.presses == [(1, "stop")]
+    assert errors == []
@@ -0,0 +1,66 @@
+import os
+import time
+
+import pytest
+
+from recorder import AudacityPipeError
+from recorder.export import DONE, AudacityExport
+from recorder.fakes import FakeAudacity, MockRokokoStudio
+
+
+def exported_while_recording(received):
+    """True if an Export2 reached Audacity between a record command and its stop."""
+    recording = False
+    for line in received:
+        if line.startswith("Record"):
+            recording = True
+        elif line.startswith("Stop"):
+            recording = False
+        elif line.startswith("Export2") and recording:
+            return True
+    return False
+
+
+def test_sync_offset_audio_waits_for_the_next_take(make_recorder, tmp_path):
+    with MockRokokoStudio() as studio, FakeAudacity() as audacity:
+        recorder, errors = make_recorder(
+            [studio], audacity, sync_offset_enabled=True, sync_mocap_wait=0,
+            sync_directory=str(tmp_path / "takes"), rokoko_export_directory=str(tmp_path / "mocap"))
+        recorder.open()
+        try:
+            assert recorder.start().success
+            time.sleep(0.2)
+            assert recorder.stop().success
+            # The next take starts before the first one's audio is exported
+            assert recorder.start().success
+            time.sleep(0.3)
+            assert recorder.stop().success
+            jobs = list(recorder.exports.jobs)
+            assert all(job.wait(10.0) for job in jobs)
+        finally:
+            recorder.close()
+
+    assert not exported_while_recording(audacity.received)
+    assert [job.state for job in jobs] == [DONE, DONE]
+    for job in jobs:
+        assert os.path.dirname(job.results["audio"]) == str(tmp_path / "takes")
+        assert os.path.exists(job.results["audio"])
+        # No CSV export turned up, so no offset, but no failure either
+        assert job.results["sync offset"] is None
+    assert errors == []
+
+
+def test_failed_audacity_export_raises(tmp_path):
+    with FakeAudacity() as audacity:
+        transport = audacity.pipe()
+        transport.connect()
+        try:
+            transport.do("Record1stChoice:")
+            transport.do("Stop:")
+            export = AudacityExport(transport, timeout=5.0)
+            region = export.locate()
+            assert export.export(str(tmp_path / "take.wav"), region) == str(tmp_path / "take.wav")
+            with pytest.raises(AudacityPipeError, match="Export failed"):
+                export.export(str(tmp_path / "missing" / "take.wav"), region)
+        finally:
+            transport.close()
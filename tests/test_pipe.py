@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from recorder.audacity import response_payload
+from recorder.fakes import FakeAudacity
+from recorder.pipe import AudacityPipe, AudacityPipeError
+
+
+def test_pipelined_replies_reach_their_own_commands():
+    with FakeAudacity() as audacity:
+        pipe = audacity.pipe()
+        try:
+            futures = pipe.send_many([
+                'Message: Text="first"',
+                "NoSuchCommand:",
+                'Message: Text="third"',
+            ])
+            futures.append(pipe.send('Message: Text="fourth"'))
+
+            assert response_payload(futures[0].result(5)) == "first"
+            with pytest.raises(AudacityPipeError, match="NoSuchCommand"):
+                futures[1].result(5)
+            assert response_payload(futures[2].result(5)) == "third"
+            assert response_payload(futures[3].result(5)) == "fourth"
+        finally:
+            pipe.close()
+
+
+def test_partial_reply_waits_for_the_rest(tmp_path):
+    # Play Audacity by hand to split a reply across writes
+    to_pipe, from_pipe = str(tmp_path / "to"), str(tmp_path / "from")
+    os.mkfifo(to_pipe)
+    os.mkfifo(from_pipe)
+    to_fd = os.open(to_pipe, os.O_RDWR)
+    from_fd = os.open(from_pipe, os.O_RDWR)
+    pipe = AudacityPipe(to_pipe, from_pipe)
+    try:
+        future = pipe.send('Message: Text="hello"')
+        assert os.read(to_fd, 1024) == b'Message: Text="hello"\n'
+
+        for part in (b"hel", b"lo\nBatchCommand fin", b"ished: OK\n"):
+            os.write(from_fd, part)
+            time.sleep(0.05)
+            assert not future.done()
+
+        os.write(from_fd, b"\n")
+        assert response_payload(future.result(5)) == "hello"
+    finally:
+        pipe.close()
+        os.close(to_fd)
+        os.close(from_fd)
+
+
+def test_reconnects_after_audacity_comes_back():
+    audacity = FakeAudacity()
+    audacity.start()
+    pipe = audacity.pipe()
+    states = []
+    pipe.add_connection_listener(states.append)
+    try:
+        assert response_payload(pipe.do('Message: Text="before"')) == "before"
+
+        audacity.stop(remove=False)
+        deadline = time.monotonic() + 5
+        while pipe.connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not pipe.connected
+        with pytest.raises(AudacityPipeError):
+            pipe.send('Message: Text="while away"')
+
+        audacity.start()
+        assert response_payload(pipe.do('Message: Text="after"')) == "after"
+        assert states == [True, False, True]
+    finally:
+        pipe.close()
+        audacity.stop()
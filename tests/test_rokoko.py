@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+from recorder.fakes import MockRokokoStudio
+from recorder.resilience import CircuitBreaker, CircuitOpenError
+from recorder.rokoko import RokokoClient
+
+
+@pytest.fixture
+def studio():
+    with MockRokokoStudio() as studio:
+        yield studio
+
+
+@pytest.fixture
+def client(studio):
+    client = RokokoClient()
+    client.configure(studio.host, studio.port, studio.api_key, "Take", 60)
+    client.open()
+    # Settle the stop estimate on a quick round trip
+    for _ in range(8):
+        client.rtt["stop"].add(0.005)
+    try:
+        yield client
+    finally:
+        client.close()
+
+
+def stall_first_stop(studio, stall):
+    """Hold the first stop ``stall`` seconds; return the times the stops arrived."""
+    arrivals = []
+
+    def delay():
+        arrivals.append(time.monotonic())
+        if len(arrivals) == 1:
+            time.sleep(stall)
+
+    studio.faults.delay = delay
+    return arrivals
+
+
+def test_connection_pool_covers_every_stop_worker(client):
+    adapter = client.session.get_adapter("http://")
+    assert adapter._pool_maxsize > client.hedge_workers
+
+
+def test_prompt_stop_is_sent_once(studio, client):
+    arrivals = stall_first_stop(studio, 0)
+
+    assert client.stop().status_code == 200
+    assert len(arrivals) == 1
+
+
+def test_late_stop_is_hedged_after_the_hedge_delay(studio, client):
+    delay = client.rtt["stop"].hedge_delay()
+    arrivals = stall_first_stop(studio, 2.0)
+
+    began = time.monotonic()
+    response = client.stop()
+    took = time.monotonic() - began
+
+    # The second copy answered; the stalled first one was not waited for
+    assert response.status_code == 200
+    assert took < 1.0
+    assert len(arrivals) == 2
+    assert arrivals[1] - arrivals[0] >= delay * 0.8
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stop_fails_once_every_copy_has(studio, client):
+    studio.stop()
+
+    with pytest.raises(OSError):
+        client.stop()
+    assert client.breaker.failures == 1
+
+
+def test_breaker_opens_after_repeated_failures():
+    breaker = CircuitBreaker("host", failure_threshold=2, reset_timeout=60.0)
+    breaker.check()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker("host", failure_threshold=2, reset_timeout=60.0)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker("host", failure_threshold=1, reset_timeout=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+
+    breaker.check()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only the trial goes out until it has an answer
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    time.sleep(0.06)
+    breaker.check()
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.check()
@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_package_defers_slow_modules():
+    probe = "import sys, recorder; print(' '.join(sorted({'numpy', 'requests'} & set(sys.modules))))"
+    output = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, stdout=subprocess.PIPE,
+                            check=True, universal_newlines=True).stdout
+
+    assert output.strip() == ""
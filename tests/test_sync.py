@@ -0,0 +1,94 @@
+import time
+
+from recorder.fakes import FakeAudacity, MockRokokoStudio
+from recorder.sync import RecordingCoordinator
+
+
+def test_start_and_stop_on_every_host(make_recorder):
+    with MockRokokoStudio() as first, MockRokokoStudio() as second, FakeAudacity() as audacity:
+        recorder, errors = make_recorder([first, second], audacity)
+        recorder.open()
+        try:
+            result = recorder.start()
+            assert result.success
+            assert first.recording and second.recording and audacity.recording
+            assert recorder.stop().success
+        finally:
+            recorder.close()
+
+    assert not (first.recording or second.recording or audacity.recording)
+    assert errors == []
+
+
+def test_partial_start_is_rolled_back_on_every_host(make_recorder):
+    with MockRokokoStudio() as first, MockRokokoStudio() as refusing, FakeAudacity() as audacity:
+        refusing.faults.failure_rate = 1.0
+        recorder, _ = make_recorder([first, refusing], audacity)
+        recorder.open()
+        try:
+            result = recorder.start()
+        finally:
+            recorder.close()
+
+    assert not result.success
+    assert set(result.rolled_back) == {"Rokoko", "Audacity"}
+    # The host that did start got the stop too
+    assert first.requests.count(f"/v1/{first.api_key}/recording/stop") == 1
+    assert not (first.recording or refusing.recording or audacity.recording)
+
+
+def test_rollback_reaches_a_backend_that_never_answered(make_recorder):
+    with MockRokokoStudio() as studio, FakeAudacity() as audacity:
+        studio.faults.failure_rate = 1.0
+        recorder, _ = make_recorder([studio], audacity)
+        recorder.open()
+        audacity_backend = recorder.coordinator.backends[1]
+        stopped = []
+        original_stop = audacity_backend.stop
+
+        def lost_answer():
+            # The command runs, but its answer never comes back
+            audacity_backend.transport.do(audacity_backend.commands.record_command)
+            raise TimeoutError("timed out")
+
+        audacity_backend.start = lost_answer
+        audacity_backend.stop = lambda: stopped.append(True) or original_stop()
+        try:
+            result = recorder.start()
+        finally:
+            recorder.close()
+
+    assert not result.success
+    assert stopped
+    assert not audacity.recording
+
+
+class SlowBackend:
+    """Just enough of a backend for the coordinator, with a slow stop."""
+
+    def __init__(self, name, starts=True, stop_delay=0.0):
+        self.name = name
+        self.starts = starts
+        self.stop_delay = stop_delay
+
+    def prepare(self, action):
+        return True
+
+    def start(self):
+        return self.starts
+
+    def stop(self):
+        time.sleep(self.stop_delay)
+        return True
+
+
+def test_rollback_reports_what_stopped_by_its_deadline():
+    late = SlowBackend("late", starts=False, stop_delay=0.3)
+    coordinator = RecordingCoordinator([SlowBackend("quick"), late], confirm_timeout=0,
+                                       rollback_timeout=0.1)
+
+    result = coordinator.start()
+    assert result.rolled_back == ["quick"]
+    time.sleep(0.4)
+    # The late stop finished after the deadline and changed nothing already reported
+    assert result.rolled_back == ["quick"]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from recorder.syncoffset import estimate_offset
+
+
+def claps(length, times, rate):
+    onset = np.zeros(length)
+    for t in times:
+        onset[int(round(t * rate))] = 1.0
+    return onset
+
+
+@pytest.mark.parametrize("offset", [0.0, 0.25, -1.5])
+def test_estimate_offset_finds_the_shift(offset):
+    rate = 1000
+    times = [1.0, 2.7, 4.1, 6.35, 8.0]
+    mocap = claps(12 * rate, times, rate)
+    audio = claps(12 * rate, [t + offset for t in times], rate)
+
+    result = estimate_offset(audio, mocap, rate, max_offset=3.0)
+
+    assert result["offset_s"] == pytest.approx(offset, abs=1.0 / rate)
+    assert result["confidence"] > 1.5
+
+
+def test_estimate_offset_is_unsure_without_a_clap():
+    rate = 1000
+    noise = np.random.RandomState(1).rand(5 * rate)
+
+    result = estimate_offset(noise, np.random.RandomState(2).rand(5 * rate), rate, max_offset=2.0)
+
+    assert result["confidence"] < 1.5
@@ -0,0 +1,71 @@
+import numpy as np
+
+from recorder.takefile import TakeFileReader, TakeFileWriter
+
+RATE = 1000
+MOCAP_FIELDS = [("recv_ns", "<i8", 1, "columns"), ("values", "<f4", 3, "columns")]
+AUDIO_FIELDS = [("samples", "<i2", 2, "rows")]
+
+
+def write_take(path, close=True):
+    writer = TakeFileWriter(path, metadata={"clip": "Intro"})
+    writer.add_stream("mocap", MOCAP_FIELDS, kind="mocap", time_field="recv_ns")
+    writer.add_stream("audio", AUDIO_FIELDS, kind="audio", sample_rate=RATE)
+    for chunk in range(4):
+        times = np.arange(chunk * 10, chunk * 10 + 10, dtype=np.int64) * 1000000
+        values = np.vstack([times / 1e6 + axis for axis in range(3)]).astype(np.float32)
+        writer.append("mocap", 10, int(times[0]), int(times[-1]), [times, values])
+        samples = np.arange(chunk * 20, chunk * 20 + 20, dtype=np.int16).reshape(10, 2)
+        writer.append("audio", 10, int(times[0]), int(times[-1]), [samples])
+    writer.append_events("markers", [{"t_ns": 5000000, "text": "Marker 1"},
+                                     {"t_ns": 25000000, "text": "Marker 2"}])
+    if close:
+        writer.close()
+    return writer
+
+
+def check_take(reader):
+    assert reader.metadata == {"clip": "Intro"}
+    assert reader.time_range("mocap") == (0, 39000000)
+
+    mocap = reader.window("mocap", 15000000, 25000000)
+    assert mocap["time_ns"].tolist() == [t * 1000000 for t in range(15, 25)]
+    assert mocap["values"].shape == (3, 10)
+    assert mocap["values"][2].tolist() == [t + 2.0 for t in range(15, 25)]
+
+    audio = reader.window("audio", 0, 5000000)
+    assert audio["samples"].tolist() == [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+    assert reader.window("audio", 100000000, 200000000)["samples"].shape == (0, 2)
+
+    assert [e["text"] for e in reader.events("markers")] == ["Marker 1", "Marker 2"]
+    assert [e["text"] for e in reader.window("markers", 20000000, 30000000)] == ["Marker 2"]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "take.rktake")
+    write_take(path)
+
+    with TakeFileReader(path) as reader:
+        assert not reader.recovered
+        check_take(reader)
+
+
+def test_unclosed_file_is_recovered_and_continued(tmp_path):
+    path = str(tmp_path / "take.rktake")
+    writer = write_take(path, close=False)
+    # A crash leaves no footer and maybe half a record
+    writer._file.write(b"CHNK partial")
+    writer._file.flush()
+
+    with TakeFileReader(path) as reader:
+        assert reader.recovered
+        check_take(reader)
+
+    writer = TakeFileWriter(path)
+    assert set(writer.streams) == {"mocap", "audio", "markers"}
+    writer.append_events("markers", [{"t_ns": 45000000, "text": "Marker 3"}])
+    writer.close()
+    with TakeFileReader(path) as reader:
+        assert not reader.recovered
+        assert reader.window("mocap", 0, 10000000)["values"].shape == (3, 10)
+        assert [e["text"] for e in reader.events("markers")] == ["Marker 1", "Marker 2", "Marker 3"]